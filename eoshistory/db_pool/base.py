@@ -0,0 +1,73 @@
+"""
+PostgreSQL database backend which hands out connections from an in-process :class:`psycopg2.pool.ThreadedConnectionPool`
+instead of opening a new connection for every thread. Enabled by setting ``DB_POOL=true`` in your ``.env``.
+
+Connections are returned to the pool (rather than closed) whenever Django closes them, e.g. when ``CONN_MAX_AGE``
+expires, or after a failed health check.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import os
+from threading import Lock
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import ThreadedConnectionPool
+from django.conf import settings
+from django.db.backends.postgresql import base
+
+_pools = {}
+_pools_lock = Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _get_pool(self, conn_params: dict) -> ThreadedConnectionPool:
+        # Pools are per-process, as connections must never be shared with a forked child (e.g. Celery prefork workers)
+        key = (self.alias, os.getpid())
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = ThreadedConnectionPool(settings.DB_POOL_MIN, settings.DB_POOL_MAX, **conn_params)
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        connection = self._get_pool(conn_params).getconn()
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        conn, pool = self.connection, _pools.get((self.alias, os.getpid()))
+        with self.wrap_database_errors:
+            if pool is None:
+                return conn.close()
+            discard = conn.closed != 0
+            if not discard:
+                try:
+                    # Prepared statements are left in place, as they're tracked per psycopg2 connection
+                    if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+            pool.putconn(conn, close=discard)
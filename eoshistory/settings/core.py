@@ -180,17 +180,129 @@ WSGI_APPLICATION = 'eoshistory.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+DB_POOL = env_bool('DB_POOL', False)
+"""
+When True, use the ``eoshistory.db_pool`` database backend, which keeps an in-process pool of PostgreSQL connections
+(``DB_POOL_MIN`` to ``DB_POOL_MAX``) shared between the threads of each process, instead of connecting per thread.
+"""
+DB_POOL_MIN = env_int('DB_POOL_MIN', 1)
+DB_POOL_MAX = env_int('DB_POOL_MAX', 10)
+
+DB_CONN_MAX_AGE = env_int('DB_CONN_MAX_AGE', 300)
+"""Re-use database connections for up to this many seconds (Django's ``CONN_MAX_AGE``). Set to 0 to disable."""
+
 DATABASES = {
     'default': {
-        'ENGINE':   'django.db.backends.' + env('DB_BACKEND', 'postgresql'),
+        'ENGINE':   'eoshistory.db_pool' if DB_POOL else 'django.db.backends.' + env('DB_BACKEND', 'postgresql'),
         'NAME':     env('DB_NAME', 'eoshistory'),
         'USER':     env('DB_USER', 'eoshistory'),
         'PASSWORD': env('DB_PASS', ''),
         'HOST':     env('DB_HOST', 'localhost'),
         'PORT':     env('DB_PORT', ''),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
     },
 }
 
+DB_HEALTH_CHECK_SECS = env_int('DB_HEALTH_CHECK_SECS', 30)
+"""
+Before a Celery task runs, if the worker's database connection has been idle for longer than this many seconds, check
+that it's still usable (and reconnect if not), so that tasks don't fail after a database restart. 0 = always check.
+"""
+
+DB_PREPARED_STATEMENTS = env_bool('DB_PREPARED_STATEMENTS', True)
+"""
+Use server-side prepared statements (``PREPARE`` / ``EXECUTE``) for the importer's hot lookup / insert queries.
+Disable this if you connect through PgBouncer in transaction pooling mode, as prepared statements are per-session.
+"""
+
+PARTITION_BLOCKS = env_int('PARTITION_BLOCKS', 1000000)
+"""
+Once the transaction / action tables have been partitioned (``./manage.py partition_tables --convert``), each
+partition holds this many blocks. 1,000,000 blocks = approx. 5.8 days of EOS blocks.
+"""
+PARTITION_AHEAD = env_int('PARTITION_AHEAD', 2)
+"""How many empty partitions to create in advance, past the highest block being imported"""
+
+STORAGE_PROFILE = env('STORAGE_PROFILE', 'full').lower()
+"""
+How the importer stores the redundant representations of transactions and actions:
+
+ - ``full`` - store ``packed_trx`` and each action's ``hex_data`` as hex text, as received from the RPC node.
+ - ``compact`` - don't store ``packed_trx`` at all when it can be rebuilt from the transaction's metadata and actions
+   (it's stored as binary when it can't), and store ``hex_data`` as binary (half the size of hex). The API rebuilds
+   both on the fly, so its output is the same. Existing rows can be converted with ``./manage.py compact_storage``.
+"""
+
+ACCOUNT_HISTORY_INDEX = env_bool('ACCOUNT_HISTORY_INDEX', True)
+"""
+Write a row to the account history table (:class:`historyapp.models.AccountAction`) for each account involved in
+each imported action, which powers ``/api/history/``. Disabling this speeds up imports slightly, but any blocks
+imported while it's disabled won't show up in account histories.
+"""
+
+TRANSFER_LEDGER = env_bool('TRANSFER_LEDGER', True)
+"""
+Write a row to the transfer ledger (:class:`historyapp.models.EOSTransfer`) for each imported token transfer, which
+powers ``/api/transfers/``. Blocks imported while it's disabled won't show up in the ledger.
+"""
+
+BALANCE_HISTORY = env_bool('BALANCE_HISTORY', True)
+"""
+Keep the running balance of each account / token after every transfer (``/api/balances/``) up to date as blocks are
+imported - requires ``TRANSFER_LEDGER``. Disable this while backfilling behind existing history, then run
+``./manage.py rebuild_balances``.
+"""
+
+ARCHIVE_DIR = env('ARCHIVE_DIR', join(BASE_DIR, 'archive'))
+"""The folder which ``./manage.py archive_blocks`` writes archived block ranges to, and the API reads them from"""
+
+ARCHIVE_BLOCKS = env_int('ARCHIVE_BLOCKS', 100000)
+"""How many blocks are stored in each archive file. Only affects block ranges archived after it's changed."""
+
+ARCHIVE_GROUP_ROWS = env_int('ARCHIVE_GROUP_ROWS', 20000)
+"""
+Each table in an archive file is split into groups of this many rows, which are compressed separately. Smaller groups
+mean reading less data to answer a query, at the cost of slightly worse compression.
+"""
+
+ARCHIVE_READS = env_bool('ARCHIVE_READS', True)
+"""
+If True, the API falls back to searching the archive files for requests which fall within archived block ranges
+(e.g. ``block_from`` / ``block_to`` or ``time_from`` / ``time_to``), or for blocks / transactions which aren't in
+the database.
+"""
+
+BLOCK_TIME_CACHE = env_int('BLOCK_TIME_CACHE', 86400)
+"""
+How long (in seconds) to cache the anchor blocks used to convert the times in time filters (e.g. ``time_from``) into
+block numbers. Anchors are only a starting point for the search, so they can't cause wrong results.
+"""
+
+TRANSFER_ROLLUPS = env_bool('TRANSFER_ROLLUPS', True)
+"""
+Keep the hourly / daily token transfer totals (``/api/transfer_rollups/`` and ``/api/account_rollups/``) up to date
+as blocks are imported. If blocks are imported while this is disabled, run ``./manage.py rebuild_rollups`` afterwards.
+"""
+
+PENDING_APPLY_SECS = env_int('PENDING_APPLY_SECS', 5)
+"""
+How often (in seconds) each Celery worker process applies a batch of queued updates to the derived tables (e.g. the
+transfer rollups) after finishing a task - see :mod:`historyapp.lib.pending`
+"""
+
+PENDING_APPLY_LIMIT = env_int('PENDING_APPLY_LIMIT', 2000)
+"""The maximum number of queued blocks to apply to a derived table in one transaction"""
+
+PRODUCER_STATS = env_bool('PRODUCER_STATS', True)
+"""
+Keep per-producer, per-round block production counters (``/api/producers/``) up to date as blocks are imported
+(each block's round is queued, and re-calculated every ``PENDING_APPLY_SECS`` seconds). If blocks are imported while
+this is disabled, run ``./manage.py recompute_producer_stats`` afterwards.
+"""
+
+PRODUCER_SCHEDULE_SIZE = env_int('PRODUCER_SCHEDULE_SIZE', 21)
+"""The number of producers in the active producer schedule (21 on EOS mainnet) - each produces 12 blocks per round"""
+
 # RabbitMQ host (used only by EOSHistory itself, not celery)
 RMQ_HOST = 'localhost'
 RMQ_QUEUE = 'eoshist_block'
@@ -325,10 +437,97 @@ if DEBUG:
 else:
     STATIC_ROOT = join(BASE_DIR, 'static')
 
-MAX_QUEUE_THREADS = env_int('MAX_QUEUE_THREADS', 4)
-MAX_WAIT_THREADS = env_int('MAX_WAIT_THREADS', 4)
-MAX_BLOCKS_THREAD = env_int('MAX_BLOCKS_THREAD', 25)
-"""Maximum amount of blocks to load per thread"""
+SYNC_BATCH_PUBLISH = env_bool('SYNC_BATCH_PUBLISH', True)
+"""
+When True, sync_blocks publishes import tasks straight to RabbitMQ over a single persistent channel with publisher
+confirms (see :mod:`historyapp.lib.publisher`). Set to False to send each task with Celery's ``apply_async`` instead,
+e.g. if your Celery broker isn't RabbitMQ.
+"""
+
+SYNC_PUBLISH_BATCH = env_int('SYNC_PUBLISH_BATCH', 1000)
+"""Publish this many import tasks at a time, then wait for the broker to confirm them before checking the queue length"""
+
+SYNC_PUBLISH_MAX_UNCONFIRMED = env_int('SYNC_PUBLISH_MAX_UNCONFIRMED', 5000)
+"""Maximum amount of published tasks which the broker hasn't confirmed yet, before publishing pauses"""
 
 MAX_CELERY_QUEUE = env_int('MAX_CELERY_QUEUE', 100)
 """Maximum amount of tasks allowed in the celery queue before sync_blocks pauses"""
+
+SYNC_ADAPTIVE = env_bool('SYNC_ADAPTIVE', True)
+"""
+When True, ``sync_blocks`` automatically adjusts how many blocks it allows to be queued/in-flight at once (starting
+from ``EOS_SYNC_MAX_QUEUE``), using AIMD (additive increase, multiplicative decrease) based on the RPC latency,
+DB latency and error rate reported by the importer.
+
+When False, the static ``EOS_SYNC_MAX_QUEUE`` / ``MAX_CELERY_QUEUE`` settings are used as-is.
+"""
+
+SYNC_WINDOW_MIN = env_int('SYNC_WINDOW_MIN', 25)
+"""The adaptive in-flight window will never shrink below this many blocks"""
+SYNC_WINDOW_MAX = env_int('SYNC_WINDOW_MAX', 5000)
+"""The adaptive in-flight window will never grow above this many blocks"""
+SYNC_WINDOW_INCREASE = env_int('SYNC_WINDOW_INCREASE', 25)
+"""Amount of blocks to grow the in-flight window by after each healthy round"""
+SYNC_WINDOW_DECREASE = float(env('SYNC_WINDOW_DECREASE', '0.5'))
+"""Multiply the in-flight window by this factor when the importer is overloaded"""
+
+SYNC_TARGET_RPC_MS = env_int('SYNC_TARGET_RPC_MS', 1500)
+"""Shrink the in-flight window if the average RPC ``get_block`` latency reported by the importer exceeds this (ms)"""
+SYNC_TARGET_DB_MS = env_int('SYNC_TARGET_DB_MS', 1000)
+"""Shrink the in-flight window if the average DB time per imported block exceeds this (ms)"""
+SYNC_MAX_ERROR_RATE = float(env('SYNC_MAX_ERROR_RATE', '0.05'))
+"""Shrink the in-flight window if more than this fraction of block imports failed during the last round"""
+
+SYNC_LEASE_BLOCKS = env_int('SYNC_LEASE_BLOCKS', 1000)
+"""When running ``sync_blocks --sharded``, blocks are split into claimable ranges of this many blocks"""
+SYNC_LEASE_SECONDS = env_int('SYNC_LEASE_SECONDS', 120)
+"""A claimed block range may be reclaimed by another sync host if its lease isn't renewed within this many seconds"""
+SYNC_LEASES_PER_HOST = env_int('SYNC_LEASES_PER_HOST', 2)
+"""Maximum amount of block ranges that each ``sync_blocks --sharded`` instance will hold at once"""
+SYNC_LEASE_MAX_REQUEUE = env_int('SYNC_LEASE_MAX_REQUEUE', 3)
+"""
+How many times a sync host will re-queue missing blocks in a claimed range (after no progress has been made on the
+range for ``SYNC_LEASE_SECONDS``), before giving up and releasing the range back to ``pending`` for another host to retry.
+"""
+
+IMPORT_LOCK_BACKEND = env('IMPORT_LOCK_BACKEND', 'advisory').lower()
+"""
+How the importer prevents two workers from importing the same block at the same time (see :mod:`historyapp.lib.locking`)
+
+ - ``advisory`` (default) - PostgreSQL advisory locks, held until the block's import transaction ends
+ - ``cache`` - Keys added to the Django cache (``CACHE_BACKEND``). Only use this with a cache shared between all
+   workers, e.g. Redis / memcached.
+"""
+IMPORT_LOCK_TIMEOUT = env_int('IMPORT_LOCK_TIMEOUT', 300)
+"""(``cache`` backend only) Locks are automatically released after this many seconds, in case a worker dies"""
+
+IMPORT_LEAN_TASKS = env_bool('IMPORT_LEAN_TASKS', False)
+"""
+When True, blocks are queued using the ``import_block_lean`` task, which doesn't store a result in
+``CELERY_RESULT_BACKEND``, and doesn't trigger the ``success_import_block`` / ``handle_errors`` callback tasks.
+
+Instead, each worker process counts imported / failed blocks in memory and flushes them to the database every
+``IMPORT_STATS_FLUSH_SECS`` seconds (or every ``IMPORT_STATS_FLUSH_BLOCKS`` blocks). Blocks which fail to import are
+still recorded individually in the ``FailedBlock`` table.
+"""
+IMPORT_STATS_FLUSH_SECS = env_int('IMPORT_STATS_FLUSH_SECS', 5)
+"""(Lean tasks) Flush each worker's in-memory import counters at least this often (seconds)"""
+IMPORT_STATS_FLUSH_BLOCKS = env_int('IMPORT_STATS_FLUSH_BLOCKS', 100)
+"""(Lean tasks) Flush each worker's in-memory import counters after this many blocks, even if the interval hasn't passed"""
+
+IMPORT_LANES = env_bool('IMPORT_LANES', True)
+"""
+When True, import tasks are split between a ``live``, ``backfill`` and ``gaps`` Celery queue (lane) for each queue,
+e.g. ``eoshist.live``, so that a large backfill doesn't delay the import of new blocks (see :mod:`historyapp.lib.lanes`)
+"""
+SYNC_LIVE_DISTANCE = env_int('SYNC_LIVE_DISTANCE', 600)
+"""Blocks within this many blocks of the head block are sent to the ``live`` lane (600 blocks = approx. 5 minutes)"""
+SYNC_FOLLOW_INTERVAL = env_int('SYNC_FOLLOW_INTERVAL', 3)
+"""While ``sync_blocks`` is backfilling, check for (and queue) new head blocks in the live lane this often (seconds)"""
+
+IMPORT_MAX_RETRIES = env_int('IMPORT_MAX_RETRIES', 5)
+"""How many times an import task retries a failed block (with exponential backoff) before recording it as failed"""
+IMPORT_RETRY_MAX_SECS = env_int('IMPORT_RETRY_MAX_SECS', 600)
+"""Maximum backoff (in seconds) between an import task's retries"""
+FAILED_RETRY_MAX_SECS = env_int('FAILED_RETRY_MAX_SECS', 86400)
+"""Maximum backoff (in seconds) before ``retry_failed_blocks`` re-queues a block which has repeatedly failed"""
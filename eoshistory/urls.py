@@ -24,6 +24,15 @@ router = routers.SimpleRouter()
 router.register(r'blocks', views.BlockAPI)
 router.register(r'transactions', views.TransactionAPI)
 router.register(r'actions', views.ActionAPI)
+router.register(r'feed', views.FeedAPI, basename='feed')
+router.register(r'history', views.AccountHistoryAPI)
+router.register(r'transfers', views.TransferAPI)
+router.register(r'balances', views.BalanceAPI)
+router.register(r'sync', views.SyncCheckpointAPI)
+router.register(r'transfer_rollups', views.TransferRollupAPI)
+router.register(r'account_rollups', views.AccountTransferRollupAPI)
+router.register(r'producers', views.ProducerRoundAPI)
+router.register(r'schedules', views.ProducerScheduleAPI)
 
 
 urlpatterns = [
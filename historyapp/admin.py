@@ -20,7 +20,9 @@ Django Admin views
 from django.contrib import admin
 
 # Register your models here.
-from historyapp.models import EOSBlock, EOSTransaction, EOSAction
+from historyapp.models import EOSBlock, EOSTransaction, EOSAction, SyncCheckpoint, BlockRangeLease, FailedBlock, \
+    WorkerStats, AccountAction, DeferredIndex, ArchiveSegment, TransferRollup, AccountTransferRollup, EOSTransfer, \
+    ProducerRound, ProducerSchedule, AccountBalance, PendingUpdate
 
 
 @admin.register(EOSBlock)
@@ -39,5 +41,112 @@ class EOSTransactionAdmin(admin.ModelAdmin):
 @admin.register(EOSAction)
 class EOSActionAdmin(admin.ModelAdmin):
     list_display = ('txid', 'action_index', 'block_number', 'account', 'name', 'timestamp', 'created_at')
-    ordering = ('-created_at',)
+    ordering = ('-global_seq',)
+
+
+@admin.register(AccountAction)
+class AccountActionAdmin(admin.ModelAdmin):
+    list_display = ('account', 'block_number', 'action_id', 'role_names')
+    raw_id_fields = ('action',)
+    ordering = ('-block_number', '-action_id')
+
+
+@admin.register(SyncCheckpoint)
+class SyncCheckpointAdmin(admin.ModelAdmin):
+    list_display = (
+        'queue', 'queued_block', 'committed_block', 'blocks_committed', 'blocks_failed', 'avg_rpc_ms', 'avg_db_ms',
+        'window', 'window_reason', 'updated_at'
+    )
+    ordering = ('queue',)
+
+
+@admin.register(BlockRangeLease)
+class BlockRangeLeaseAdmin(admin.ModelAdmin):
+    list_display = (
+        'start_block', 'end_block', 'status', 'holder', 'lease_expires', 'attempts', 'claimed_at', 'completed_at'
+    )
+    list_filter = ('status',)
+    ordering = ('start_block',)
+
+
+@admin.register(FailedBlock)
+class FailedBlockAdmin(admin.ModelAdmin):
+    list_display = (
+        'block', 'queue', 'error_class', 'error_type', 'error_message', 'attempts', 'next_retry_at', 'last_failed_at'
+    )
+    list_filter = ('error_class', 'error_type', 'queue')
+    ordering = ('next_retry_at',)
+
+
+@admin.register(WorkerStats)
+class WorkerStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'worker', 'blocks_imported', 'blocks_failed', 'txs_imported', 'last_block', 'db_connects', 'db_queries',
+        'db_query_ms', 'updated_at'
+    )
+    ordering = ('-updated_at',)
+
+
+@admin.register(DeferredIndex)
+class DeferredIndexAdmin(admin.ModelAdmin):
+    list_display = ('name', 'table', 'status', 'dropped_at', 'started_at', 'error')
+    list_filter = ('status', 'table')
+    ordering = ('table', 'name')
+
+
+@admin.register(ArchiveSegment)
+class ArchiveSegmentAdmin(admin.ModelAdmin):
+    list_display = (
+        'start_block', 'end_block', 'start_time', 'end_time', 'total_blocks', 'total_transactions', 'total_actions',
+        'size_bytes', 'path', 'created_at'
+    )
+    ordering = ('-start_block',)
+
+
+@admin.register(TransferRollup)
+class TransferRollupAdmin(admin.ModelAdmin):
+    list_display = ('contract', 'symbol', 'period', 'bucket', 'transfers', 'volume')
+    list_filter = ('period',)
+    ordering = ('-bucket',)
+
+
+@admin.register(AccountTransferRollup)
+class AccountTransferRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        'account', 'contract', 'symbol', 'bucket', 'sent_count', 'sent_volume', 'received_count', 'received_volume'
+    )
+    ordering = ('-bucket',)
+
+
+@admin.register(PendingUpdate)
+class PendingUpdateAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'range_start', 'range_end', 'created_at')
+    list_filter = ('kind',)
+    ordering = ('id',)
+
+
+@admin.register(EOSTransfer)
+class EOSTransferAdmin(admin.ModelAdmin):
+    list_display = ('action_id', 'block_number', 'contract', 'sender', 'receiver', 'quantity')
+    raw_id_fields = ('action',)
+    ordering = ('-block_number', '-action_id')
+
+
+@admin.register(AccountBalance)
+class AccountBalanceAdmin(admin.ModelAdmin):
+    list_display = ('account', 'contract', 'block_number', 'action_id', 'delta', 'quantity')
+    ordering = ('-block_number', '-action_id')
+
+
+@admin.register(ProducerRound)
+class ProducerRoundAdmin(admin.ModelAdmin):
+    list_display = (
+        'round', 'producer', 'schedule_version', 'blocks_produced', 'expected_slots', 'missed_slots', 'schedule_changes'
+    )
+    ordering = ('-round', 'producer')
+
 
+@admin.register(ProducerSchedule)
+class ProducerScheduleAdmin(admin.ModelAdmin):
+    list_display = ('version', 'position', 'producer')
+    ordering = ('-version', 'position')
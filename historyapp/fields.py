@@ -0,0 +1,165 @@
+"""
+Custom Django model fields
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from typing import Optional
+
+from django.db import models
+
+from historyapp.lib.packing import is_name, name_to_bigint, bigint_to_name, is_symbol_code, symbol_code_to_int, \
+    int_to_symbol_code
+
+
+def hex_to_bytes(value) -> Optional[bytes]:
+    """Convert a hex string (or bytes / memoryview) into bytes. Raises :class:`ValueError` if it isn't valid hex."""
+    if value is None or isinstance(value, bytes):
+        return value
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    return bytes.fromhex(str(value))
+
+
+class HexBinaryField(models.CharField):
+    """
+    A hash (e.g. a TXID or block ID) which is stored as binary (``bytea``), but read and written as a hex string.
+
+    Storing a 32 byte hash as binary is half the size of storing it as hex text, which shrinks the field's indexes
+    (and the indexes of any foreign keys to it), and makes comparisons cheaper.
+
+    Lookups with a value which isn't valid hex (e.g. ``?txid=foo`` from the API) simply won't match anything, but
+    saving an invalid hex string raises :class:`ValueError`.
+
+        >>> EOSTransaction.objects.filter(txid='b3c40bdb774ec03e...').first().txid
+        'b3c40bdb774ec03e...'
+    """
+    description = 'Hex string stored as binary'
+
+    def __init__(self, *args, **kwargs):
+        # max_length is the length in hex characters - it's only used for validation, the column is always bytea
+        kwargs.setdefault('max_length', 64)
+        super().__init__(*args, **kwargs)
+
+    def db_type(self, connection):
+        return 'bytea'
+
+    def rel_db_type(self, connection):
+        return 'bytea'
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else bytes(value).hex()
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value).hex()
+        return super().to_python(value)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        try:
+            return hex_to_bytes(value)
+        except ValueError:
+            # Not a hex string, so it can't match any stored hash - search for its raw bytes instead of erroring
+            return str(value).encode('utf-8')
+
+    def get_db_prep_save(self, value, connection):
+        if value is not None:
+            hex_to_bytes(value)   # Raises ValueError if it's not valid hex
+        return super().get_db_prep_save(value, connection)
+
+
+class EOSNameField(models.CharField):
+    """
+    An EOS name (e.g. an account) which is stored as a 64-bit integer (``bigint``), but read and written as a string.
+
+    EOS names are base32 encoded unsigned 64-bit integers, so storing them as integers is lossless, and makes indexes
+    on them several times smaller than on ``varchar``. Only canonical names (see :func:`.packing.is_name`) can
+    be stored - saving anything else raises :class:`ValueError`, while lookups with an invalid name match nothing.
+
+    Note that ordering by this field orders by the integer value, not alphabetically.
+    """
+    description = 'EOS name stored as a 64-bit integer'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', 13)
+        super().__init__(*args, **kwargs)
+
+    def db_type(self, connection):
+        return 'bigint'
+
+    def rel_db_type(self, connection):
+        return 'bigint'
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else bigint_to_name(value)
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            return bigint_to_name(value)
+        return super().to_python(value)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return None
+        # NULL never compares equal to anything, so an invalid name simply doesn't match any rows
+        return name_to_bigint(value) if is_name(value) else None
+
+    def get_db_prep_save(self, value, connection):
+        if value is not None and not is_name(value):
+            raise ValueError(f'"{value}" is not a valid EOS name')
+        return super().get_db_prep_save(value, connection)
+
+
+class EOSSymbolField(models.CharField):
+    """
+    A token symbol code (e.g. ``EOS``) which is stored as a 64-bit integer (``bigint``), but read and written as a
+    string - the same way EOSIO stores them (see :func:`.packing.symbol_code_to_int`).
+
+    Only valid symbol codes (1 to 7 uppercase letters) can be stored - saving anything else raises :class:`ValueError`,
+    while lookups with an invalid symbol code match nothing.
+    """
+    description = 'EOS symbol code stored as a 64-bit integer'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', 7)
+        super().__init__(*args, **kwargs)
+
+    def db_type(self, connection):
+        return 'bigint'
+
+    def rel_db_type(self, connection):
+        return 'bigint'
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else int_to_symbol_code(value)
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            return int_to_symbol_code(value)
+        return super().to_python(value)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return None
+        return symbol_code_to_int(value) if is_symbol_code(value) else None
+
+    def get_db_prep_save(self, value, connection):
+        if value is not None and not is_symbol_code(value):
+            raise ValueError(f'"{value}" is not a valid EOS symbol code')
+        return super().get_db_prep_save(value, connection)
@@ -0,0 +1,620 @@
+"""
+Tiered storage - moves old block ranges out of the database into compressed, columnar archive files, and reads them
+back for the API.
+
+Each :class:`.ArchiveSegment` is a single zip file in ``settings.ARCHIVE_DIR``, holding up to ``ARCHIVE_BLOCKS``
+blocks along with their transactions and actions. Inside it, each table's rows (ordered by block number) are split
+into groups of ``ARCHIVE_GROUP_ROWS`` rows, and each column of each group is stored as a separately LZMA compressed
+JSON array::
+
+    _meta.json                                  - each table's columns, and the block range of each row group
+    historyapp_eosaction/0/account.json
+    historyapp_eosaction/0/data.json
+    ...
+
+A query only has to decompress the columns it filters on, for the row groups which can hold the blocks it's looking
+for - the remaining columns are only read for the groups containing rows which are actually returned.
+
+Looking up a single transaction or action by its ID (e.g. ``/api/transactions/<txid>/`` for a TXID which isn't in the
+database) can't be narrowed down by block number, so each segment also keeps a bloom filter of its TXIDs
+(:class:`.TxidFilter`) and the range of its action IDs. They're checked in the database, and only the files which may
+contain the ID are opened. Files archived before these were added are indexed by :func:`.index_segments`.
+
+The account history and transfer ledger tables aren't archived, as they're derived from the actions (which are) - the
+rows of archived blocks are deleted, and :func:`.archived_overlap` tells their API views when a request reaches into
+archived blocks. Archived blocks stay marked as imported in the coverage table, so they aren't re-imported.
+
+    >>> seg = archive_range(1000000, 1099999)      # Move blocks 1,000,000 - 1,099,999 into an archive file
+    >>> ArchiveQuery(EOSAction, [('tx_to', 'exact', 'privexinceos')], start_block=1000000)[0:10]
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import hashlib
+import json
+import os
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from os.path import join
+from typing import List, Tuple, Optional, Any, Dict, Iterable
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min, Max, Count, Model, QuerySet, Q
+
+from historyapp.lib import rollups
+from historyapp.models import EOSBlock, EOSTransaction, EOSAction, AccountAction, EOSTransfer, ArchiveSegment
+import logging
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_VERSION = 1
+
+ARCHIVE_MODELS = {
+    EOSBlock: 'number',
+    EOSTransaction: 'block_id',
+    EOSAction: 'block_number',
+}
+"""Each model which is archived, mapped to the column holding its block number"""
+
+Predicate = Tuple[str, str, Any]
+"""A filter on an archived table - ``(column, lookup, value)``, e.g. ``('tx_to', 'exact', 'privexinceos')``"""
+
+LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte', 'in', 'contains')
+"""The lookups which :class:`.ArchiveQuery` supports"""
+
+_ENCODERS = {
+    'DateTimeField': lambda v: v.isoformat(),
+    'DecimalField': str,
+    'BinaryField': lambda v: bytes(v).hex(),
+}
+
+_DECODERS = {
+    'DateTimeField': datetime.fromisoformat,
+    'DecimalField': Decimal,
+    'BinaryField': bytes.fromhex,
+}
+
+
+def _column_type(field) -> str:
+    # Foreign keys hold their target's value (e.g. the hex TXID) - store them the same way
+    return (field.target_field if field.is_relation else field).get_internal_type()
+
+
+def _table_columns(model) -> List[Tuple[str, str]]:
+    return [(f.attname, _column_type(f)) for f in model._meta.concrete_fields]
+
+
+def _segment_path(name: str) -> str:
+    return join(settings.ARCHIVE_DIR, name)
+
+
+def _write_table(zf: zipfile.ZipFile, model, start_block: int, end_block: int) -> dict:
+    """Write the rows of ``model`` within the block range into ``zf``, returning the table's metadata"""
+    key, table = ARCHIVE_MODELS[model], model._meta.db_table
+    columns = _table_columns(model)
+    names = [n for n, _ in columns]
+    encoders = [_ENCODERS.get(t) for _, t in columns]
+    key_i, groups = names.index(key), []
+
+    def flush(rows: list):
+        g = len(groups)
+        for i, name in enumerate(names):
+            enc = encoders[i]
+            values = [r[i] if r[i] is None or enc is None else enc(r[i]) for r in rows]
+            zf.writestr(f'{table}/{g}/{name}.json', json.dumps(values, separators=(',', ':')))
+        groups.append(dict(rows=len(rows), min_block=rows[0][key_i], max_block=rows[-1][key_i]))
+
+    qs = model.objects.filter(**{f'{key}__gte': start_block, f'{key}__lte': end_block}) \
+        .order_by(key, 'pk').values_list(*names)
+    rows = []
+    for row in qs.iterator(chunk_size=2000):
+        rows.append(row)
+        if len(rows) >= settings.ARCHIVE_GROUP_ROWS:
+            flush(rows)
+            rows = []
+    if len(rows) > 0:
+        flush(rows)
+    return dict(key=key, columns=dict(columns), rows=sum(g['rows'] for g in groups), groups=groups)
+
+
+class TxidFilter:
+    """
+    A bloom filter of transaction IDs, stored in :py:attr:`.ArchiveSegment.txid_filter`. It never misses a TXID
+    which was added, and wrongly matches about 1% of the TXIDs which weren't.
+
+    Bit ``n`` is bit ``n % 8`` (lowest first) of byte ``n // 8``, the same as PostgreSQL's ``get_bit()``, so the
+    filters can also be checked in SQL (see :func:`.txid_segments`).
+
+        >>> f = TxidFilter.build(['ab12...', 'cd34...'])
+        >>> 'ab12...' in f
+        True
+    """
+    HASHES = 7
+    """The number of bits set per TXID"""
+
+    BITS_PER_TXID = 10
+    """The size of the filter - 10 bits per TXID with 7 hashes gives a false positive rate of about 1%"""
+
+    def __init__(self, data: bytes):
+        self.data = bytes(data)
+
+    @classmethod
+    def hashes(cls, txid: str) -> List[int]:
+        """The (unreduced) bit positions of ``txid``"""
+        digest = hashlib.blake2b(str(txid).lower().encode(), digest_size=cls.HASHES * 4).digest()
+        return [int.from_bytes(digest[i * 4:i * 4 + 4], 'little') for i in range(cls.HASHES)]
+
+    @classmethod
+    def build(cls, txids: List[str]) -> 'TxidFilter':
+        bits = max(len(txids) * cls.BITS_PER_TXID // 8, 1) * 8
+        data = bytearray(bits // 8)
+        for txid in txids:
+            for h in cls.hashes(txid):
+                data[(h % bits) // 8] |= 1 << (h % bits) % 8
+        return cls(bytes(data))
+
+    def __contains__(self, txid: str) -> bool:
+        bits = len(self.data) * 8
+        return all(self.data[(h % bits) // 8] & (1 << (h % bits) % 8) for h in self.hashes(txid))
+
+
+query_txid_segments = f"""
+SELECT start_block FROM {ArchiveSegment._meta.db_table}
+WHERE txid_filter IS NULL OR (
+    {' AND '.join(['get_bit(txid_filter, (%s %% (length(txid_filter) * 8))::int) = 1'] * TxidFilter.HASHES)}
+);
+"""
+
+
+def txid_segments(txid: str) -> QuerySet:
+    """The archive segments which may contain the transaction ``txid`` (including any which haven't been indexed)"""
+    with connection.cursor() as cursor:
+        cursor.execute(query_txid_segments, TxidFilter.hashes(txid))
+        starts = [row[0] for row in cursor.fetchall()]
+    return ArchiveSegment.objects.filter(start_block__in=starts)
+
+
+def action_segments(action_id: int) -> QuerySet:
+    """The archive segments which may contain the action ``action_id`` (including any which haven't been indexed)"""
+    return ArchiveSegment.objects.filter(
+        Q(min_action_id__isnull=True) | Q(min_action_id__lte=action_id, max_action_id__gte=action_id)
+    )
+
+
+def _segment_index(txids: List[str], action_ids: List[int]) -> dict:
+    """The :class:`.ArchiveSegment` index fields for a file holding ``txids`` and ``action_ids``"""
+    return dict(
+        txid_filter=TxidFilter.build(txids).data,
+        min_action_id=min(action_ids) if len(action_ids) > 0 else 0,
+        max_action_id=max(action_ids) if len(action_ids) > 0 else -1,
+    )
+
+
+def index_segments() -> int:
+    """Build the TXID filter / action ID range of each archive file which doesn't have them. Returns how many."""
+    total = 0
+    for seg in ArchiveSegment.objects.filter(Q(txid_filter__isnull=True) | Q(min_action_id__isnull=True)):
+        f = ArchiveFile(seg)
+        txids = [t for g in f.groups(EOSTransaction) for t in f.column(EOSTransaction, g, 'txid')]
+        action_ids = [i for g in f.groups(EOSAction) for i in f.column(EOSAction, g, 'id')]
+        ArchiveSegment.objects.filter(pk=seg.pk).update(**_segment_index(txids, action_ids))
+        total += 1
+    return total
+
+
+def archive_range(start_block: int, end_block: int) -> Optional[ArchiveSegment]:
+    """
+    Move the blocks ``start_block`` to ``end_block`` (inclusive) with their transactions and actions out of the
+    database, into a new archive file. Returns the new :class:`.ArchiveSegment`, or None if there were no blocks in
+    the range.
+
+    The file is written, the rows deleted, and the segment recorded in one database transaction, so if anything fails
+    part way through, the blocks are simply left in the database.
+    """
+    start_block, end_block = int(start_block), int(end_block)
+    if ArchiveSegment.objects.filter(start_block__lte=end_block, end_block__gte=start_block).exists():
+        raise ValueError(f'Blocks {start_block} to {end_block} overlap a block range which is already archived')
+    os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
+    name = f'blocks_{start_block:010d}_{end_block:010d}.zip'
+    path = _segment_path(name)
+    # The transfer rollups are only aggregated from blocks in the database, so add any queued blocks before they're
+    # archived. Anything queued after this is added in the archive's transaction.
+    with transaction.atomic():
+        rollups.apply_pending_range(start_block, end_block)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Read and delete the rows from the same snapshot, so a block which is imported into this range while
+            # the file is being written can't be deleted without having been archived
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;')
+        stats = EOSBlock.objects.filter(number__gte=start_block, number__lte=end_block).aggregate(
+            total=Count('number'), start_time=Min('timestamp'), end_time=Max('timestamp')
+        )
+        if stats['total'] == 0:
+            return None
+
+        meta = dict(version=ARCHIVE_VERSION, start_block=start_block, end_block=end_block, tables={})
+        with zipfile.ZipFile(f'{path}.tmp', 'w', compression=zipfile.ZIP_LZMA) as zf:
+            for model in ARCHIVE_MODELS:
+                meta['tables'][model._meta.db_table] = _write_table(zf, model, start_block, end_block)
+            zf.writestr('_meta.json', json.dumps(meta))
+        with open(f'{path}.tmp', 'rb') as fp:
+            os.fsync(fp.fileno())
+        os.replace(f'{path}.tmp', path)
+
+        rollups.apply_pending_range(start_block, end_block)
+        txids = list(
+            EOSTransaction.objects.filter(block_id__gte=start_block, block_id__lte=end_block)
+            .values_list('txid', flat=True)
+        )
+        action_ids = list(
+            EOSAction.objects.filter(block_number__gte=start_block, block_number__lte=end_block)
+            .values_list('id', flat=True)
+        )
+        # Account history / transfer ledger first, then actions, as they refer to transactions, which refer to blocks
+        indexes = [(AccountAction, 'block_number'), (EOSTransfer, 'block_number')]
+        with connection.cursor() as cursor:
+            for model, key in indexes + list(reversed(list(ARCHIVE_MODELS.items()))):
+                cursor.execute(
+                    f'DELETE FROM {model._meta.db_table} WHERE {key} >= %s AND {key} <= %s;', [start_block, end_block]
+                )
+
+        tables = meta['tables']
+        return ArchiveSegment.objects.create(
+            start_block=start_block, end_block=end_block, start_time=stats['start_time'], end_time=stats['end_time'],
+            path=name, size_bytes=os.path.getsize(path),
+            total_blocks=tables[EOSBlock._meta.db_table]['rows'],
+            total_transactions=tables[EOSTransaction._meta.db_table]['rows'],
+            total_actions=tables[EOSAction._meta.db_table]['rows'],
+            **_segment_index(txids, action_ids)
+        )
+
+
+def archive_ranges(start_block: int, end_block: int) -> List[Tuple[int, int]]:
+    """
+    Split the blocks ``start_block`` to ``end_block`` (inclusive) into the ranges which :func:`.archive_blocks` would
+    archive - aligned to ``ARCHIVE_BLOCKS``, and trimmed around any block ranges which are already archived.
+    """
+    size = settings.ARCHIVE_BLOCKS
+    existing = list(
+        ArchiveSegment.objects.filter(start_block__lte=end_block, end_block__gte=start_block)
+        .order_by('start_block').values_list('start_block', 'end_block')
+    )
+    ranges = []
+    for slot in range((start_block // size) * size, end_block + 1, size):
+        s, slot_end = max(slot, start_block), min(slot + size - 1, end_block)
+        for seg_start, seg_end in existing:
+            if seg_end < s or seg_start > slot_end:
+                continue
+            if seg_start > s:
+                ranges.append((s, seg_start - 1))
+            s = max(s, seg_end + 1)
+        if s <= slot_end:
+            ranges.append((s, slot_end))
+    return ranges
+
+
+def archive_blocks(before_block: int, start_block: int = None) -> List[ArchiveSegment]:
+    """
+    Archive every block lower than ``before_block`` (optionally only from ``start_block``), one ``ARCHIVE_BLOCKS``
+    range at a time. Returns the segments which were created.
+    """
+    if start_block is None:
+        start_block = EOSBlock.objects.aggregate(lowest=Min('number'))['lowest']
+        if start_block is None:
+            return []
+    segments = []
+    for s, e in archive_ranges(int(start_block), int(before_block) - 1):
+        log.info('Archiving blocks %d to %d...', s, e)
+        seg = archive_range(s, e)
+        if seg is None:
+            continue
+        log.info(' [+++] Archived %d blocks, %d transactions and %d actions into %s (%.1f MB)', seg.total_blocks,
+                 seg.total_transactions, seg.total_actions, seg.path, seg.size_bytes / 1024 / 1024)
+        segments.append(seg)
+    return segments
+
+
+def archived_ranges() -> List[Tuple[int, int]]:
+    """Returns each contiguous, inclusive range of block numbers which is stored in the archive files"""
+    ranges = []
+    for seg in ArchiveSegment.objects.defer('txid_filter').order_by('start_block'):
+        f = ArchiveFile(seg)
+        for g in f.groups(EOSBlock):
+            for number in f.column(EOSBlock, g, 'number'):
+                if len(ranges) > 0 and ranges[-1][1] == number - 1:
+                    ranges[-1] = (ranges[-1][0], number)
+                else:
+                    ranges.append((number, number))
+    return ranges
+
+
+def archived_overlap(start_block: int = None, end_block: int = None) -> Optional[Tuple[int, int]]:
+    """
+    The lowest and highest block number of the archive files overlapping the block range ``start_block`` to
+    ``end_block`` (inclusive, either end can be left open), or None if none of the range is archived.
+    """
+    segs = ArchiveSegment.objects.all()
+    if start_block is not None:
+        segs = segs.filter(end_block__gte=start_block)
+    if end_block is not None:
+        segs = segs.filter(start_block__lte=end_block)
+    bounds = segs.aggregate(start=Min('start_block'), end=Max('end_block'))
+    return None if bounds['start'] is None else (bounds['start'], bounds['end'])
+
+
+def json_contains(doc, query, top=True) -> bool:
+    """Python equivalent of PostgreSQL's jsonb containment operator (``doc @> query``)"""
+    if isinstance(query, dict):
+        return isinstance(doc, dict) and all(k in doc and json_contains(doc[k], v, False) for k, v in query.items())
+    if isinstance(query, list):
+        return isinstance(doc, list) and all(any(json_contains(d, q, False) for d in doc) for q in query)
+    if isinstance(doc, list) and top:
+        # Like PostgreSQL, a top level array contains a scalar which is one of its elements
+        return query in doc
+    return doc == query
+
+
+def _matches(value, lookup: str, wanted) -> bool:
+    if lookup == 'exact':
+        return value == wanted
+    if lookup == 'contains':
+        return json_contains(value, wanted)
+    if lookup == 'in':
+        return value in wanted
+    if value is None:
+        return False
+    if lookup == 'gt':
+        return value > wanted
+    if lookup == 'gte':
+        return value >= wanted
+    if lookup == 'lt':
+        return value < wanted
+    return value <= wanted
+
+
+class ArchiveFile:
+    """Reads the columns of an archive file, caching each decoded column"""
+
+    def __init__(self, segment: ArchiveSegment):
+        self.segment = segment
+        self.path = _segment_path(segment.path)
+        self._raw: Dict[Tuple[str, int, str], list] = {}
+        self._columns: Dict[Tuple[str, int, str], list] = {}
+        with zipfile.ZipFile(self.path) as zf:
+            self.meta = json.loads(zf.read('_meta.json'))
+
+    def table(self, model) -> dict:
+        return self.meta['tables'][model._meta.db_table]
+
+    def groups(self, model, start_block: int = None, end_block: int = None) -> List[int]:
+        """The indexes of the row groups of ``model`` which can contain blocks within the given range"""
+        return [
+            i for i, g in enumerate(self.table(model)['groups'])
+            if (start_block is None or g['max_block'] >= start_block) and
+               (end_block is None or g['min_block'] <= end_block)
+        ]
+
+    def raw_column(self, model, group: int, name: str) -> list:
+        """The values of a column in a row group, as stored in the file (e.g. date/times as ISO strings)"""
+        k = (model._meta.db_table, group, name)
+        if k not in self._raw:
+            with zipfile.ZipFile(self.path) as zf:
+                self._raw[k] = json.loads(zf.read(f'{k[0]}/{group}/{name}.json'))
+        return self._raw[k]
+
+    def column(self, model, group: int, name: str) -> list:
+        """The decoded values of a column in a row group"""
+        k = (model._meta.db_table, group, name)
+        if k not in self._columns:
+            dec = _DECODERS.get(self.table(model)['columns'][name])
+            values = self.raw_column(model, group, name)
+            self._columns[k] = values if dec is None else [None if v is None else dec(v) for v in values]
+        return self._columns[k]
+
+    def instances(self, model, group: int, rows: Iterable[int]) -> List[Model]:
+        """Build (unsaved) model instances from the row numbers ``rows`` of row group ``group``"""
+        # Skip any columns which have since been removed from the model - any added since get their default
+        known = {f.attname for f in model._meta.concrete_fields}
+        names = [n for n in self.table(model)['columns'] if n in known]
+        # Only decode the values of the rows being built, rather than whole columns
+        columns = [self.raw_column(model, group, n) for n in names]
+        decoders = [_DECODERS.get(self.table(model)['columns'][n]) for n in names]
+        objs = []
+        for r in rows:
+            values = [c[r] if c[r] is None or dec is None else dec(c[r]) for c, dec in zip(columns, decoders)]
+            obj = model(**dict(zip(names, values)))
+            obj._state.adding = False
+            objs.append(obj)
+        return objs
+
+
+def _set_related(instance: Model, name: str, objs: list):
+    """Set the related objects of ``instance.<name>`` - like ``prefetch_related``, so they don't hit the database"""
+    qs = getattr(instance, name).all()
+    qs._result_cache, qs._prefetch_done = list(objs), True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = qs
+
+
+class ArchiveQuery:
+    """
+    The archived rows of ``model`` which match every one of ``predicates``, newest blocks first. Only the archive
+    files which overlap the block / time range are searched - all of them if no range is given.
+
+    Like a :class:`.QuerySet`, it can be counted and sliced (which is all that DRF's paginators need), and only
+    builds model instances for the rows in the slice.
+    """
+
+    def __init__(self, model, predicates: List[Predicate], start_block: int = None, end_block: int = None,
+                 start_time: datetime = None, end_time: datetime = None):
+        self.model, self.predicates = model, list(predicates)
+        self.start_block, self.end_block = start_block, end_block
+        self.start_time, self.end_time = start_time, end_time
+        self._files: Optional[List[ArchiveFile]] = None
+        self._refs: Optional[List[Tuple[ArchiveFile, int, int]]] = None
+
+    @property
+    def segments(self) -> QuerySet:
+        segs = ArchiveSegment.objects.all()
+        if self.start_block is not None:
+            segs = segs.filter(end_block__gte=self.start_block)
+        if self.end_block is not None:
+            segs = segs.filter(start_block__lte=self.end_block)
+        if self.start_time is not None:
+            segs = segs.filter(end_time__gte=self.start_time)
+        if self.end_time is not None:
+            segs = segs.filter(start_time__lte=self.end_time)
+        return segs.defer('txid_filter').order_by('-start_block')
+
+    @property
+    def files(self) -> List[ArchiveFile]:
+        if self._files is None:
+            self._files = [ArchiveFile(seg) for seg in self.segments]
+        return self._files
+
+    def _scan(self) -> List[Tuple[ArchiveFile, int, int]]:
+        """Returns ``(file, group, row)`` for each matching row, reading only the columns used by the predicates"""
+        key, refs = ARCHIVE_MODELS[self.model], []
+        preds = list(self.predicates)
+        if self.start_block is not None:
+            preds.append((key, 'gte', self.start_block))
+        if self.end_block is not None:
+            preds.append((key, 'lte', self.end_block))
+        if self.start_time is not None:
+            preds.append(('timestamp', 'gte', self.start_time))
+        if self.end_time is not None:
+            preds.append(('timestamp', 'lte', self.end_time))
+        for f in self.files:
+            for g in reversed(f.groups(self.model, self.start_block, self.end_block)):
+                rows = range(f.table(self.model)['groups'][g]['rows'])
+                for col, lookup, wanted in preds:
+                    values = f.column(self.model, g, col)
+                    rows = [r for r in rows if _matches(values[r], lookup, wanted)]
+                refs += [(f, g, r) for r in reversed(rows)]
+        return refs
+
+    @property
+    def refs(self) -> List[Tuple[ArchiveFile, int, int]]:
+        if self._refs is None:
+            self._refs = self._scan()
+        return self._refs
+
+    def count(self) -> int:
+        return len(self.refs)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[0:len(self)])
+
+    def __getitem__(self, k):
+        if isinstance(k, int):
+            return self[k:k + 1][0]
+        refs = self.refs[k]
+        # Build the instances one row group at a time, keeping the order of the rows
+        by_group: Dict[Tuple[ArchiveFile, int], List[int]] = {}
+        for f, g, r in refs:
+            by_group.setdefault((f, g), []).append(r)
+        built = {}
+        for (f, g), rows in by_group.items():
+            for r, obj in zip(rows, f.instances(self.model, g, rows)):
+                built[(f, g, r)] = obj
+        objs = [built[ref] for ref in refs]
+        self._attach_related(objs, refs)
+        return objs
+
+    def _attach_related(self, objs: list, refs: list):
+        """Attach each block's transactions / each transaction's actions from the same archive file"""
+        if self.model is EOSBlock:
+            child, fk, related = EOSTransaction, 'block_id', 'transactions'
+        elif self.model is EOSTransaction:
+            child, fk, related = EOSAction, 'transaction_id', 'actions'
+        else:
+            return
+        by_file: Dict[ArchiveFile, list] = {}
+        for obj, (f, _, _) in zip(objs, refs):
+            by_file.setdefault(f, []).append(obj)
+        for f, parents in by_file.items():
+            blocks = [getattr(p, ARCHIVE_MODELS[self.model]) for p in parents]
+            wanted = {p.pk for p in parents}
+            children = ArchiveQuery(child, [(fk, 'in', wanted)], start_block=min(blocks), end_block=max(blocks))
+            children._files = [f]
+            found: Dict[Any, list] = {}
+            for c in reversed(children[0:len(children)]):
+                found.setdefault(getattr(c, fk), []).append(c)
+            for p in parents:
+                _set_related(p, related, found.get(p.pk, []))
+
+
+def get_archived(model, pk) -> Optional[Model]:
+    """Find the archived ``model`` instance with the primary key ``pk``, or None if it isn't in the archive"""
+    try:
+        pk = model._meta.pk.to_python(pk)
+    except Exception:
+        return None
+    if model is EOSTransaction:
+        pk = str(pk).lower()
+    # A block can only be in the archive file whose range includes its number
+    bounds = dict(start_block=pk, end_block=pk) if model is EOSBlock else {}
+    q = ArchiveQuery(model, [(model._meta.pk.attname, 'exact', pk)], **bounds)
+    # Only open the files whose index says they may hold the transaction / action
+    if model is EOSTransaction:
+        q._files = [ArchiveFile(seg) for seg in txid_segments(pk).defer('txid_filter').order_by('-start_block')]
+    elif model is EOSAction:
+        q._files = [ArchiveFile(seg) for seg in action_segments(pk).defer('txid_filter').order_by('-start_block')]
+    return q[0] if len(q) > 0 else None
+
+
+class CombinedResults:
+    """
+    The rows of ``queryset`` from the database followed by the rows of ``archived``, which can be counted and sliced
+    like a :class:`.QuerySet`, so DRF's ``LimitOffsetPagination`` can page through both.
+
+    Archived blocks are always older than the blocks in the database, so this keeps them ordered newest first.
+    """
+
+    def __init__(self, queryset: QuerySet, archived: ArchiveQuery):
+        self.queryset, self.archived = queryset, archived
+        self._db_count = None
+
+    @property
+    def db_count(self) -> int:
+        if self._db_count is None:
+            self._db_count = self.queryset.count()
+        return self._db_count
+
+    def count(self) -> int:
+        return self.db_count + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[0:len(self)])
+
+    def __getitem__(self, k: slice):
+        start, stop = k.start or 0, len(self) if k.stop is None else k.stop
+        objs = []
+        if start < self.db_count:
+            objs += list(self.queryset[start:min(stop, self.db_count)])
+        if stop > self.db_count:
+            objs += self.archived[max(start - self.db_count, 0):stop - self.db_count]
+        return objs
@@ -0,0 +1,212 @@
+"""
+Functions for maintaining :class:`.AccountBalance` - the running balance of each account / token after every
+transfer which sent or received it, built from the transfer ledger (:class:`.EOSTransfer`).
+
+Each transfer adds a row for its sender (``-amount``) and receiver (``+amount``), holding the balance after that
+transfer, so the balance at any block is the newest row at or below it - see :func:`.balance_at`.
+
+Blocks are imported in any order, so :func:`.add_blocks` inserts the rows for a block on top of the newest balance
+before it, then adds the block's changes to every newer balance of the same account / token. While syncing near the
+head of the chain there are no newer rows, but a backfill behind existing history has to update every newer row - so
+disable ``BALANCE_HISTORY`` for large backfills, and :func:`.rebuild_balances` afterwards, which re-calculates the
+whole table with a single window function query.
+
+Concurrent imports changing the same account / token are serialised with transaction scoped advisory locks, which
+:func:`.add_blocks` / :func:`.remove_blocks` take (sorted) before updating anything, so they must be called before
+the producer statistics / rollups are updated in the same transaction.
+
+    >>> add_blocks(12345)                     # Add the transfers in block 12345 to the balances
+    >>> remove_blocks(12340, 12345)           # Remove the balances of blocks 12340 to 12345 before deleting them
+    >>> balance_at('john', 'eosio.token', 'EOS', 12345).quantity
+    '10.5000 EOS'
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from typing import Optional
+
+from django.db import connection, transaction
+
+from historyapp.lib import packing
+from historyapp.lib.archive import ArchiveFile
+from historyapp.lib.locking import LOCK_NS_BALANCE
+from historyapp.models import AccountBalance, EOSAction, EOSTransfer, ArchiveSegment
+import logging
+
+log = logging.getLogger(__name__)
+
+_balance_table = AccountBalance._meta.db_table
+_transfer_table = EOSTransfer._meta.db_table
+
+# The change to the sender's and receiver's balances from each transfer in a block range of the ledger
+_ledger_legs = f"""
+SELECT l.account, t.contract, t.symbol, max(t.precision) AS precision, t.block_number, t.action_id,
+       sum(l.delta) AS delta
+FROM {_transfer_table} AS t, LATERAL (VALUES (t.sender, -t.amount), (t.receiver, t.amount)) AS l (account, delta)
+WHERE t.block_number >= %(start)s AND t.block_number <= %(end)s AND l.account IS NOT NULL
+GROUP BY l.account, t.contract, t.symbol, t.block_number, t.action_id
+"""
+
+# Lock each account / token (as a 32-bit hash) found in ``{source}``, in ascending order
+query_lock_keys = f"""
+SELECT count(pg_advisory_xact_lock({LOCK_NS_BALANCE}, k)) FROM (
+    SELECT DISTINCT hashtext(account::text || ':' || contract::text || ':' || symbol::text) AS k
+    FROM ({{source}}) AS s
+    ORDER BY k
+) AS keys;
+"""
+
+query_insert_balances = f"""
+INSERT INTO {_balance_table} AS b (account, contract, symbol, precision, block_number, action_id, delta, balance)
+SELECT l.account, l.contract, l.symbol, l.precision, l.block_number, l.action_id, l.delta,
+       coalesce(p.balance, 0) + sum(l.delta) OVER (
+           PARTITION BY l.account, l.contract, l.symbol ORDER BY l.block_number, l.action_id
+       )
+FROM ({_ledger_legs}) AS l
+LEFT JOIN LATERAL (
+    SELECT balance FROM {_balance_table} AS pb
+    WHERE pb.account = l.account AND pb.contract = l.contract AND pb.symbol = l.symbol
+      AND pb.block_number < %(start)s
+    ORDER BY pb.block_number DESC, pb.action_id DESC
+    LIMIT 1
+) AS p ON true
+ON CONFLICT (account, contract, symbol, block_number, action_id) DO NOTHING;
+"""
+
+# Add the total change of each account / token in ``{source}`` to its balances after the block range
+query_shift_balances = f"""
+UPDATE {_balance_table} AS b SET balance = b.balance + %(sign)s * d.delta
+FROM (SELECT account, contract, symbol, sum(delta) AS delta FROM ({{source}}) AS s GROUP BY 1, 2, 3) AS d
+WHERE b.account = d.account AND b.contract = d.contract AND b.symbol = d.symbol AND b.block_number > %(end)s;
+"""
+
+_range_balances = f"""
+SELECT account, contract, symbol, delta FROM {_balance_table}
+WHERE block_number >= %(start)s AND block_number <= %(end)s
+"""
+
+# Every balance change, from the ``balance_legs`` temporary table filled by :func:`.rebuild_balances`
+query_rebuild_balances = f"""
+INSERT INTO {_balance_table} (account, contract, symbol, precision, block_number, action_id, delta, balance)
+SELECT account, contract, symbol, precision, block_number, action_id, delta,
+       sum(delta) OVER (PARTITION BY account, contract, symbol ORDER BY block_number, action_id)
+FROM (
+    SELECT account, contract, symbol, max(precision) AS precision, block_number, action_id, sum(delta) AS delta
+    FROM balance_legs
+    GROUP BY account, contract, symbol, block_number, action_id
+) AS l;
+"""
+
+
+def _block_range(start_block: int, end_block: int = None) -> dict:
+    start_block = int(start_block)
+    return dict(start=start_block, end=start_block if end_block is None else int(end_block))
+
+
+def add_blocks(start_block: int, end_block: int = None):
+    """
+    Add the balance changes from the transfers within the blocks ``start_block`` to ``end_block`` (inclusive). Must be
+    called in the same transaction which imports the block(s), after their transfers have been imported.
+    """
+    params = _block_range(start_block, end_block)
+    with connection.cursor() as cursor:
+        cursor.execute(query_lock_keys.format(source=_ledger_legs), params)
+        cursor.execute(query_insert_balances, params)
+        cursor.execute(query_shift_balances.format(source=_ledger_legs), dict(params, sign=1))
+
+
+def remove_blocks(start_block: int, end_block: int = None):
+    """
+    Remove the balance changes within the blocks ``start_block`` to ``end_block`` (inclusive), and subtract them from
+    every newer balance. Must be called in the same transaction which deletes the block(s).
+    """
+    params = _block_range(start_block, end_block)
+    with connection.cursor() as cursor:
+        cursor.execute(query_lock_keys.format(source=_range_balances), params)
+        cursor.execute(query_shift_balances.format(source=_range_balances), dict(params, sign=-1))
+        cursor.execute(f'DELETE FROM {_balance_table} WHERE block_number >= %(start)s AND block_number <= %(end)s;',
+                       params)
+
+
+def balance_at(account: str, contract: str, symbol: str, block: int = None) -> Optional[AccountBalance]:
+    """
+    The newest :class:`.AccountBalance` of ``account`` for the token ``contract`` / ``symbol`` at or below the block
+    ``block`` (default: the latest), or ``None`` if the account hasn't sent or received the token by then.
+    """
+    qs = AccountBalance.objects.filter(account=account, contract=contract, symbol=symbol)
+    if block is not None:
+        qs = qs.filter(block_number__lte=int(block))
+    return qs.order_by('-block_number', '-action_id').first()
+
+
+def _add_archived_legs(cursor, segment: ArchiveSegment):
+    """Insert the balance changes from the transfer actions stored in the archive file of ``segment``"""
+    f = ArchiveFile(segment)
+    for g in f.groups(EOSAction):
+        names = f.raw_column(EOSAction, g, 'name')
+        rows = [i for i, n in enumerate(names) if n == 'transfer']
+        if len(rows) == 0:
+            continue
+        ids, blocks, contracts, senders, receivers, data = (
+            f.column(EOSAction, g, c) for c in ('id', 'block_number', 'account', 'tx_from', 'tx_to', 'data')
+        )
+        legs = []
+        for i in rows:
+            asset = packing.parse_asset(data[i].get('quantity')) if isinstance(data[i], dict) else None
+            if asset is None:
+                continue
+            amount, precision, symbol = asset
+            for account, delta in ((senders[i], -amount), (receivers[i], amount)):
+                if account is not None:
+                    legs.append((account, contracts[i], symbol, precision, blocks[i], ids[i], delta))
+        if len(legs) == 0:
+            continue
+        cols = list(zip(*legs))
+        cursor.execute(
+            'INSERT INTO balance_legs SELECT * FROM unnest('
+            '%s::bigint[], %s::bigint[], %s::bigint[], %s::smallint[], %s::bigint[], %s::bigint[], %s::bigint[]);',
+            [
+                [packing.name_to_bigint(a) for a in cols[0]], [packing.name_to_bigint(c) for c in cols[1]],
+                [packing.symbol_code_to_int(s) for s in cols[2]], list(cols[3]), list(cols[4]), list(cols[5]),
+                list(cols[6]),
+            ]
+        )
+
+
+def rebuild_balances() -> int:
+    """
+    Re-calculate every balance from scratch - from the archive files, and the transfer ledger. Returns the number
+    of balance rows.
+
+    Runs in a single transaction, so the API keeps serving the old balances until it's done. The importer may keep
+    running - it waits for the rebuild to commit before updating the balances of the blocks it imports.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        # EXCLUSIVE mode still allows reads, but makes the importer wait until the rebuild is committed
+        cursor.execute(f'LOCK TABLE {_balance_table} IN EXCLUSIVE MODE;')
+        cursor.execute(f'DELETE FROM {_balance_table};')
+        cursor.execute(
+            'CREATE TEMPORARY TABLE balance_legs (account bigint, contract bigint, symbol bigint, precision smallint, '
+            'block_number bigint, action_id bigint, delta bigint) ON COMMIT DROP;'
+        )
+        for seg in ArchiveSegment.objects.order_by('start_block'):
+            log.info('Reading transfers from archived blocks %d to %d...', seg.start_block, seg.end_block)
+            _add_archived_legs(cursor, seg)
+        log.info('Reading transfers from the transfer ledger...')
+        cursor.execute(f'INSERT INTO balance_legs {_ledger_legs};', dict(start=0, end=2 ** 62))
+        log.info('Calculating running balances...')
+        cursor.execute(query_rebuild_balances)
+        return cursor.rowcount
@@ -0,0 +1,136 @@
+"""
+Functions for converting a time into a block number, so time range filters can be answered with a block number
+range scan (on the block table's primary key, or the transaction / action tables' block number columns), instead of
+range scanning - or joining through to - an unindexed timestamp column.
+
+Block timestamps only ever increase with the block number, and EOS produces a block every 500ms, so the block at a
+given time is almost always exactly ``(time - known_time) / 0.5s`` blocks away from any block whose time is known. The
+search starts from a cached anchor block near the requested time (one per hour, see ``BLOCK_TIME_CACHE``), guesses
+the block number from that, and then narrows it down with interpolation / binary search - each step being a single
+primary key lookup of the first block at or after a number, so missed slots and un-imported block ranges are simply
+skipped over. Anchors are only used as a starting guess, so a stale anchor can't make the result wrong.
+
+    >>> first_block_after(datetime(2019, 11, 1, tzinfo=timezone.utc))                 # The first block >= the time
+    84625371
+    >>> block_range(datetime(2019, 11, 1, tzinfo=timezone.utc), 'lte')                # A time filter as block bounds
+    (None, 84625371)
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Max
+
+from historyapp.models import EOSBlock
+import logging
+
+log = logging.getLogger(__name__)
+
+BLOCK_INTERVAL = timedelta(milliseconds=500)
+"""The time between two consecutive blocks when no slots are missed"""
+
+ANCHOR_PERIOD = 3600
+"""The length (in seconds) of the time period which each cached anchor block covers"""
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _anchor_key(dt: datetime) -> str:
+    return f'eoshist_blocktime:{int((dt - _EPOCH).total_seconds()) // ANCHOR_PERIOD}'
+
+
+def _probe(number: int) -> Optional[Tuple[int, datetime]]:
+    """The number and timestamp of the first block in the database at or after the block ``number``"""
+    return EOSBlock.objects.filter(number__gte=number).order_by('number').values_list('number', 'timestamp').first()
+
+
+def _probe_before(number: int) -> Optional[Tuple[int, datetime]]:
+    """The number and timestamp of the last block in the database before the block ``number``"""
+    return EOSBlock.objects.filter(number__lt=number).order_by('-number').values_list('number', 'timestamp').first()
+
+
+def _guess(known: Tuple[int, datetime], dt: datetime) -> int:
+    """Where the block at ``dt`` would be, if no slots were missed between it and the ``known`` block"""
+    return known[0] + round((dt - known[1]) / BLOCK_INTERVAL)
+
+
+def first_block_after(dt: datetime, inclusive: bool = True) -> Optional[int]:
+    """
+    Returns the number of the first block in the database whose timestamp is at or after ``dt`` (or strictly after,
+    if ``inclusive`` is False), or ``None`` if there isn't one.
+    """
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    bounds = EOSBlock.objects.aggregate(lowest=Min('number'), highest=Max('number'))
+    if bounds['lowest'] is None:
+        return None
+
+    def matches(t: datetime) -> bool:
+        return t >= dt if inclusive else t > dt
+
+    # The answer is the smallest ``lo`` where the first block at or after ``lo`` matches (``highest + 1`` = none)
+    lo, hi = bounds['lowest'], bounds['highest'] + 1
+    known, found, step = cache.get(_anchor_key(dt)), None, 0
+    while lo < hi:
+        step += 1
+        if known is None or step % 3 == 0:
+            # Fall back to bisecting every few steps, so a bad guess can't make the search linear
+            mid = (lo + hi) // 2
+        else:
+            mid = min(max(_guess(known, dt), lo), hi - 1)
+        p = _probe(mid)
+        if p is not None and not matches(p[1]):
+            # Every block from ``mid`` up to ``p`` is before ``dt``
+            lo, known = p[0] + 1, p
+            continue
+        hi, found = mid, p
+        if p is None or p[0] > mid:
+            # The probe landed in a range of missing blocks - the block before the range settles which side it's on
+            step += 1
+            b = _probe_before(mid)
+            if b is None or not matches(b[1]):
+                break
+            hi, found = b[0], b
+        known = found
+
+    # ``found`` is always the first block at or after ``hi`` - the first matching block
+    if found is not None:
+        cache.set(_anchor_key(dt), found, timeout=settings.BLOCK_TIME_CACHE)
+    log.debug('Resolved time %s to block %s in %d steps', dt, found, step)
+    return None if found is None else found[0]
+
+
+def block_range(dt: datetime, lookup: str = 'exact') -> Tuple[Optional[int], Optional[int]]:
+    """
+    Converts the time filter ``timestamp__<lookup> = dt`` (``lookup`` being ``exact``, ``gt``, ``gte``, ``lt`` or
+    ``lte``) into the inclusive block number range ``(start, end)`` holding the matching blocks - either may be
+    ``None`` when there's no bound on that side.
+
+    If no block could match, ``start`` is greater than ``end``.
+    """
+    start, end = None, None
+    if lookup in ('exact', 'gte', 'gt'):
+        start = first_block_after(dt, inclusive=lookup != 'gt')
+        if start is None:
+            return 1, 0
+    if lookup in ('exact', 'lte', 'lt'):
+        after = first_block_after(dt, inclusive=lookup == 'lt')
+        end = None if after is None else after - 1
+    return start, end
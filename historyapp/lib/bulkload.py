@@ -0,0 +1,266 @@
+"""
+Bulk-load mode - drop the secondary indexes of the history tables while backfilling, then rebuild them in parallel.
+
+Every imported row has to update each index on its table, which for the action table (with its many ``db_index``
+columns and GIN index) costs far more than inserting the row itself. :func:`.drop_indexes` drops every secondary
+index which the importer doesn't need, recording each one's definition as a :class:`.DeferredIndex` in the same
+transaction. Once the backfill is done, :func:`.rebuild_indexes` re-creates them several at a time.
+
+By default, indexes are rebuilt with a plain ``CREATE INDEX`` - the tables can still be read (e.g. by the API), but
+writes wait until the build finishes, so stop the importer first. Several indexes can be built on the same table at
+once, and each build is atomic.
+
+With ``concurrently=True``, they're rebuilt with ``CREATE INDEX CONCURRENTLY`` instead, so the importer can keep
+running. That's slower, and PostgreSQL only allows one concurrent build per table at a time (they deadlock otherwise),
+so the indexes of each table are built one after another. A concurrent build which is interrupted leaves an invalid
+index behind, which is dropped and re-built when resuming.
+
+Either way, a :class:`.DeferredIndex` row is only deleted once its index exists, so re-running
+:func:`.rebuild_indexes` after a crash resumes where it left off.
+
+Primary keys, unique indexes / constraints, and :py:attr:`.KEEP_COLUMNS` are never dropped, as the importer relies on
+them for lookups and ``ON CONFLICT``.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Tuple, Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from historyapp.models import EOSBlock, EOSTransaction, EOSAction, AccountAction, EOSTransfer, DeferredIndex
+import logging
+
+log = logging.getLogger(__name__)
+
+BULK_LOAD_TABLES = [m._meta.db_table for m in (EOSBlock, EOSTransaction, EOSAction, AccountAction, EOSTransfer)]
+"""The tables whose secondary indexes are dropped during a bulk load"""
+
+KEEP_COLUMNS = {
+    EOSTransaction._meta.db_table: {'block_id'},
+    # The transfer rollups are aggregated from each imported block's actions
+    EOSAction._meta.db_table: {'block_number'},
+    # The running balances are calculated from each imported block's transfers
+    EOSTransfer._meta.db_table: {'block_number'},
+}
+"""Table -> columns whose indexes are kept, as the importer looks rows up by them (e.g. counting a block's TXs)"""
+
+query_secondary_indexes = """
+SELECT ci.relname, pg_get_indexdef(i.indexrelid), a.attname
+FROM pg_index i
+    JOIN pg_class ci ON ci.oid = i.indexrelid
+    JOIN pg_class ct ON ct.oid = i.indrelid
+    LEFT JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+WHERE ct.relname = %s AND pg_table_is_visible(ct.oid) AND NOT i.indisunique AND NOT i.indisprimary
+    AND NOT EXISTS(SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    AND NOT EXISTS(SELECT 1 FROM pg_inherits h WHERE h.inhrelid = i.indexrelid);
+"""
+
+query_index_state = """
+SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+WHERE c.relname = %s AND pg_table_is_visible(c.oid);
+"""
+
+query_partitions = """
+SELECT c.relname FROM pg_inherits h JOIN pg_class c ON c.oid = h.inhrelid WHERE h.inhparent = %s::regclass;
+"""
+
+# The partitions whose index is already attached to a partitioned index
+query_attached = """
+SELECT ct.relname FROM pg_inherits h
+    JOIN pg_index i ON i.indexrelid = h.inhrelid JOIN pg_class ct ON ct.oid = i.indrelid
+WHERE h.inhparent = %s::regclass;
+"""
+
+query_progress = """
+SELECT c.relname, p.phase, p.blocks_done, p.blocks_total, p.tuples_done, p.tuples_total
+FROM pg_stat_progress_create_index p JOIN pg_class c ON c.oid = p.relid;
+"""
+
+_def_re = re.compile(r'^CREATE INDEX (\S+) ON (ONLY )?(\S+) (USING .*)$', re.IGNORECASE | re.DOTALL)
+
+
+def secondary_indexes(table: str) -> List[Tuple[str, str]]:
+    """Returns ``(name, definition)`` for each index on ``table`` which :func:`.drop_indexes` would drop"""
+    keep = KEEP_COLUMNS.get(table, set())
+    with connection.cursor() as cursor:
+        cursor.execute(query_secondary_indexes, [table])
+        return [(name, d) for name, d, first_col in cursor.fetchall() if first_col not in keep]
+
+
+def drop_indexes() -> List[DeferredIndex]:
+    """Record and drop the secondary indexes of :py:attr:`.BULK_LOAD_TABLES`. Returns the newly dropped indexes."""
+    dropped = []
+    for table in BULK_LOAD_TABLES:
+        for name, definition in secondary_indexes(table):
+            # Record the definition in the same transaction as the drop, so a crash can't lose it
+            with transaction.atomic(), connection.cursor() as cursor:
+                di = DeferredIndex.objects.create(name=name, table=table, definition=definition)
+                cursor.execute(f'DROP INDEX {name};')
+            log.info('Dropped index %s on %s', name, table)
+            dropped.append(di)
+    return dropped
+
+
+def _index_valid(cursor, name: str) -> Optional[bool]:
+    """Returns True/False for whether the index ``name`` is valid, or None if it doesn't exist"""
+    cursor.execute(query_index_state, [name])
+    row = cursor.fetchone()
+    return None if row is None else row[0]
+
+
+def _build_concurrently(cursor, name: str, table: str, using: str):
+    """Create an index concurrently, dropping any invalid copy left by an interrupted build first"""
+    valid = _index_valid(cursor, name)
+    if valid:
+        return
+    if valid is not None:
+        log.info('Dropping invalid index %s (left over from an interrupted build)', name)
+        cursor.execute(f'DROP INDEX {name};')
+    cursor.execute(f'CREATE INDEX CONCURRENTLY {name} ON {table} {using};')
+
+
+def _build_partitioned_concurrently(cursor, name: str, table: str, using: str):
+    """
+    Partitioned tables can't be indexed concurrently, so create an (invalid) index on the parent table only, then
+    build an index concurrently on each partition and attach it. The parent index becomes valid once they're all
+    attached.
+    """
+    if _index_valid(cursor, name) is None:
+        cursor.execute(f'CREATE INDEX {name} ON ONLY {table} {using};')
+    cursor.execute(query_attached, [name])
+    attached = {r[0] for r in cursor.fetchall()}
+    cursor.execute(query_partitions, [table])
+    for part, in cursor.fetchall():
+        if part in attached:
+            continue
+        # e.g. index ..._account_9a64f69d + partition historyapp_eosaction_b1000 -> ..._account_9a64f69d_b1000
+        base = table.split('.')[-1]
+        suffix = part[len(base):] if part.startswith(base) else f'_{part}'
+        child = f'{name[:63 - len(suffix)]}{suffix}'
+        _build_concurrently(cursor, child, part, using)
+        cursor.execute(f'ALTER INDEX {name} ATTACH PARTITION {child};')
+
+
+def rebuild_index(di: DeferredIndex, maintenance_mem: str = None, concurrently: bool = False):
+    """Re-create the dropped index ``di`` (unless it already exists), then delete its :class:`.DeferredIndex` row"""
+    m = _def_re.match(di.definition.strip().rstrip(';'))
+    if m is None:
+        raise ValueError(f'Cannot parse the definition of index {di.name}: {di.definition}')
+    # Partitioned indexes are defined 'ON ONLY <table>' - ONLY is left out of a plain build, so that it's built on
+    # every partition too
+    name, _, table, using = m.groups()
+
+    DeferredIndex.objects.filter(pk=di.pk).update(status='building', started_at=timezone.now(), error=None)
+    try:
+        with connection.cursor() as cursor:
+            if maintenance_mem:
+                cursor.execute('SET maintenance_work_mem = %s;', [maintenance_mem])
+            if not concurrently:
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} {using};')
+            else:
+                cursor.execute('SELECT EXISTS(SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass);',
+                               [table])
+                if cursor.fetchone()[0]:
+                    _build_partitioned_concurrently(cursor, name, table, using)
+                else:
+                    _build_concurrently(cursor, name, table, using)
+        DeferredIndex.objects.filter(pk=di.pk).delete()
+    except Exception as e:
+        DeferredIndex.objects.filter(pk=di.pk).update(status='failed', error=f'{type(e).__name__}: {e}')
+        raise
+    finally:
+        connection.close()
+
+
+def _rebuild_serially(indexes: List[DeferredIndex], maintenance_mem: str = None, concurrently: bool = False):
+    """Rebuild ``indexes`` one after another. Returns ``(built, failed)`` lists of them."""
+    built, failed = [], []
+    for di in indexes:
+        started = time.time()
+        try:
+            rebuild_index(di, maintenance_mem, concurrently)
+            built.append(di)
+            log.info(' [+++] Rebuilt index %s on %s in %.0fs', di.name, di.table, time.time() - started)
+        except Exception as e:
+            log.error(' !!! Failed to rebuild index %s on %s: %s %s', di.name, di.table, type(e), str(e))
+            failed.append(di)
+    return built, failed
+
+
+def _table_size(table: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_total_relation_size(%s::regclass);', [table])
+        return cursor.fetchone()[0]
+
+
+def log_progress():
+    """Log the progress of each index currently being built (from ``pg_stat_progress_create_index``)"""
+    with connection.cursor() as cursor:
+        cursor.execute(query_progress)
+        rows = cursor.fetchall()
+    for table, phase, blocks_done, blocks_total, tuples_done, tuples_total in rows:
+        if blocks_total:
+            done = f'{blocks_done / blocks_total * 100:.1f}% of {blocks_total} blocks'
+        elif tuples_total:
+            done = f'{tuples_done / tuples_total * 100:.1f}% of {tuples_total} tuples'
+        else:
+            done = 'starting'
+        log.info('    ... index build on %s: %s (%s)', table, phase, done)
+
+
+def rebuild_indexes(workers: int = 4, maintenance_mem: str = None, progress_secs: float = 30,
+                    concurrently: bool = False) -> Tuple[int, int]:
+    """
+    Rebuild every :class:`.DeferredIndex` (including any which failed, or were interrupted), using up to ``workers``
+    database connections at once. The indexes on the largest tables are started first.
+
+    With ``concurrently=True``, indexes are built with ``CREATE INDEX CONCURRENTLY``, one table's indexes at a time
+    per worker (see the module docs).
+
+    Returns the amount of indexes ``(rebuilt, failed)``.
+    """
+    pending = list(DeferredIndex.objects.all())
+    if len(pending) == 0:
+        return 0, 0
+    sizes = {t: _table_size(t) for t in {di.table for di in pending}}
+    pending.sort(key=lambda di: sizes[di.table], reverse=True)
+    # Each job is a list of indexes to build one after another - a whole table's when building concurrently
+    if concurrently:
+        jobs = [[di for di in pending if di.table == t] for t in sorted(sizes, key=sizes.get, reverse=True)]
+    else:
+        jobs = [[di] for di in pending]
+
+    log.info('Rebuilding %d indexes using %d workers%s...', len(pending), workers,
+             ' (concurrently)' if concurrently else '')
+    built, failed, started = 0, 0, time.time()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_rebuild_serially, job, maintenance_mem, concurrently) for job in jobs]
+        while len(futures) > 0:
+            done, _ = wait(futures, timeout=progress_secs, return_when=FIRST_COMPLETED)
+            for f in done:
+                futures.remove(f)
+                job_built, job_failed = f.result()
+                built, failed = built + len(job_built), failed + len(job_failed)
+                log.info('    ... %d / %d indexes done (%.0fs elapsed)',
+                         built + failed, len(pending), time.time() - started)
+            if len(done) == 0:
+                log_progress()
+    return built, failed
@@ -0,0 +1,166 @@
+"""
+Functions for reading and updating the persisted ``sync_blocks`` progress (:class:`.SyncCheckpoint`)
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from datetime import timedelta
+from decimal import Decimal
+from typing import Optional
+
+from django.db.models import F, Value, FloatField
+from django.db.models.functions import Greatest, Coalesce
+from django.utils import timezone
+from privex.helpers import empty
+
+from historyapp.lib import coverage
+from historyapp.models import SyncCheckpoint
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def get_checkpoint(queue: str) -> SyncCheckpoint:
+    """Get the :class:`.SyncCheckpoint` for ``queue``, creating an empty one if it doesn't exist yet"""
+    cp, _ = SyncCheckpoint.objects.get_or_create(queue=queue)
+    return cp
+
+
+def resume_block(queue: str) -> Optional[int]:
+    """
+    Returns the block number which ``sync_blocks`` should continue queueing from for ``queue``, or ``None`` if
+    there's no record of any blocks being imported yet.
+
+    Blocks which were already queued are never returned again - any queued blocks which failed to import are
+    left as gaps, which are picked up by the gap filler.
+    """
+    cp = SyncCheckpoint.objects.filter(queue=queue).values_list('queued_block', 'committed_block').first()
+    blocks = [] if cp is None else [b for b in cp if b is not None]
+    if len(blocks) > 0:
+        return max(blocks) + 1
+    # No checkpoint exists for this queue (e.g. first run after upgrading) - fall back to the block coverage table.
+    last_block = coverage.highest_block()
+    return None if last_block is None else last_block + 1
+
+
+def start_run(queue: str, start_block: int, target_block: int) -> SyncCheckpoint:
+    """Record the start of a new ``sync_blocks`` run, resetting the progress counters used by :func:`.progress`"""
+    cp = get_checkpoint(queue)
+    cp.start_block, cp.target_block, cp.run_started_at = start_block, target_block, timezone.now()
+    cp.run_blocks_committed = cp.blocks_committed
+    cp.save()
+    return cp
+
+
+def record_queued(queue: str, block: int):
+    """Record that every block up to and including ``block`` has now been queued for import on ``queue``"""
+    SyncCheckpoint.objects.filter(queue=queue).update(
+        queued_block=Greatest(Coalesce(F('queued_block'), int(block)), int(block)), updated_at=timezone.now()
+    )
+
+
+STATS_WEIGHT = 0.1
+"""How much weight each new sample has in the moving averages :py:attr:`.SyncCheckpoint.avg_rpc_ms` / ``avg_db_ms``"""
+
+
+def _moving_avg(field: str, sample: float, weight: float = STATS_WEIGHT):
+    sample = Value(float(sample), output_field=FloatField())
+    return Coalesce(F(field) * (1 - weight) + sample * weight, sample)
+
+
+def record_commit(queue: str, block: int, rpc_ms: float = None, db_ms: float = None):
+    """
+    Record that ``block`` has been imported from ``queue``. Every import updates the same row, so this should be
+    called once the block's import transaction has committed (e.g. with :func:`django.db.transaction.on_commit`),
+    so that the row is only locked for the duration of this single update.
+
+    :param str queue: The Celery queue name the block was imported from (does nothing if empty)
+    :param int block: The block number which was imported
+    :param float rpc_ms: How long it took to fetch the block from the RPC node (milliseconds)
+    :param float db_ms: How long was spent writing the block to the database (milliseconds)
+    """
+    if empty(queue):
+        return
+    updates = dict(
+        committed_block=Greatest(Coalesce(F('committed_block'), int(block)), int(block)),
+        blocks_committed=F('blocks_committed') + 1,
+        updated_at=timezone.now()
+    )
+    if rpc_ms is not None: updates['avg_rpc_ms'] = _moving_avg('avg_rpc_ms', rpc_ms)
+    if db_ms is not None: updates['avg_db_ms'] = _moving_avg('avg_db_ms', db_ms)
+    SyncCheckpoint.objects.filter(queue=queue).update(**updates)
+
+
+def record_commits(queue: str, count: int, block: int, rpc_ms: float = None, db_ms: float = None, failed: int = 0):
+    """
+    Batched version of :func:`.record_commit` / :func:`.record_failure`, used to flush a worker's in-memory counters
+    (see :mod:`historyapp.lib.workerstats`).
+
+    :param str queue: The Celery queue name the blocks were imported from (does nothing if empty)
+    :param int count: How many blocks were imported
+    :param int block: The highest block number which was imported
+    :param float rpc_ms: The average RPC latency of the imported blocks (milliseconds)
+    :param float db_ms: The average DB time of the imported blocks (milliseconds)
+    :param int failed: How many block import attempts failed
+    """
+    if empty(queue) or (count == 0 and failed == 0):
+        return
+    updates = dict(blocks_committed=F('blocks_committed') + count, blocks_failed=F('blocks_failed') + failed,
+                   updated_at=timezone.now())
+    if block is not None:
+        updates['committed_block'] = Greatest(Coalesce(F('committed_block'), int(block)), int(block))
+    # Weight the batch average as if each block had been added to the moving average individually
+    weight = 1 - (1 - STATS_WEIGHT) ** max(count, 1)
+    if rpc_ms is not None: updates['avg_rpc_ms'] = _moving_avg('avg_rpc_ms', rpc_ms, weight)
+    if db_ms is not None: updates['avg_db_ms'] = _moving_avg('avg_db_ms', db_ms, weight)
+    SyncCheckpoint.objects.filter(queue=queue).update(**updates)
+
+
+def record_failure(queue: str):
+    """Record that an attempt to import a block from ``queue`` failed (must be called outside of the import transaction)"""
+    if empty(queue):
+        return
+    SyncCheckpoint.objects.filter(queue=queue).update(blocks_failed=F('blocks_failed') + 1)
+
+
+def progress(queue: str) -> dict:
+    """
+    Calculate the progress of the current ``sync_blocks`` run for ``queue`` from its checkpoint.
+
+    Example::
+
+        >>> p = progress('eoshist')
+        >>> p['blocks_per_sec'], p['eta_secs'], p['eta']
+        (Decimal('85.2'), 1234, datetime.datetime(2020, 1, 1, 12, 0, tzinfo=<UTC>))
+
+    :param str queue: The Celery queue name to calculate progress for
+    :return dict progress: A dict containing ``committed``, ``remaining``, ``blocks_per_sec``, ``eta_secs`` and ``eta``
+    """
+    cp = get_checkpoint(queue)
+    committed = cp.blocks_committed - cp.run_blocks_committed
+    res = dict(committed=committed, remaining=None, blocks_per_sec=Decimal(0), eta_secs=None, eta=None)
+    if cp.run_started_at is None or cp.start_block is None or cp.target_block is None:
+        return res
+    res['remaining'] = max((cp.target_block - cp.start_block) - committed, 0)
+
+    time_taken_sec = (timezone.now() - cp.run_started_at).total_seconds()
+    if time_taken_sec <= 0 or committed <= 0:
+        return res
+    bps = Decimal(committed / time_taken_sec)
+    res['blocks_per_sec'] = bps
+    res['eta_secs'] = int(res['remaining'] // bps)
+    res['eta'] = timezone.now() + timedelta(seconds=res['eta_secs'])
+    return res
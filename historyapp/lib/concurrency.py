@@ -0,0 +1,129 @@
+"""
+Adaptive concurrency control for ``sync_blocks``, adjusting how many blocks may be in-flight (queued but not yet
+imported) based on the latency and error rate reported back by the importer through :class:`.SyncCheckpoint`.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from historyapp.models import SyncCheckpoint
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class AIMDController:
+    """
+    A simple AIMD (additive increase, multiplicative decrease) controller for the ``sync_blocks`` in-flight window.
+
+    After each round of queueing, :meth:`.update` is passed the importer's latest statistics. If RPC latency,
+    DB latency or the error rate are above their targets, the window is multiplied by ``decrease`` - otherwise it's
+    grown by ``increase``. The window is always kept between ``min_window`` and ``max_window``.
+
+        >>> ctl = AIMDController(window=500)
+        >>> ctl.update(rpc_ms=200, db_ms=80, error_rate=0.0)
+        525
+        >>> ctl.update(rpc_ms=4000, db_ms=80, error_rate=0.0)
+        262
+
+    """
+    def __init__(self, window: int = None, min_window: int = None, max_window: int = None, increase: int = None,
+                 decrease: float = None, target_rpc_ms: int = None, target_db_ms: int = None,
+                 max_error_rate: float = None):
+        self.min_window = settings.SYNC_WINDOW_MIN if min_window is None else int(min_window)
+        self.max_window = settings.SYNC_WINDOW_MAX if max_window is None else int(max_window)
+        self.increase = settings.SYNC_WINDOW_INCREASE if increase is None else int(increase)
+        self.decrease = settings.SYNC_WINDOW_DECREASE if decrease is None else float(decrease)
+        self.target_rpc_ms = settings.SYNC_TARGET_RPC_MS if target_rpc_ms is None else target_rpc_ms
+        self.target_db_ms = settings.SYNC_TARGET_DB_MS if target_db_ms is None else target_db_ms
+        self.max_error_rate = settings.SYNC_MAX_ERROR_RATE if max_error_rate is None else max_error_rate
+
+        window = settings.EOS_SYNC_MAX_QUEUE if window is None else int(window)
+        self.window = self._clamp(window)
+        self.reason = 'initial'
+
+    def _clamp(self, window: int) -> int:
+        return max(self.min_window, min(self.max_window, int(window)))
+
+    def _overloaded(self, rpc_ms: Optional[float], db_ms: Optional[float], error_rate: Optional[float]) -> Optional[str]:
+        if error_rate is not None and error_rate > self.max_error_rate:
+            return f'error rate {error_rate:.2%} > {self.max_error_rate:.2%}'
+        if rpc_ms is not None and rpc_ms > self.target_rpc_ms:
+            return f'RPC latency {rpc_ms:.0f}ms > {self.target_rpc_ms}ms'
+        if db_ms is not None and db_ms > self.target_db_ms:
+            return f'DB latency {db_ms:.0f}ms > {self.target_db_ms}ms'
+        return None
+
+    def update(self, rpc_ms: float = None, db_ms: float = None, error_rate: float = None) -> int:
+        """
+        Adjust the window based on the latest importer statistics, and return the new window.
+
+        :param float rpc_ms: Average RPC latency (milliseconds) for fetching a block
+        :param float db_ms: Average DB time (milliseconds) spent importing a block
+        :param float error_rate: Fraction of block imports which failed since the last update (0.0 to 1.0)
+        :return int window: The new in-flight window
+        """
+        old_window = self.window
+        overload = self._overloaded(rpc_ms, db_ms, error_rate)
+        if overload is not None:
+            self.window = self._clamp(self.window * self.decrease)
+            self.reason = f'decrease: {overload}'
+        else:
+            self.window = self._clamp(self.window + self.increase)
+            self.reason = 'increase: importer healthy'
+        if self.window != old_window:
+            log.info(' >>> Adaptive concurrency: window %d -> %d (%s)', old_window, self.window, self.reason)
+        else:
+            log.debug(' >>> Adaptive concurrency: window unchanged at %d (%s)', self.window, self.reason)
+        return self.window
+
+
+def checkpoint_stats(queue: str, last: Tuple[int, int] = None) -> Tuple[dict, Tuple[int, int]]:
+    """
+    Read the importer statistics for ``queue`` from its :class:`.SyncCheckpoint`, for use with
+    :meth:`.AIMDController.update`.
+
+    The error rate is calculated from the committed/failed counters, relative to the counters passed as ``last``
+    (from the previous call), so it reflects only the most recent round.
+
+        >>> stats, counters = checkpoint_stats('eoshist')
+        >>> # ... queue some blocks ...
+        >>> stats, counters = checkpoint_stats('eoshist', last=counters)
+        >>> controller.update(**stats)
+
+    :param str queue: The Celery queue name to read the checkpoint for
+    :param tuple last: The ``(blocks_committed, blocks_failed)`` counters returned by the previous call
+    :return tuple result: A tuple of ``(stats: dict, counters: tuple)``
+    """
+    cp = SyncCheckpoint.objects.filter(queue=queue).values(
+        'avg_rpc_ms', 'avg_db_ms', 'blocks_committed', 'blocks_failed'
+    ).first()
+    if cp is None:
+        return dict(), (0, 0)
+    counters = (cp['blocks_committed'], cp['blocks_failed'])
+    error_rate = None
+    if last is not None:
+        committed, failed = counters[0] - last[0], counters[1] - last[1]
+        error_rate = failed / (committed + failed) if (committed + failed) > 0 else None
+    return dict(rpc_ms=cp['avg_rpc_ms'], db_ms=cp['avg_db_ms'], error_rate=error_rate), counters
+
+
+def save_window(queue: str, controller: AIMDController):
+    """Persist the controller's current window and the reason for its last decision to the queue's checkpoint"""
+    SyncCheckpoint.objects.filter(queue=queue).update(window=controller.window, window_reason=controller.reason)
@@ -0,0 +1,224 @@
+"""
+Functions for maintaining the block coverage table :class:`.EOSBlockRange`, which tracks which block numbers have
+been fully imported as a compact list of contiguous ranges.
+
+The importer calls :func:`.cover_blocks` inside of the same database transaction that imports a block, so the coverage
+table is always consistent with the committed contents of :class:`.EOSBlock`. Gap detection (:func:`.find_gaps`)
+then only has to read the (usually tiny) range table, rather than sorting every row in the block table.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from typing import List, Tuple, Optional
+
+from django.db import connection, transaction
+
+from historyapp.lib.archive import archived_ranges
+from historyapp.lib.prepared import UPSERT_RANGE
+from historyapp.models import EOSBlock, EOSBlockRange
+import logging
+
+log = logging.getLogger(__name__)
+
+_range_table = EOSBlockRange._meta.db_table
+_block_table = EOSBlock._meta.db_table
+
+query_rebuild_ranges = f"""
+INSERT INTO {_range_table} (start_block, end_block, updated_at)
+SELECT min(number), max(number), now() FROM (
+    SELECT number, number - row_number() OVER (ORDER BY number) AS grp FROM {_block_table}
+) AS islands
+GROUP BY grp;
+"""
+
+
+def _upsert_range(start_block: int, end_block: int):
+    with connection.cursor() as cursor:
+        UPSERT_RANGE.execute(cursor, int(start_block), int(end_block))
+
+
+def cover_blocks(start_block: int, end_block: int = None):
+    """
+    Mark the inclusive block range ``start_block`` to ``end_block`` as imported, merging it with any overlapping
+    or directly adjacent ranges.
+
+    This should be called inside of the same transaction which imports the block(s), so that the range only
+    becomes visible once the blocks themselves have been committed.
+
+        >>> cover_blocks(12345)              # Mark the single block 12345 as imported
+        >>> cover_blocks(12346, 12400)       # Mark blocks 12346 to 12400 (inclusive) as imported
+
+    :param int start_block: The first block number to mark as imported
+    :param int end_block:   The last block number to mark as imported (inclusive). Defaults to ``start_block``
+    """
+    start_block = int(start_block)
+    end_block = start_block if end_block is None else int(end_block)
+
+    with transaction.atomic():
+        # Lock any ranges which we'd be merging with, in a consistent order to avoid deadlocks between workers
+        ranges = list(
+            EOSBlockRange.objects.select_for_update()
+                .filter(start_block__lte=end_block + 1, end_block__gte=start_block - 1)
+                .order_by('start_block')
+        )
+        if len(ranges) > 0:
+            start_block = min(start_block, ranges[0].start_block)
+            end_block = max(end_block, max(r.end_block for r in ranges))
+            EOSBlockRange.objects.filter(start_block__in=[r.start_block for r in ranges]).delete()
+        _upsert_range(start_block, end_block)
+
+
+def uncover_blocks(start_block: int, end_block: int = None):
+    """
+    Remove the inclusive block range ``start_block`` to ``end_block`` from the coverage table, splitting any ranges
+    which only partially overlap it. Used when blocks are deleted from the database.
+
+    :param int start_block: The first block number to mark as missing
+    :param int end_block:   The last block number to mark as missing (inclusive). Defaults to ``start_block``
+    """
+    start_block = int(start_block)
+    end_block = start_block if end_block is None else int(end_block)
+
+    with transaction.atomic():
+        ranges = list(
+            EOSBlockRange.objects.select_for_update()
+                .filter(start_block__lte=end_block, end_block__gte=start_block)
+                .order_by('start_block')
+        )
+        if len(ranges) == 0:
+            return
+        EOSBlockRange.objects.filter(start_block__in=[r.start_block for r in ranges]).delete()
+        for r in ranges:
+            if r.start_block < start_block:
+                _upsert_range(r.start_block, start_block - 1)
+            if r.end_block > end_block:
+                _upsert_range(end_block + 1, r.end_block)
+
+
+def compact_ranges() -> int:
+    """
+    Merge any adjacent or overlapping ranges in the coverage table into single rows.
+
+    Adjacent ranges can be left behind when two neighbouring blocks are committed at the same time by different
+    workers, as neither transaction can see the other's range while merging.
+
+    :return int merged: The amount of range rows which were merged away
+    """
+    merged = 0
+    with transaction.atomic():
+        ranges = list(
+            EOSBlockRange.objects.select_for_update().order_by('start_block').values_list('start_block', 'end_block')
+        )
+        if len(ranges) < 2:
+            return 0
+        cur_start, cur_end = ranges[0]
+        absorbed = []
+        for r_start, r_end in ranges[1:]:
+            if r_start <= cur_end + 1:
+                absorbed.append(r_start)
+                cur_end = max(cur_end, r_end)
+                continue
+            if len(absorbed) > 0:
+                EOSBlockRange.objects.filter(start_block__in=absorbed).delete()
+                EOSBlockRange.objects.filter(start_block=cur_start).update(end_block=cur_end)
+                merged += len(absorbed)
+                absorbed = []
+            cur_start, cur_end = r_start, r_end
+        if len(absorbed) > 0:
+            EOSBlockRange.objects.filter(start_block__in=absorbed).delete()
+            EOSBlockRange.objects.filter(start_block=cur_start).update(end_block=cur_end)
+            merged += len(absorbed)
+    if merged > 0:
+        log.debug('Merged %d adjacent block ranges in the coverage table', merged)
+    return merged
+
+
+def rebuild_ranges() -> int:
+    """
+    Rebuild the coverage table from scratch by scanning the entire :class:`.EOSBlock` table.
+
+    This is expensive on large databases (it's equivalent to the old full-table gap query), and should only be
+    needed if blocks were added/removed without going through the importer or the management commands.
+
+    Blocks which have been archived (see :mod:`historyapp.lib.archive`) are read from the archive files, so they
+    stay covered.
+
+    :return int total_ranges: The amount of contiguous ranges found
+    """
+    with transaction.atomic():
+        EOSBlockRange.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(query_rebuild_ranges)
+        for start_block, end_block in archived_ranges():
+            cover_blocks(start_block, end_block)
+    return EOSBlockRange.objects.count()
+
+
+def find_gaps(ignore_zero=True, below: int = None) -> List[Tuple[int, int]]:
+    """
+    Finds gaps in the block database using the coverage table. Each gap is returned as an inclusive
+    ``(gap_start, gap_end)`` tuple, ordered by ``gap_start`` descending (newest gaps first).
+
+    :param bool ignore_zero: If True, will skip the gap between 0 and the lowest block
+    :param int below: If specified, only return gaps (or the parts of gaps) which are before this block number
+    :return List[Tuple[int,int]] gaps: A list of ``(gap_start, gap_end)`` tuples
+    """
+    ranges = EOSBlockRange.objects.order_by('start_block').values_list('start_block', 'end_block')
+    gaps = []
+    last_end: Optional[int] = None
+    for r_start, r_end in ranges:
+        if last_end is None:
+            if not ignore_zero and r_start > 0:
+                gaps.append((0, r_start - 1))
+        elif r_start > last_end + 1:
+            gaps.append((last_end + 1, r_start - 1))
+        last_end = r_end if last_end is None else max(last_end, r_end)
+
+    if below is not None:
+        gaps = [(g_start, min(g_end, below - 1)) for g_start, g_end in gaps if g_start < below]
+    return list(reversed(gaps))
+
+
+def highest_block() -> Optional[int]:
+    """Returns the highest imported block number according to the coverage table, or ``None`` if it's empty"""
+    r = EOSBlockRange.objects.order_by('-end_block').values_list('end_block', flat=True).first()
+    return None if r is None else int(r)
+
+
+def missing_in_range(start_block: int, end_block: int) -> List[Tuple[int, int]]:
+    """
+    Find the gaps within the inclusive block range ``start_block`` to ``end_block``, using only the coverage ranges
+    which overlap it.
+
+        >>> missing_in_range(100, 200)      # Blocks 100-200 are fully imported
+        []
+        >>> missing_in_range(100, 300)      # Blocks 201-250 and 299-300 haven't been imported yet
+        [(201, 250), (299, 300)]
+
+    :return List[Tuple[int,int]] gaps: A list of inclusive ``(gap_start, gap_end)`` tuples, in ascending order
+    """
+    start_block, end_block = int(start_block), int(end_block)
+    ranges = EOSBlockRange.objects.filter(start_block__lte=end_block, end_block__gte=start_block) \
+        .order_by('start_block').values_list('start_block', 'end_block')
+    gaps = []
+    next_block = start_block
+    for r_start, r_end in ranges:
+        if r_start > next_block:
+            gaps.append((next_block, r_start - 1))
+        next_block = max(next_block, r_end + 1)
+    if next_block <= end_block:
+        gaps.append((next_block, end_block))
+    return gaps
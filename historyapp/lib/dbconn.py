@@ -0,0 +1,113 @@
+"""
+Database connection management and statistics for Celery worker processes.
+
+Django only recycles connections (``CONN_MAX_AGE``) at the start / end of HTTP requests, so Celery workers would
+otherwise hold on to the same connection forever - even after the database has restarted. :func:`.before_task` and
+:func:`.after_task` are connected to Celery's task signals in :mod:`historyapp.tasks` to do the same for each task,
+plus a health check for connections which have been sitting idle.
+
+Once :func:`.install` has been called, every new connection and every query is counted in :data:`.stats`, which is
+flushed to :class:`.WorkerStats` along with the worker's other import counters.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import time
+from threading import Lock
+from typing import Tuple
+
+from django.conf import settings
+from django.db import connections, close_old_connections
+from django.db.backends.signals import connection_created
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class DBStats:
+    """Per-process counters for database connections opened, and queries ran (plus their total time)"""
+    def __init__(self):
+        self.lock = Lock()
+        self.connects, self.queries, self.query_ms = 0, 0, 0.0
+
+    def add_query(self, ms: float):
+        with self.lock:
+            self.queries += 1
+            self.query_ms += ms
+
+    def add_connect(self):
+        with self.lock:
+            self.connects += 1
+
+    def take(self) -> Tuple[int, int, float]:
+        """Returns ``(connects, queries, query_ms)`` since the last call, and resets the counters"""
+        with self.lock:
+            res = (self.connects, self.queries, self.query_ms)
+            self.connects, self.queries, self.query_ms = 0, 0, 0.0
+        return res
+
+
+stats = DBStats()
+"""The database counters for this process"""
+
+_last_used = {}
+_installed = False
+
+
+def _time_query(execute, sql, params, many, context):
+    t_start = time.monotonic()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query((time.monotonic() - t_start) * 1000)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    stats.add_connect()
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def install():
+    """Start counting connections / queries in :data:`.stats` (safe to call more than once)"""
+    global _installed
+    if _installed:
+        return
+    connection_created.connect(_on_connection_created, weak=False)
+    _installed = True
+
+
+def before_task():
+    """
+    Called before each Celery task. If the connection has been idle for more than ``DB_HEALTH_CHECK_SECS``,
+    check that it still works, and close it if not - so the task transparently gets a fresh connection.
+    """
+    for conn in connections.all():
+        if conn.connection is None:
+            continue
+        idle = time.monotonic() - _last_used.get(conn.alias, 0)
+        if idle >= settings.DB_HEALTH_CHECK_SECS and not conn.is_usable():
+            log.warning('Database connection "%s" failed health check after %.0f seconds idle. Reconnecting.',
+                        conn.alias, idle)
+            conn.close()
+
+
+def after_task():
+    """Called after each Celery task. Closes connections which errored, or which are older than ``CONN_MAX_AGE``"""
+    close_old_connections()
+    now = time.monotonic()
+    for conn in connections.all():
+        _last_used[conn.alias] = now
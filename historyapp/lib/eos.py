@@ -17,12 +17,18 @@ Async EOS API client allowing for high speed block importing
     +===================================================+
 
 """
+import time
 from typing import Union, List
 import attr
 import httpx
 from privex.helpers.asyncx import run_sync
 import privex.jsonrpc
 from privex.coin_handlers.base.objects import AttribDictable
+from privex.helpers import PrivexException
+
+
+class EOSRPCError(PrivexException):
+    """Raised when an EOS RPC node returns an HTTP error status, or an error response instead of a result"""
 
 
 def attr_dict(cls: type, data: dict):
@@ -145,6 +151,8 @@ class EOSBlock(AttribDictable):
     transactions = attr.ib(type=List[EOSTransaction], factory=list, converter=EOSTransaction.from_list)
     block_extensions = attr.ib(type=list, factory=list)
     schedule_version = attr.ib(type=int, default=None)
+    rpc_ms = attr.ib(type=float, default=None)
+    """How long (in milliseconds) it took to retrieve this block from the RPC node - set by :meth:`.Api.get_block`"""
 
     @staticmethod
     def from_dict(data: dict):
@@ -228,9 +236,11 @@ class Api:
            transferred, how much of a token was staked, who the TX is *actually* from/to etc.
 
         """
+        t_start = time.monotonic()
         b = await self._call(self.endpoints['get_block'], block_num_or_id=number)
-        
-        return EOSBlock.from_dict(b)
+        b = EOSBlock.from_dict(b)
+        b.rpc_ms = (time.monotonic() - t_start) * 1000
+        return b
 
     async def get_info(self) -> dict:
         return await self._call(self.endpoints['get_info'])
@@ -263,7 +273,13 @@ class Api:
         async with httpx.AsyncClient() as client:
             client.headers['Content-Type'] = 'application/json'
             r = await client.post(self.url + _endpoint, json=body)
+            if r.status_code >= 500:
+                raise EOSRPCError(f'RPC node {self.url} returned HTTP {r.status_code} for {_endpoint}')
             res = r.json()
+        if isinstance(res, dict) and 'error' in res and 'code' in res:
+            raise EOSRPCError(
+                f'RPC node {self.url} returned error for {_endpoint}: {res.get("message")} {res["error"]}'
+            )
         return res
 
     def sync_call(self, _endpoint: str, *args, **kwargs) -> Union[dict, list]:
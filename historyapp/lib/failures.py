@@ -0,0 +1,155 @@
+"""
+Classification and backoff for failed block imports, and the durable ledger of failed blocks (:class:`.FailedBlock`).
+
+Failures are split into three classes, which are retried differently:
+
+ - ``node`` - the RPC node errored / timed out. Likely temporary, but retries back off quickly so that a node outage
+   doesn't turn into a retry storm.
+ - ``db`` - a database error, e.g. a deadlock or a duplicate key from a concurrent import. Retried soon.
+ - ``data`` - the block data couldn't be imported (:class:`.InvalidTransaction`, a decode error, or a value the
+   database rejects - see :data:`.DATA_ERRORS`). Retrying immediately won't help, so these go straight to the ledger,
+   and are only retried after a long delay (e.g. after an upgrade). Other errors are ``unknown``, and retried.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import asyncio
+import binascii
+import json
+import random
+from datetime import timedelta
+from typing import List, Tuple
+
+import httpx
+from django.conf import settings
+from django.db import DatabaseError, DataError, transaction
+from django.utils import timezone
+from psycopg2 import Error as PsycopgError, DataError as PsycopgDataError
+
+from historyapp.lib.eos import EOSRPCError
+from historyapp.lib.loader import InvalidTransaction
+from historyapp.models import FailedBlock, EOSBlock
+import logging
+
+log = logging.getLogger(__name__)
+
+ERROR_NODE, ERROR_DB, ERROR_DATA, ERROR_UNKNOWN = \
+    FailedBlock.ERROR_NODE, FailedBlock.ERROR_DB, FailedBlock.ERROR_DATA, FailedBlock.ERROR_UNKNOWN
+
+RETRY_BASE_SECS = {
+    ERROR_NODE: (5, 60),
+    ERROR_DB: (2, 60),
+    ERROR_DATA: (None, 3600),
+    ERROR_UNKNOWN: (10, 600),
+}
+"""
+Base backoff (seconds) for each error class, as ``(task_retry, ledger_retry)``. The delay doubles with each attempt.
+A ``task_retry`` of ``None`` means the import task doesn't retry that class at all.
+"""
+
+
+DATA_ERRORS = (
+    InvalidTransaction, json.JSONDecodeError, UnicodeDecodeError, binascii.Error, DataError, PsycopgDataError
+)
+"""
+The exceptions which mean the block's data can't be imported: an invalid transaction, data which can't be decoded,
+or a value which the database rejects (e.g. a number out of range)
+"""
+
+
+def classify_error(exc: BaseException) -> str:
+    """Returns the error class (``node``, ``db``, ``data`` or ``unknown``) for an exception raised by the importer"""
+    if isinstance(exc, (EOSRPCError, httpx.HTTPError, ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return ERROR_NODE
+    # Only errors which are certainly caused by the block's contents - anything else (e.g. a bug, which raises a
+    # generic KeyError / ValueError) may succeed on a retry, so it's left as unknown
+    if isinstance(exc, DATA_ERRORS):
+        return ERROR_DATA
+    if isinstance(exc, (DatabaseError, PsycopgError)):
+        return ERROR_DB
+    return ERROR_UNKNOWN
+
+
+def _backoff(base: float, attempt: int, max_secs: int) -> float:
+    # "Full jitter" - a random delay up to the exponential backoff, so retries from many workers don't line up
+    return random.uniform(min(base, max_secs), min(max_secs, base * (2 ** attempt)))
+
+
+def retry_countdown(error_class: str, retries: int) -> float:
+    """Seconds an import task should wait before its next retry, or ``None`` if the error class shouldn't be retried"""
+    base = RETRY_BASE_SECS.get(error_class, RETRY_BASE_SECS[ERROR_UNKNOWN])[0]
+    return None if base is None else _backoff(base, retries, settings.IMPORT_RETRY_MAX_SECS)
+
+
+def next_retry_at(error_class: str, attempts: int):
+    """When a block which has failed ``attempts`` times should next be re-queued by ``retry_failed_blocks``"""
+    base = RETRY_BASE_SECS.get(error_class, RETRY_BASE_SECS[ERROR_UNKNOWN])[1]
+    return timezone.now() + timedelta(seconds=_backoff(base, attempts - 1, settings.FAILED_RETRY_MAX_SECS))
+
+
+def record_failed_block(block: int, queue: str = None, exc: BaseException = None) -> FailedBlock:
+    """Record (or update) a block which has failed to import in :class:`.FailedBlock`, scheduling its next retry"""
+    error_class = ERROR_UNKNOWN if exc is None else classify_error(exc)
+    error_type = None if exc is None else type(exc).__name__
+    error_message = None if exc is None else str(exc)[:5000]
+    with transaction.atomic():
+        fb, created = FailedBlock.objects.select_for_update().get_or_create(
+            block=block, defaults=dict(
+                queue=queue, error_class=error_class, error_type=error_type, error_message=error_message,
+                next_retry_at=next_retry_at(error_class, 1)
+            )
+        )
+        if not created:
+            fb.queue, fb.error_class, fb.error_type, fb.error_message = queue, error_class, error_type, error_message
+            fb.attempts += 1
+            fb.next_retry_at = next_retry_at(error_class, fb.attempts)
+            fb.save()
+    return fb
+
+
+def claim_due(limit: int = 1000, error_class: str = None, include_future=False) -> List[Tuple[int, str]]:
+    """
+    Claim up to ``limit`` failed blocks which are due to be retried, for ``retry_failed_blocks`` to re-queue.
+
+    Blocks which have since been imported (e.g. by the gap filler) are removed from the ledger instead of being
+    returned. Claimed blocks have their :py:attr:`.FailedBlock.next_retry_at` pushed back, so they won't be claimed
+    again while the retry is in progress - if the retry fails, the importer reschedules them as normal.
+
+    :param int limit: Maximum amount of blocks to claim
+    :param str error_class: Only claim blocks which failed with this error class
+    :param bool include_future: Claim blocks even if their next retry time hasn't been reached yet
+    :return List[Tuple[int,str]] blocks: A list of ``(block, queue)`` tuples to re-queue
+    """
+    with transaction.atomic():
+        q = FailedBlock.objects.select_for_update(skip_locked=True)
+        if not include_future:
+            q = q.filter(next_retry_at__lte=timezone.now())
+        if error_class is not None:
+            q = q.filter(error_class=error_class)
+        due = list(q.order_by('next_retry_at')[:limit])
+        if len(due) == 0:
+            return []
+
+        imported = set(EOSBlock.objects.filter(number__in=[fb.block for fb in due]).values_list('number', flat=True))
+        if len(imported) > 0:
+            log.info('Removing %d failed blocks which have since been imported', len(imported))
+            FailedBlock.objects.filter(block__in=imported).delete()
+
+        claimed = [fb for fb in due if fb.block not in imported]
+        for fb in claimed:
+            fb.next_retry_at = next_retry_at(fb.error_class, fb.attempts + 1)
+        FailedBlock.objects.bulk_update(claimed, ['next_retry_at'])
+    return [(fb.block, fb.queue) for fb in claimed]
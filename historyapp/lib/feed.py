@@ -0,0 +1,137 @@
+"""
+Functions for the action change feed - reading every imported action in chain order, after a cursor.
+
+Each action is given a :py:attr:`.EOSAction.global_seq` when it's imported, built from its block number, its
+transaction's position within the block, and its index within the transaction (see :func:`.action_seq`). Unlike
+the action's ID or ``created_at``, which follow the order the Celery workers happened to import blocks in, the
+sequence always increases in chain order - so a consumer can keep the last sequence it read, and ask for everything
+after it with a single range scan of the ``global_seq`` index.
+
+Blocks are imported in parallel, so a block with a lower number than the newest block can still be missing. The
+feed only returns actions up to the end of the contiguous run of imported blocks which the cursor is in (the
+"safe" block - see :func:`.safe_block`), so a consumer never skips past a block which hasn't been imported yet.
+
+    >>> action_seq(12345, 2, 1)                   # The 2nd action of the 3rd transaction in block 12345
+    26510685700097
+    >>> seq_block(26510685700097)
+    12345
+    >>> actions, next_after, safe = read_feed(26510685700097, limit=1000)
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from typing import List, Optional, Tuple
+
+from django.db.models import F
+
+from historyapp.models import EOSAction, EOSBlockRange
+import logging
+
+log = logging.getLogger(__name__)
+
+TX_BITS = 16
+"""The bits of a sequence which hold the transaction's position in the block (up to 65536 transactions)"""
+
+ACTION_BITS = 15
+"""The bits of a sequence which hold the action's index in the transaction (up to 32768 actions)"""
+
+BLOCK_SHIFT = TX_BITS + ACTION_BITS
+
+
+def action_seq(block: int, tx_index: int, action_index: int) -> int:
+    """
+    The :py:attr:`.EOSAction.global_seq` of the action at position ``action_index`` of the transaction at position
+    ``tx_index`` in the block ``block``.
+
+    :raises ValueError: When ``tx_index`` or ``action_index`` is too large to fit into the sequence
+    """
+    tx_index, action_index = int(tx_index), int(action_index)
+    if not 0 <= tx_index < 2 ** TX_BITS or not 0 <= action_index < 2 ** ACTION_BITS:
+        raise ValueError(f'Transaction {tx_index} / action {action_index} is out of range for an action sequence')
+    return (int(block) << BLOCK_SHIFT) | (tx_index << ACTION_BITS) | action_index
+
+
+def seq_block(seq: int) -> int:
+    """The block number of the action sequence ``seq``"""
+    return int(seq) >> BLOCK_SHIFT
+
+
+def block_seq(block: int) -> int:
+    """The highest sequence before the block ``block`` - i.e. the cursor to read the feed from the start of a block"""
+    return (int(block) << BLOCK_SHIFT) - 1
+
+
+def covered_until(block: int) -> Optional[int]:
+    """
+    The last block of the contiguous run of imported blocks which contains ``block`` (merging any adjacent ranges
+    in the coverage table), or ``None`` if ``block`` hasn't been imported.
+    """
+    block = int(block)
+    ranges = EOSBlockRange.objects.filter(end_block__gte=block).order_by('start_block') \
+        .values_list('start_block', 'end_block')
+    end = None
+    for r_start, r_end in ranges:
+        if end is None:
+            if r_start > block:
+                return None
+            end = r_end
+        elif r_start > end + 1:
+            break
+        else:
+            end = max(end, r_end)
+    return end
+
+
+def safe_block(after: int) -> Optional[int]:
+    """
+    The highest block which the feed can return after the sequence ``after``, without skipping over a block which
+    hasn't been imported yet - or ``None`` if the block after the cursor hasn't been imported.
+
+    A cursor before every imported block starts from the lowest imported block.
+    """
+    block = max(seq_block(after + 1), 0)
+    end = covered_until(block)
+    if end is None:
+        lowest = EOSBlockRange.objects.order_by('start_block').values_list('start_block', flat=True).first()
+        if lowest is not None and block < lowest:
+            end = covered_until(lowest)
+    return end
+
+
+def read_feed(after: int, limit: int) -> Tuple[List[EOSAction], int, Optional[int]]:
+    """
+    Returns up to ``limit`` actions with a sequence after ``after``, in chain order, as a tuple
+    ``(actions, next_after, safe_block)``.
+
+    ``next_after`` is the cursor to read the next page with - once every action up to the safe block has been
+    returned, it skips to the end of that block, so the next read doesn't have to scan the same range again.
+    """
+    after = int(after)
+    end = safe_block(after)
+    if end is None:
+        return [], after, None
+    end_seq = block_seq(end + 1)
+    # The block number bounds let Postgres skip the partitions outside of the range (see lib.partitions). NULLS FIRST
+    # matches the ``global_seq DESC NULLS LAST`` index read backwards (the range already excludes NULLs)
+    actions = list(
+        EOSAction.objects.filter(
+            global_seq__gt=after, global_seq__lte=end_seq,
+            block_number__gte=seq_block(after + 1), block_number__lte=end
+        ).order_by(F('global_seq').asc(nulls_first=True))[:limit]
+    )
+    if len(actions) >= limit:
+        return actions, actions[-1].global_seq, end
+    return actions, max(after, end_seq), end
@@ -0,0 +1,62 @@
+"""
+Priority lanes for block imports.
+
+When ``IMPORT_LANES`` is enabled, import tasks aren't all sent to the same Celery queue - instead, each base queue
+(e.g. ``eoshist``) is split into a lane per type of work:
+
+ - ``eoshist.live`` - blocks within ``SYNC_LIVE_DISTANCE`` blocks of the head block
+ - ``eoshist.backfill`` - older blocks being synced for the first time
+ - ``eoshist.gaps`` - blocks being re-queued to fill gaps
+
+Workers started with ``./run.sh queue_live`` only consume the live lane, so head blocks are always imported promptly,
+while ``./run.sh queue`` consumes every lane, soaking up whatever capacity is left with backfill / gap work.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from typing import List
+
+from django.conf import settings
+
+LANE_LIVE, LANE_BACKFILL, LANE_GAPS = 'live', 'backfill', 'gaps'
+LANES = (LANE_LIVE, LANE_BACKFILL, LANE_GAPS)
+
+
+def lane_queue(queue: str, lane: str = None) -> str:
+    """
+    Returns the Celery queue name that tasks for ``lane`` should be sent to, for the base queue ``queue``.
+
+        >>> lane_queue('eoshist', LANE_LIVE)
+        'eoshist.live'
+        >>> lane_queue('eoshist')       # No lane (or IMPORT_LANES is disabled) - use the base queue
+        'eoshist'
+
+    """
+    if lane is None or not settings.IMPORT_LANES:
+        return queue
+    return f'{queue}.{lane}'
+
+
+def lane_queues(queue: str) -> List[str]:
+    """Returns every Celery queue name used for the base queue ``queue`` (including the base queue itself)"""
+    if not settings.IMPORT_LANES:
+        return [queue]
+    return [queue] + [lane_queue(queue, lane) for lane in LANES]
+
+
+def block_lane(block: int, head_block: int) -> str:
+    """Returns :data:`.LANE_LIVE` if ``block`` is within ``SYNC_LIVE_DISTANCE`` of ``head_block``, else backfill"""
+    return LANE_LIVE if (int(head_block) - int(block)) <= settings.SYNC_LIVE_DISTANCE else LANE_BACKFILL
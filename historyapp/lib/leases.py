@@ -0,0 +1,136 @@
+"""
+Lease-based block range claiming, used by ``sync_blocks --sharded`` to allow any number of sync hosts to split
+the work of queueing blocks between themselves.
+
+Block ranges (:class:`.BlockRangeLease`) are created by :func:`.plan_ranges` up to the current head block, then
+claimed by individual hosts using ``SELECT ... FOR UPDATE SKIP LOCKED`` (:func:`.claim_range`), so that two hosts
+can never claim the same range. A host must renew its lease (:func:`.renew_range`) while it's working on a range,
+otherwise the range is considered abandoned once the lease expires, and can be claimed by another host.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import os
+import socket
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Max
+from django.utils import timezone
+from lockmgr.lockmgr import LockMgr
+
+from historyapp.models import BlockRangeLease
+import logging
+
+log = logging.getLogger(__name__)
+
+LOCK_PLAN_RANGES = 'eoshist_lease_plan'
+"""LockMgr lock name held while creating new block ranges, so that two hosts can't create overlapping ranges"""
+
+
+def holder_name() -> str:
+    """Returns a name identifying this sync process across hosts, e.g. ``sync1.example.com:1234``"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def plan_ranges(head_block: int, start_block: int, range_size: int = None) -> int:
+    """
+    Create any missing :class:`.BlockRangeLease` rows, continuing on from the highest existing range (or from
+    ``start_block`` if there are no ranges yet), up to and including ``head_block``.
+
+    :param int head_block: Create ranges up to and including this block number
+    :param int start_block: If there are no existing ranges, the first range will begin at this block
+    :param int range_size: Maximum amount of blocks per range (default: ``settings.SYNC_LEASE_BLOCKS``)
+    :return int created: The amount of new ranges created
+    """
+    range_size = settings.SYNC_LEASE_BLOCKS if range_size is None else int(range_size)
+    with LockMgr(LOCK_PLAN_RANGES, expires=60, wait=30):
+        last_end = BlockRangeLease.objects.aggregate(Max('end_block'))['end_block__max']
+        current = int(start_block) if last_end is None else last_end + 1
+        ranges = []
+        while current <= head_block:
+            end = min(current + range_size - 1, head_block)
+            ranges.append(BlockRangeLease(start_block=current, end_block=end))
+            current = end + 1
+        BlockRangeLease.objects.bulk_create(ranges, ignore_conflicts=True)
+    if len(ranges) > 0:
+        log.info('Created %d new block ranges up to block %d', len(ranges), head_block)
+    return len(ranges)
+
+
+def claim_range(holder: str = None, lease_secs: int = None) -> Optional[BlockRangeLease]:
+    """
+    Claim the lowest block range which is either ``pending``, or was claimed by a host whose lease has expired.
+
+    Rows which are currently locked by another host's claim are skipped rather than waited on, so any number
+    of hosts can call this at the same time without blocking each other.
+
+    :param str holder: The name of the host/process claiming the range (default: :func:`.holder_name`)
+    :param int lease_secs: Lease length in seconds (default: ``settings.SYNC_LEASE_SECONDS``)
+    :return BlockRangeLease lease: The claimed range, or ``None`` if there's nothing left to claim
+    """
+    holder = holder_name() if holder is None else holder
+    lease_secs = settings.SYNC_LEASE_SECONDS if lease_secs is None else lease_secs
+    now = timezone.now()
+    with transaction.atomic():
+        lease = BlockRangeLease.objects.select_for_update(skip_locked=True).filter(
+            Q(status=BlockRangeLease.STATUS_PENDING) |
+            Q(status=BlockRangeLease.STATUS_CLAIMED, lease_expires__lt=now)
+        ).order_by('start_block').first()
+        if lease is None:
+            return None
+        if lease.status == BlockRangeLease.STATUS_CLAIMED:
+            log.warning('Reclaiming block range %s from %s - lease expired at %s',
+                        lease, lease.holder, lease.lease_expires)
+        lease.status, lease.holder, lease.claimed_at = BlockRangeLease.STATUS_CLAIMED, holder, now
+        lease.lease_expires = now + timedelta(seconds=lease_secs)
+        lease.attempts += 1
+        lease.save()
+    return lease
+
+
+def renew_range(lease: BlockRangeLease, holder: str = None, lease_secs: int = None) -> bool:
+    """
+    Extend the lease on a claimed range. Returns ``False`` if we no longer hold the lease (e.g. it expired and
+    was reclaimed by another host), in which case the caller should stop working on the range.
+    """
+    holder = holder_name() if holder is None else holder
+    lease_secs = settings.SYNC_LEASE_SECONDS if lease_secs is None else lease_secs
+    expires = timezone.now() + timedelta(seconds=lease_secs)
+    updated = BlockRangeLease.objects.filter(
+        start_block=lease.start_block, holder=holder, status=BlockRangeLease.STATUS_CLAIMED
+    ).update(lease_expires=expires)
+    if updated > 0:
+        lease.lease_expires = expires
+    return updated > 0
+
+
+def release_range(lease: BlockRangeLease, holder: str = None, done: bool = True) -> bool:
+    """
+    Release a range which we hold. If ``done`` is True, the range is marked as completed, otherwise it's put back
+    into ``pending`` so that any host can claim it again.
+    """
+    holder = holder_name() if holder is None else holder
+    updates = dict(status=BlockRangeLease.STATUS_PENDING, holder=None, lease_expires=None)
+    if done:
+        updates = dict(status=BlockRangeLease.STATUS_DONE, lease_expires=None, completed_at=timezone.now())
+    updated = BlockRangeLease.objects.filter(
+        start_block=lease.start_block, holder=holder, status=BlockRangeLease.STATUS_CLAIMED
+    ).update(**updates)
+    return updated > 0
+
@@ -18,8 +18,9 @@ Various async functions for importing / parsing blockchain data from EOS into mo
 
 """
 import random
+import struct
 from decimal import Decimal
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Dict, Optional
 import pytz
 from dateutil.parser import parse
 from django.conf import settings
@@ -28,12 +29,18 @@ from django.db.utils import IntegrityError
 from django.utils import timezone
 from privex.helpers import empty, PrivexException
 
-from historyapp.lib import eos
-from historyapp.models import EOSBlock, EOSTransaction, EOSAction
+from historyapp.lib import eos, prepared, packing, feed
+from historyapp.models import EOSBlock, EOSTransaction, EOSAction, AccountAction, EOSTransfer
 import logging
 
 log = logging.getLogger(__name__)
 
+SENDER_KEYS = ('from', 'payer', 'creator', 'voter')
+"""Keys in an action's ``data`` which hold the account sending / paying for the action"""
+
+RECEIVER_KEYS = ('to', 'receiver')
+"""Keys in an action's ``data`` which hold the account receiving the action"""
+
 
 class InvalidTransaction(PrivexException):
     """Raised when a passed transaction is corrupted / missing important data for import."""
@@ -54,31 +61,24 @@ async def _import_block(block: Union[eos.EOSBlock, int]) -> Tuple[EOSBlock, eos.
     b = block
     
     if type(block) is int:
-        try:
-            _b = EOSBlock.objects.get(number=block)
+        if prepared.block_exists(block):
             log.info('Found block "%s" in the database! Returning DB block instead.', block)
-            return _b
-        except EOSBlock.DoesNotExist:
-            log.debug('Checked DB for existing block but not found. Continuing with import.')
+            return EOSBlock.objects.get(number=block)
+        log.debug('Checked DB for existing block but not found. Continuing with import.')
         
         api = eos.Api(url=random.choice(settings.EOS_NODE))
         b = await api.get_block(block)
         block_num = b.block_num
     else:
-        try:
-            _b = EOSBlock.objects.get(number=block.block_num)
+        if prepared.block_exists(block.block_num):
             log.info('Found block "%s" in the database! Returning DB block instead.', block.block_num)
-            return _b
-        except EOSBlock.DoesNotExist:
-            log.debug('Checked DB for existing block but not found. Continuing with import.')
-            block_num = block.block_num
+            return EOSBlock.objects.get(number=block.block_num)
+        log.debug('Checked DB for existing block but not found. Continuing with import.')
+        block_num = block.block_num
     
     with transaction.atomic():
-        try:
-            EOSBlock.objects.get(number=block_num)
+        if prepared.block_exists(block_num):
             raise IntegrityError(f'(loader.import_transaction) duplicate key value - Block {block_num} already exists.')
-        except EOSBlock.DoesNotExist:
-            pass
         dt = parse(b.timestamp)
         dt = timezone.make_aware(dt, pytz.UTC)
         _b = EOSBlock(
@@ -87,7 +87,7 @@ async def _import_block(block: Union[eos.EOSBlock, int]) -> Tuple[EOSBlock, eos.
             producer_signature=b.producer_signature, header_extensions=b.header_extensions,
             ref_block_prefix=b.ref_block_prefix, confirmed=b.confirmed, schedule_version=b.schedule_version
         )
-        _b.save()
+        prepared.INSERT_BLOCK.insert([_b])
         return _b, b
 
     # try:
@@ -136,32 +136,59 @@ async def import_transaction(block: Union[EOSBlock, int], tx: eos.EOSTransaction
     # except EOSTransaction.DoesNotExist:
     #     log.debug('Checked DB for existing transaction but not found. Continuing with import.')
     
-    meta = None
+    meta, total_actions = None, 0
+    packed_trx, packed_trx_bin = tx.packed_trx, None
     if tx.transaction is not None:
         meta = dict(tx.transaction)
         if 'actions' in meta:
+            total_actions = len(meta['actions'])
             del meta['actions']
+        if settings.STORAGE_PROFILE == 'compact' and packed_trx is not None:
+            packed_trx, packed_trx_bin = compact_packed_trx(tx.transaction, tx.packed_trx, tx.compression)
     with transaction.atomic():
-        try:
-            ex_tx = EOSTransaction.objects.get(txid=tx.id)   # type: EOSTransaction
-            # if ex_tx.block_number <= block.number:
-            #     log.info('Found existing TX. TX block: %s - Current import block: %s - '
-            #              'block not newer, raising IntegrityError. TXID %s')
+        if prepared.tx_exists(tx.id):
             raise IntegrityError(f'(loader.import_transaction) duplicate key value - TXID {tx.id} already exists.')
-        except EOSTransaction.DoesNotExist:
-            pass
         
         btx = EOSTransaction(
             txid=tx.id, status=tx.status, compression=tx.compression, cpu_usage_us=tx.cpu_usage_us,
             net_usage_words=tx.net_usage_words, signatures=tx.signatures, context_free_data=tx.context_free_data,
-            packed_trx=tx.packed_trx, metadata=meta, block=block
+            packed_trx=packed_trx, packed_trx_bin=packed_trx_bin, metadata=meta, block=block, timestamp=block.timestamp,
+            total_actions=total_actions
         )
-        btx.save()
+        # We've just checked it doesn't exist - skip Django's UPDATE attempt, which has to search every partition
+        prepared.INSERT_TX.insert([btx])
     
     return btx
 
 
-async def import_actions(tx: eos.EOSTransaction) -> List[EOSAction]:
+def compact_packed_trx(trx: dict, packed_trx: str, compression: str = 'none') -> Tuple[Optional[str], Optional[bytes]]:
+    """
+    For the compact storage profile - returns the ``(packed_trx, packed_trx_bin)`` to store for the hex ``packed_trx``.
+
+    Both are None if it can be rebuilt exactly from the transaction dict ``trx`` (see
+    :meth:`.EOSTransaction.get_packed_trx`), otherwise it's returned as bytes to be stored as binary - or kept as
+    text if it isn't valid hex.
+    """
+    try:
+        if compression == 'none':
+            actions = [
+                packing.pack_action(
+                    a['account'], a['name'], a.get('authorization', []),
+                    packing.action_bytes(a.get('hex_data'), data=a.get('data'))
+                ) for a in trx.get('actions', [])
+            ]
+            if packing.pack_transaction(trx, actions).hex() == packed_trx.lower():
+                return None, None
+    except (KeyError, ValueError, TypeError, struct.error) as e:
+        log.debug('Cannot rebuild packed_trx, storing it as binary. Reason: %s %s', type(e), str(e))
+    try:
+        return None, bytes.fromhex(packed_trx)
+    except (ValueError, TypeError):
+        log.warning('packed_trx is not valid hex, storing it as text: %s', packed_trx)
+        return packed_trx, None
+
+
+async def import_actions(tx: eos.EOSTransaction, tx_index: int = 0) -> List[EOSAction]:
     """
     Creates a :class:`.EOSAction` in the database for each action in the passed transaction instance ``tx``.
     
@@ -171,6 +198,7 @@ async def import_actions(tx: eos.EOSTransaction) -> List[EOSAction]:
         >>> acts = await import_actions(tx)                # Import the actions from the eos.EOSTransaction
     
     :param tx: An instance of :class:`eos.EOSTransaction` (NOT the model EOSTransaction, the lib.loader version)
+    :param int tx_index: The position of ``tx`` in its block (see :py:attr:`.EOSAction.global_seq`)
     :return List[EOSAction] actions: A list of :class:`.EOSAction` model instances, each saved to the DB.
     """
     actions = []
@@ -185,14 +213,100 @@ async def import_actions(tx: eos.EOSTransaction) -> List[EOSAction]:
     _a = tx.transaction.get('actions', [])
     
     for i, a in enumerate(_a):    # type: dict
-        actions.append(await _prep_action(db_tx=db_tx, action=a, index=i))
+        actions.append(await _prep_action(db_tx=db_tx, action=a, index=i, tx_index=tx_index))
+    
+    prepared.INSERT_ACTION.insert(actions)
     
-    EOSAction.objects.bulk_create(actions, ignore_conflicts=True)
+    if (settings.ACCOUNT_HISTORY_INDEX or settings.TRANSFER_LEDGER) and len(actions) > 0:
+        ids = action_ids(db_tx)
+        if settings.ACCOUNT_HISTORY_INDEX:
+            import_account_actions(db_tx, actions, ids=ids)
+        if settings.TRANSFER_LEDGER:
+            import_transfers(db_tx, actions, ids=ids)
     
     return actions
 
 
-async def _prep_action(db_tx: EOSTransaction, action: dict, index: int) -> EOSAction:
+def action_ids(db_tx: EOSTransaction) -> Dict[int, int]:
+    """Returns a dict mapping the ``action_index`` of each imported action of ``db_tx`` to its primary key"""
+    # The prepared insert doesn't return primary keys (like bulk_create with ignore_conflicts), so look them up by
+    # their position in the TX
+    return dict(
+        EOSAction.objects.filter(transaction_id=db_tx.txid, block_number=db_tx.block_id)
+                         .values_list('action_index', 'id')
+    )
+
+
+def import_account_actions(db_tx: EOSTransaction, actions: List[EOSAction], ids: Dict[int, int] = None) \
+        -> List[AccountAction]:
+    """
+    Creates an :class:`.AccountAction` for each account involved in each of the already imported ``actions``
+    of ``db_tx``. Rows which already exist are skipped, so it's safe to call again when re-importing a transaction.
+    """
+    ids = action_ids(db_tx) if ids is None else ids
+    rows = []
+    for act in actions:
+        action_id = ids.get(act.action_index)
+        if action_id is None:
+            continue
+        for account, roles in action_roles(act).items():
+            rows.append(AccountAction(account=account, block_number=db_tx.block_id, action_id=action_id, roles=roles))
+    AccountAction.objects.bulk_create(rows, ignore_conflicts=True)
+    return rows
+
+
+def import_transfers(db_tx: EOSTransaction, actions: List[EOSAction], ids: Dict[int, int] = None) \
+        -> List[EOSTransfer]:
+    """
+    Creates an :class:`.EOSTransfer` for each ``transfer`` action with a valid ``quantity`` in the already imported
+    ``actions`` of ``db_tx``. Rows which already exist are skipped, the same as :func:`.import_account_actions`
+    """
+    ids = action_ids(db_tx) if ids is None else ids
+    rows = []
+    for act in actions:
+        action_id = ids.get(act.action_index)
+        if action_id is None or act.name != 'transfer' or not isinstance(act.data, dict):
+            continue
+        asset = packing.parse_asset(act.data.get('quantity'))
+        if asset is None:
+            continue
+        amount, precision, symbol = asset
+        rows.append(EOSTransfer(
+            action_id=action_id, block_number=db_tx.block_id, contract=act.account, sender=act.tx_from,
+            receiver=act.tx_to, amount=amount, precision=precision, symbol=symbol
+        ))
+    EOSTransfer.objects.bulk_create(rows, ignore_conflicts=True)
+    return rows
+
+
+def action_roles(act: EOSAction) -> Dict[str, int]:
+    """
+    Returns a dict mapping each account involved in the action ``act`` to a bitmask of :attr:`.AccountAction.ROLES`
+
+        >>> action_roles(EOSAction(account='eosio.token', authorization=[dict(actor='john', permission='active')],
+        ...                        data=dict(to='mary', quantity='1.0000 EOS', memo='')))
+        {'eosio.token': 1, 'john': 2, 'mary': 8}
+    """
+    roles = {}
+
+    def add(account, role):
+        if packing.is_name(account) and account != '':
+            roles[account] = roles.get(account, 0) | role
+
+    add(act.account, AccountAction.ROLE_CONTRACT)
+    if isinstance(act.authorization, list):
+        for auth in act.authorization:
+            if isinstance(auth, dict):
+                add(auth.get('actor'), AccountAction.ROLE_AUTH)
+    if isinstance(act.data, dict):
+        for k in SENDER_KEYS:
+            add(act.data.get(k), AccountAction.ROLE_SENDER)
+        for k in RECEIVER_KEYS:
+            add(act.data.get(k), AccountAction.ROLE_RECEIVER)
+    return roles
+
+
+async def _prep_action(db_tx: EOSTransaction, action: dict, index: int, tx_index: int = 0) -> EOSAction:
     """
     Prepares a dict ``action`` from a :class:`.eos.EOSTransaction` for database insertion by extracting
     information such as the contract account, and parses any transaction metadata such as to/from account, memo
@@ -210,6 +324,7 @@ async def _prep_action(db_tx: EOSTransaction, action: dict, index: int) -> EOSAc
     :param EOSTransaction db_tx: An instance of an :class:`.EOSTransaction` model to attach the ``action`` to.
     :param dict action: The action to parse and return an :class:`.EOSAction` for.
     :param int index: The position this action was in, in the actions list of the transaction
+    :param int tx_index: The position of the transaction in its block's list of transactions
     :return EOSAction act: An unsaved model instance of :class:`.EOSAction`
     """
     data = dict(
@@ -218,8 +333,8 @@ async def _prep_action(db_tx: EOSTransaction, action: dict, index: int) -> EOSAc
     )
 
     if type(data['data']) is dict and len(data['data'].keys()) > 0:
-        if 'from' in data['data']: data['tx_from'] = data['data']['from']
-        if 'to' in data['data']: data['tx_to'] = data['data']['to']
+        if packing.is_name(data['data'].get('from')): data['tx_from'] = data['data']['from']
+        if packing.is_name(data['data'].get('to')): data['tx_to'] = data['data']['to']
         if 'memo' in data['data']: data['tx_memo'] = data['data']['memo']
 
         if 'quantity' in data['data']:
@@ -228,7 +343,16 @@ async def _prep_action(db_tx: EOSTransaction, action: dict, index: int) -> EOSAc
             data['tx_amount'] = Decimal(amt)
             data['tx_symbol'] = sym.upper()
     
-    act = EOSAction(transaction=db_tx, **data)
+    if settings.STORAGE_PROFILE == 'compact' and data['hex_data'] is not None:
+        try:
+            data['raw_data'], data['hex_data'] = bytes.fromhex(data['hex_data']), None
+        except ValueError:
+            pass
+    
+    act = EOSAction(
+        transaction=db_tx, block_number=db_tx.block_id, timestamp=db_tx.timestamp,
+        global_seq=feed.action_seq(db_tx.block_id, tx_index, index), **data
+    )
     
     return act
 
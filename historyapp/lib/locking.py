@@ -0,0 +1,97 @@
+"""
+Lightweight locks used by the block importer to ensure two workers never import the same block at the same time.
+
+By default (``IMPORT_LOCK_BACKEND=advisory``) these are PostgreSQL advisory locks, which live entirely in the
+database server's shared memory - unlike :class:`lockmgr.lockmgr.LockMgr`, no rows are inserted / deleted per lock.
+
+Each import uses :func:`.block_lock`, which takes a transaction-scoped exclusive lock on the block - so imports of
+different blocks never block each other.
+
+Example::
+
+    >>> with transaction.atomic(), block_lock(1234):
+    ...     import_the_block(1234)
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.transaction import TransactionManagementError
+from lockmgr.lockmgr import Locked
+import logging
+
+log = logging.getLogger(__name__)
+
+LOCK_NS_BLOCK = 0x454f5301
+"""Advisory lock namespace (first key) used for individual block locks"""
+
+LOCK_NS_BALANCE = 0x454f5304
+"""Advisory lock namespace (first key) used for the running balances of an account / token (see :mod:`.balances`)"""
+
+
+class ImportLocked(Locked):
+    """Raised when a block is already being imported by another worker"""
+    pass
+
+
+def _try_advisory(func: str, *keys) -> bool:
+    with connection.cursor() as cur:
+        cur.execute(f'SELECT {func}(%s, %s);', list(keys))
+        return cur.fetchone()[0]
+
+
+def _cache_key(kind: str, key: int) -> str:
+    return f'eoshist_implock:{kind}:{key}'
+
+
+@contextmanager
+def block_lock(block: int):
+    """
+    Lock an individual block for import, raising :class:`.ImportLocked` if it's already locked by another worker.
+
+    With the ``advisory`` backend, this must be used inside :func:`django.db.transaction.atomic`, and the lock is
+    held until that transaction commits or rolls back.
+    """
+    block = int(block)
+    if settings.IMPORT_LOCK_BACKEND == 'cache':
+        yield from _cache_block_lock(block)
+        return
+
+    if not connection.in_atomic_block:
+        raise TransactionManagementError('block_lock() with advisory locks must be used inside a transaction.')
+    if not _try_advisory('pg_try_advisory_xact_lock', LOCK_NS_BLOCK, block):
+        raise ImportLocked(f'Block {block} is already being imported by another worker.')
+    yield
+
+
+def _cache_block_lock(block: int):
+    key = _cache_key('block', block)
+    if not cache.add(key, 1, timeout=settings.IMPORT_LOCK_TIMEOUT):
+        raise ImportLocked(f'Block {block} is already being imported by another worker.')
+    try:
+        yield
+    except BaseException:
+        cache.delete(key)
+        raise
+    # Don't let another worker start on this block until our import has actually been committed.
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(key))
+    else:
+        cache.delete(key)
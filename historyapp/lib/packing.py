@@ -0,0 +1,230 @@
+"""
+Helpers for EOSIO's binary serialization format - account names, token assets, and packed transactions.
+
+:func:`.pack_transaction` rebuilds a transaction's ``packed_trx`` from the parts of it which are already stored in
+the database (the header fields in :attr:`.EOSTransaction.metadata`, and each action's binary data), so the compact
+storage profile (``STORAGE_PROFILE=compact``) doesn't need to store it twice.
+
+    >>> name_to_int('eosio.token')
+    6138663591592764928
+    >>> int_to_name(6138663591592764928)
+    'eosio.token'
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import re
+import struct
+from datetime import datetime
+from typing import Iterable, Optional, Union, Tuple
+
+import pytz
+from dateutil.parser import parse
+
+NAME_CHARS = '.12345abcdefghijklmnopqrstuvwxyz'
+"""The characters which can appear in an EOS name, in order of their 5-bit value"""
+
+
+def _char_value(c: str) -> int:
+    if 'a' <= c <= 'z':
+        return ord(c) - ord('a') + 6
+    if '1' <= c <= '5':
+        return ord(c) - ord('1') + 1
+    return 0
+
+
+def name_to_int(name: str) -> int:
+    """Encode the EOS account / action / permission name ``name`` into its unsigned 64-bit integer form"""
+    value = 0
+    for i in range(13):
+        c = _char_value(name[i]) if i < len(name) else 0
+        if i < 12:
+            value |= (c & 0x1f) << (64 - 5 * (i + 1))
+        else:
+            value |= c & 0x0f
+    return value
+
+
+def int_to_name(value: int) -> str:
+    """Decode the unsigned 64-bit integer ``value`` into the EOS name it represents"""
+    chars = ['.'] * 13
+    for i in range(13):
+        chars[12 - i] = NAME_CHARS[value & (0x0f if i == 0 else 0x1f)]
+        value >>= 4 if i == 0 else 5
+    return ''.join(chars).rstrip('.')
+
+
+def is_name(value) -> bool:
+    """
+    Returns True if ``value`` is a valid EOS name in its canonical form, i.e. it survives being encoded and decoded
+    unchanged (up to 13 characters, no trailing dots, and a 13th character of ``.1-5a-j``)
+    """
+    return isinstance(value, str) and len(value) <= 13 and all(c in NAME_CHARS for c in value) and \
+        int_to_name(name_to_int(value)) == value
+
+
+def name_to_bigint(name: str) -> int:
+    """Encode ``name`` like :func:`.name_to_int`, but as a signed 64-bit integer (to fit a PostgreSQL ``bigint``)"""
+    value = name_to_int(name)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def bigint_to_name(value: int) -> str:
+    """Decode a signed 64-bit integer from :func:`.name_to_bigint` back into a name"""
+    return int_to_name(value & 0xFFFFFFFFFFFFFFFF)
+
+
+MAX_PRECISION = 18
+"""The maximum amount of decimal places an EOSIO asset's symbol can have"""
+
+_ASSET_RE = re.compile(r'(-?)([0-9]+)(?:\.([0-9]+))? ([A-Z]{1,7})')
+
+
+def is_symbol_code(value) -> bool:
+    """Returns True if ``value`` is a valid EOSIO symbol code (1 to 7 uppercase letters), e.g. ``EOS``"""
+    return isinstance(value, str) and re.fullmatch(r'[A-Z]{1,7}', value) is not None
+
+
+def symbol_code_to_int(code: str) -> int:
+    """
+    Encode the symbol code ``code`` into its 64-bit integer form (each character is one byte, the first character in
+    the lowest byte). As a symbol code is at most 7 characters, the result always fits a signed 64-bit integer.
+
+        >>> symbol_code_to_int('EOS')
+        5459781
+    """
+    return sum(ord(c) << (8 * i) for i, c in enumerate(code))
+
+
+def int_to_symbol_code(value: int) -> str:
+    """Decode a symbol code from :func:`.symbol_code_to_int`"""
+    chars = []
+    while value > 0:
+        chars.append(chr(value & 0xff))
+        value >>= 8
+    return ''.join(chars)
+
+
+def parse_asset(quantity) -> Optional[Tuple[int, int, str]]:
+    """
+    Parse an EOSIO asset string into ``(amount, precision, symbol)``, where ``amount`` is the integer amount in the
+    token's smallest unit. Returns None if ``quantity`` isn't a valid asset.
+
+        >>> parse_asset('1.2500 EOS')
+        (12500, 4, 'EOS')
+    """
+    m = _ASSET_RE.fullmatch(quantity) if isinstance(quantity, str) else None
+    if m is None:
+        return None
+    sign, whole, frac, symbol = m.groups()
+    frac = frac or ''
+    amount = int(whole + frac) * (-1 if sign else 1)
+    if len(frac) > MAX_PRECISION or not -(1 << 63) <= amount < (1 << 63):
+        return None
+    return amount, len(frac), symbol
+
+
+def format_asset(amount: int, precision: int, symbol: str) -> str:
+    """The reverse of :func:`.parse_asset`, e.g. ``format_asset(12500, 4, 'EOS')`` returns ``'1.2500 EOS'``"""
+    sign, digits = '-' if amount < 0 else '', str(abs(amount)).rjust(precision + 1, '0')
+    if precision == 0:
+        return f'{sign}{digits} {symbol}'
+    return f'{sign}{digits[:-precision]}.{digits[-precision:]} {symbol}'
+
+
+def pack_varuint32(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = value & 0x7f
+        value >>= 7
+        if value > 0:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def pack_bytes(data: bytes) -> bytes:
+    return pack_varuint32(len(data)) + data
+
+
+def pack_name(name: str) -> bytes:
+    return struct.pack('<Q', name_to_int(name))
+
+
+def pack_time_point_sec(value: Union[str, datetime]) -> bytes:
+    dt = parse(value) if isinstance(value, str) else value
+    if dt.tzinfo is None:
+        dt = pytz.UTC.localize(dt)
+    return struct.pack('<I', int(dt.timestamp()))
+
+
+def action_bytes(hex_data: Optional[str], raw_data: Optional[bytes] = None, data=None) -> Optional[bytes]:
+    """
+    Returns the binary ``data`` of an action - from ``raw_data`` (compact profile), ``hex_data``, or ``data`` itself
+    if the node couldn't decode it (no ABI), in which case it's already a hex string. Returns None if unavailable.
+    """
+    if raw_data is not None:
+        return bytes(raw_data)
+    if hex_data is not None:
+        return bytes.fromhex(hex_data)
+    if isinstance(data, str):
+        try:
+            return bytes.fromhex(data)
+        except ValueError:
+            pass
+    return None
+
+
+def pack_action(account: str, name: str, authorization: list, data: bytes) -> bytes:
+    out = pack_name(account) + pack_name(name) + pack_varuint32(len(authorization))
+    for auth in authorization:
+        out += pack_name(auth['actor']) + pack_name(auth['permission'])
+    return out + pack_bytes(data)
+
+
+def _pack_action_dict(action: dict) -> bytes:
+    data = action_bytes(action.get('hex_data'), data=action.get('data'))
+    if data is None:
+        raise ValueError(f"Action {action.get('account')}::{action.get('name')} has no binary data")
+    return pack_action(action['account'], action['name'], action.get('authorization', []), data)
+
+
+def pack_transaction(metadata: dict, actions: Iterable[bytes]) -> bytes:
+    """
+    Serialize a transaction, from its header / context free actions / extensions in ``metadata`` (the ``transaction``
+    dict of a block's transaction, without ``actions``), and ``actions`` - each action already packed with
+    :func:`.pack_action`. The result is the same as the transaction's uncompressed ``packed_trx``.
+
+    Raises :class:`KeyError` / :class:`ValueError` if ``metadata`` is missing any fields.
+    """
+    actions = list(actions)
+    out = pack_time_point_sec(metadata['expiration'])
+    out += struct.pack('<HI', int(metadata['ref_block_num']), int(metadata['ref_block_prefix']))
+    out += pack_varuint32(int(metadata['max_net_usage_words']))
+    out += struct.pack('<B', int(metadata['max_cpu_usage_ms']))
+    out += pack_varuint32(int(metadata['delay_sec']))
+
+    cf_actions = metadata.get('context_free_actions') or []
+    out += pack_varuint32(len(cf_actions)) + b''.join(_pack_action_dict(a) for a in cf_actions)
+    out += pack_varuint32(len(actions)) + b''.join(actions)
+
+    extensions = metadata.get('transaction_extensions') or []
+    out += pack_varuint32(len(extensions))
+    for ext in extensions:
+        ext_type, ext_data = (ext['type'], ext['data']) if isinstance(ext, dict) else ext
+        out += struct.pack('<H', int(ext_type)) + pack_bytes(bytes.fromhex(ext_data))
+    return out
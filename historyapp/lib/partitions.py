@@ -0,0 +1,296 @@
+"""
+Native PostgreSQL range partitioning of the transaction, action, account history and transfer ledger tables by block
+number.
+
+Once :func:`.convert_table` has been ran (``./manage.py partition_tables --convert``), :class:`.EOSTransaction` is
+partitioned by ``block_id``, and :class:`.EOSAction` / :class:`.AccountAction` / :class:`.EOSTransfer` by
+``block_number``, with each partition holding ``PARTITION_BLOCKS`` blocks. Queries filtered by block number only have
+to touch the partitions which can contain those blocks, and old history can be dropped a whole partition at a time
+with :func:`.drop_partitions`.
+
+PostgreSQL requires the partition key to be part of every unique constraint on a partitioned table, so after
+conversion:
+
+ - The primary keys become ``(txid, block_id)``, ``(id, block_number)`` and ``(action_id, block_number)``, and
+   the action ``(transaction, action_index)`` unique constraint gains ``block_number``. The importer still checks
+   for existing TXIDs itself.
+ - Foreign keys *to* the transaction table are dropped (they'd have to include the partition key), so actions are
+   only linked to their transaction by Django. Foreign keys to the block table are kept.
+
+These key changes are made outside of Django's migrations, which can't be recorded in the migration state (the same
+migrations run against unpartitioned databases too). From then on, the keys of the partitioned tables are unmanaged:
+Django's state still has the original primary keys and foreign keys, so a migration which alters one of those
+columns, or a foreign key to the transaction table, has to be written as ``RunSQL`` that works on both layouts, with
+the model change in ``SeparateDatabaseAndState``. Plain indexes and new nullable columns are still fine, as Postgres
+applies them to every partition.
+
+Partitions must exist before rows can be inserted into them, so sync_blocks calls :func:`.ensure_partitions`
+for each range of blocks it queues. These functions do nothing if the tables haven't been converted.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import re
+from collections import namedtuple
+from typing import List, Tuple, Dict, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+
+from historyapp.lib import balances, producers, rollups
+from historyapp.lib.coverage import uncover_blocks
+from historyapp.models import EOSBlock, EOSTransaction, EOSAction, AccountAction, EOSTransfer
+import logging
+
+log = logging.getLogger(__name__)
+
+_block_table = EOSBlock._meta.db_table
+
+PARTITIONED_TABLES = {
+    EOSTransaction._meta.db_table: dict(key='block_id', pk='txid', unique=[]),
+    EOSAction._meta.db_table: dict(key='block_number', pk='id', unique=[('transaction_id', 'action_index')]),
+    AccountAction._meta.db_table: dict(key='block_number', pk='id', unique=[]),
+    EOSTransfer._meta.db_table: dict(key='block_number', pk='action_id', unique=[]),
+}
+"""Each table which can be partitioned, mapped to its partition key, primary key, and other unique constraints"""
+
+Partition = namedtuple('Partition', 'name start end rows')
+"""A partition of a table, holding the block numbers ``start`` up to (but not including) ``end``"""
+
+_bound_re = re.compile(r"FROM \('?(-?\d+)'?\) TO \('?(-?\d+)'?\)")
+
+# Table name -> (start, end) block range which is known to be fully covered by partitions
+_covered: Dict[str, Tuple[int, int]] = {}
+
+query_is_partitioned = """
+SELECT EXISTS(
+    SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid
+    WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+);
+"""
+
+query_list_partitions = """
+SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = %s::regclass;
+"""
+
+
+def is_partitioned(table: str) -> bool:
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(query_is_partitioned, [table])
+        return cursor.fetchone()[0]
+
+
+def list_partitions(table: str) -> List[Partition]:
+    """Returns the partitions of ``table`` ordered by their starting block (``rows`` is the planner's estimate)"""
+    with connection.cursor() as cursor:
+        cursor.execute(query_list_partitions, [table])
+        rows = cursor.fetchall()
+    parts = []
+    for name, bound, est in rows:
+        m = _bound_re.search(bound or '')
+        if m is not None:
+            parts.append(Partition(name, int(m.group(1)), int(m.group(2)), max(int(est), 0)))
+    return sorted(parts, key=lambda p: p.start)
+
+
+def _align(block: int) -> int:
+    return (int(block) // settings.PARTITION_BLOCKS) * settings.PARTITION_BLOCKS
+
+
+def _create_missing(table: str, start: int, end: int) -> int:
+    """Create partitions for any blocks from ``start`` up to (not including) ``end`` which aren't in a partition yet"""
+    size, created = settings.PARTITION_BLOCKS, 0
+    parts = list_partitions(table)
+    with connection.cursor() as cursor:
+        for slot in range(_align(start), end, size):
+            # Trim this slot around any existing partitions which overlap it (e.g. if PARTITION_BLOCKS was changed)
+            s, slot_end = slot, slot + size
+            for p in parts:
+                if p.end <= s or p.start >= slot_end:
+                    continue
+                if p.start > s:
+                    cursor.execute(_create_sql(table, s, p.start))
+                    created += 1
+                s = max(s, p.end)
+            if s < slot_end:
+                cursor.execute(_create_sql(table, s, slot_end))
+                created += 1
+    return created
+
+
+def _create_sql(table: str, start: int, end: int) -> str:
+    log.info('Creating partition %s_b%d for blocks %d to %d', table, start, start, end - 1)
+    return f'CREATE TABLE {table}_b{int(start)} PARTITION OF {table} FOR VALUES FROM ({int(start)}) TO ({int(end)});'
+
+
+def ensure_partitions(start_block: int, end_block: int = None, ahead: int = None) -> int:
+    """
+    Make sure every partitioned table has partitions for the blocks ``start_block`` to ``end_block``, plus ``ahead``
+    partitions past ``end_block`` (default: ``PARTITION_AHEAD``). Returns the amount of partitions created.
+
+    Cheap to call repeatedly - ranges which are already known to be covered are skipped without any queries.
+    """
+    end_block = start_block if end_block is None else end_block
+    ahead = settings.PARTITION_AHEAD if ahead is None else ahead
+    start, end = _align(start_block), _align(end_block) + (ahead + 1) * settings.PARTITION_BLOCKS
+    created = 0
+    for table in PARTITIONED_TABLES:
+        lo, hi = _covered.get(table, (0, 0))
+        if lo <= start and end <= hi:
+            continue
+        if not is_partitioned(table):
+            continue
+        with transaction.atomic():
+            created += _create_missing(table, start, end)
+        # Only extend the cached range if it overlaps / touches the range we've already checked
+        _covered[table] = (min(lo, start), max(hi, end)) if table in _covered and start <= hi and lo <= end \
+            else (start, end)
+    return created
+
+
+def drop_partitions(before_block: int, keep_blocks=False) -> int:
+    """
+    Drop every partition which only holds blocks lower than ``before_block``. Unlike deleting rows, this is a
+    metadata-only operation. Unless ``keep_blocks`` is True, the blocks those partitions held are then deleted from
+    the block table and the coverage table, so they aren't treated as imported.
+
+    The dropped transfers are subtracted from the running balances and transfer rollups first (and the deleted blocks
+    from the producer statistics), the same as when blocks are deleted, so re-importing them later can't count them
+    twice. Everything happens in a single transaction.
+
+    Returns the amount of partitions dropped.
+    """
+    # Actions first, as they refer to transactions
+    drops = {
+        table: [p for p in list_partitions(table) if p.end <= int(before_block)]
+        for table in reversed(list(PARTITIONED_TABLES)) if is_partitioned(table)
+    }
+    drops = {table: parts for table, parts in drops.items() if len(parts) > 0}
+    if len(drops) == 0:
+        return 0
+    # Blocks are only deleted below the lowest partition boundary which every table was dropped up to
+    cutoff = min(max(p.end for p in parts) for parts in drops.values())
+
+    def dropped_range(model) -> Optional[Tuple[int, int]]:
+        parts = drops.get(model._meta.db_table)
+        return None if parts is None else (min(p.start for p in parts), max(p.end for p in parts) - 1)
+
+    with transaction.atomic():
+        # In the same order as the importer, so the locks they take can't deadlock with it
+        transfers, actions = dropped_range(EOSTransfer), dropped_range(EOSAction)
+        if transfers is not None:
+            log.info('Subtracting the transfers in blocks %d to %d from the balances', *transfers)
+            balances.remove_blocks(*transfers)
+        lowest = EOSBlock.objects.aggregate(lowest=Min('number'))['lowest']
+        if not keep_blocks and lowest is not None and lowest < cutoff:
+            log.info('Subtracting blocks %d to %d from the producer statistics', lowest, cutoff - 1)
+            producers.remove_blocks(lowest, cutoff - 1)
+        if actions is not None:
+            log.info('Subtracting the transfers in blocks %d to %d from the transfer rollups', *actions)
+            rollups.remove_blocks(*actions)
+
+        with connection.cursor() as cursor:
+            for table, parts in drops.items():
+                for p in parts:
+                    log.info('Dropping partition %s (blocks %d to %d, ~%d rows)', p.name, p.start, p.end - 1, p.rows)
+                    cursor.execute(f'DROP TABLE {p.name};')
+            if not keep_blocks:
+                log.info('Deleting blocks lower than %d from the block and coverage tables', cutoff)
+                cursor.execute(f'DELETE FROM {_block_table} WHERE number < %s;', [cutoff])
+        if not keep_blocks:
+            uncover_blocks(0, cutoff - 1)
+    _covered.clear()
+    return sum(len(parts) for parts in drops.values())
+
+
+def convert_table(table: str, drop_old=False) -> int:
+    """
+    Convert the normal table ``table`` into a partitioned table, copying its existing rows into new partitions.
+    The original table is kept as ``<table>_unpartitioned`` unless ``drop_old`` is True. Returns the rows copied.
+
+    The whole conversion happens in one transaction, holding an exclusive lock on ``table``, so stop the importers
+    (Celery) and the API first - it may take a long time on a large database.
+    """
+    cfg, old = PARTITIONED_TABLES[table], f'{table}_unpartitioned'
+    key = cfg['key']
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE;')
+        if table == EOSAction._meta.db_table:
+            cursor.execute(f"""
+                UPDATE {table} AS a SET block_number = t.block_id FROM {EOSTransaction._meta.db_table} AS t
+                WHERE a.transaction_id = t.txid AND a.block_number IS NULL;
+            """)
+
+        # Capture the original indexes and outgoing foreign keys, so they can be re-created on the new table
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN '
+            '(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass);', [table, table]
+        )
+        index_defs = [d for _, d in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass "
+            "AND contype = 'f';", [table]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute('SELECT indexname FROM pg_indexes WHERE tablename = %s;', [table])
+        all_indexes = [i for i, in cursor.fetchall()]
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s);', [table, cfg['pk']])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f'SELECT min({key}), max({key}), count(*) FROM {table};')
+        min_block, max_block, total_rows = cursor.fetchone()
+
+        # Foreign keys pointing at this table can't reference a partitioned table without the partition key
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE confrelid = %s::regclass "
+            "AND contype = 'f' AND conparentid = 0;", [table]
+        )
+        for rel, con in cursor.fetchall():
+            log.info('Dropping foreign key %s on %s (it can not reference a partitioned table)', con, rel)
+            cursor.execute(f'ALTER TABLE {rel} DROP CONSTRAINT {con};')
+
+        log.info('Renaming %s to %s and creating the partitioned table...', table, old)
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old};')
+        for idx in all_indexes:
+            cursor.execute(f'ALTER INDEX {idx} RENAME TO {idx[:59]}_old;')
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING STORAGE) PARTITION BY RANGE ({key});'
+        )
+        cursor.execute(f'ALTER TABLE {table} ALTER COLUMN {key} SET NOT NULL;')
+        cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({cfg['pk']}, {key});")
+        for cols in cfg['unique']:
+            cursor.execute(f"ALTER TABLE {table} ADD UNIQUE ({', '.join(cols)}, {key});")
+        for d in index_defs:
+            cursor.execute(d)
+        for name, fk in foreign_keys:
+            # The old table is only kept as a backup - it mustn't stop blocks from being deleted
+            cursor.execute(f'ALTER TABLE {old} DROP CONSTRAINT {name};')
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {fk};')
+        if sequence is not None:
+            cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{cfg['pk']};")
+
+        if min_block is not None:
+            _create_missing(table, min_block, max_block + 1)
+            log.info('Copying %d rows from %s into %s...', total_rows, old, table)
+            cursor.execute(f'INSERT INTO {table} SELECT * FROM {old};')
+        if drop_old:
+            cursor.execute(f'DROP TABLE {old};')
+    _covered.pop(table, None)
+    return total_rows
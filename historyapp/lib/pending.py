@@ -0,0 +1,114 @@
+"""
+A queue of block ranges whose changes still have to be applied to a derived table (:class:`.PendingUpdate`).
+
+Derived tables such as the transfer rollups are shared by every block - e.g. each ``eosio.token`` transfer updates
+the same hourly and daily row, and the producer statistics of a round depend on the blocks either side of it.
+Updating them inside each block's import transaction would hold those row locks until the block commits, so
+concurrent imports of nearby blocks would queue up behind each other. Instead, the importer queues the block (or its
+production round) with :func:`.add` - a plain insert, which never waits for another import - and the queued ranges
+are applied a batch at a time afterwards, taking each shared row lock once per batch.
+
+Each Celery worker process applies a batch after a task once every ``PENDING_APPLY_SECS`` seconds (see
+:data:`.schedule`), and ``./manage.py apply_pending_updates`` applies everything which is queued.
+
+Batches are claimed with ``FOR UPDATE SKIP LOCKED`` and deleted in the same transaction as they're applied, so
+several workers can apply batches at once, each block is applied exactly once, and a crash just leaves the batch
+queued.
+
+    >>> add(KIND_ROLLUPS, 12345)                     # Queue block 12345 (in the transaction which imports it)
+    >>> with transaction.atomic():
+    ...     take(KIND_ROLLUPS, 1000)                 # Claim and delete up to 1000 queued ranges
+    [(12345, 12345)]
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import time
+from threading import Lock
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db import connection
+
+from historyapp.models import PendingUpdate
+import logging
+
+log = logging.getLogger(__name__)
+
+KIND_ROLLUPS = 'rollups'
+"""Blocks whose transfers haven't been added to the transfer rollups yet (one row per block)"""
+
+KIND_PRODUCERS = 'producers'
+"""Ranges of production rounds whose block producer statistics have to be re-calculated (see :mod:`.producers`)"""
+
+_pending_table = PendingUpdate._meta.db_table
+
+query_take = f"""
+DELETE FROM {_pending_table} WHERE id IN (
+    SELECT id FROM {_pending_table} WHERE kind = %s ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+)
+RETURNING range_start, range_end;
+"""
+
+query_discard = f"""
+DELETE FROM {_pending_table} WHERE kind = %s AND range_start >= %s AND range_start <= %s
+RETURNING range_start, range_end;
+"""
+
+
+def add(kind: str, start: int, end: int = None):
+    """Queue the inclusive range ``start`` to ``end`` (default: just ``start``) to be applied to ``kind``"""
+    start = int(start)
+    PendingUpdate.objects.create(kind=kind, range_start=start, range_end=start if end is None else int(end))
+
+
+def take(kind: str, limit: int) -> List[Tuple[int, int]]:
+    """
+    Claim and delete up to ``limit`` of the oldest queued ranges of ``kind``, skipping any which another transaction
+    has already claimed. Must be called in the transaction which applies them, so they're only gone once applied.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(query_take, [kind, int(limit)])
+        return [(int(s), int(e)) for s, e in cursor.fetchall()]
+
+
+def discard(kind: str, start: int, end: int) -> List[Tuple[int, int]]:
+    """
+    Delete the queued ranges of ``kind`` which start within the blocks ``start`` to ``end`` (inclusive), returning
+    them - i.e. the ranges which haven't been applied. Waits for any of them which are being applied to commit first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(query_discard, [kind, int(start), int(end)])
+        return [(int(s), int(e)) for s, e in cursor.fetchall()]
+
+
+class Schedule:
+    """Decides when a worker process should apply a batch of queued updates - every ``PENDING_APPLY_SECS`` seconds"""
+    def __init__(self):
+        self.lock = Lock()
+        self.last_apply = time.monotonic()
+
+    def due(self) -> bool:
+        """Returns True (and restarts the interval) if it's time to apply another batch"""
+        with self.lock:
+            if (time.monotonic() - self.last_apply) < settings.PENDING_APPLY_SECS:
+                return False
+            self.last_apply = time.monotonic()
+            return True
+
+
+schedule = Schedule()
+"""When this worker process applies its next batch of queued updates"""
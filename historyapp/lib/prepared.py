@@ -0,0 +1,159 @@
+"""
+Server-side prepared statements for the importer's hot path queries.
+
+Each :class:`.PreparedStatement` is ``PREPARE``'d the first time it's used on a database connection, after which
+it's run with ``EXECUTE``, so PostgreSQL doesn't have to parse / plan the same query for every block. If
+``DB_PREPARED_STATEMENTS`` is disabled, the query is simply run as a normal parameterised query.
+
+The block / transaction / action inserts are :class:`.PreparedInsert` s, which prepare one multi-row ``INSERT`` for
+each number of rows inserted at once.
+
+Example::
+
+    >>> BLOCK_EXISTS.fetchone(12345)
+    (True,)
+    >>> INSERT_ACTION.insert(actions)
+    3
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from typing import Dict, Iterable, List, Optional
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from django.db import connection, models
+
+from historyapp.fields import hex_to_bytes
+from historyapp.models import EOSBlock, EOSTransaction, EOSBlockRange, EOSAction
+import logging
+
+log = logging.getLogger(__name__)
+
+# The names prepared in each session, keyed by the underlying psycopg2 connection rather than Django's wrapper, so
+# that a connection handed out again by the pool (``DB_POOL``) keeps its statements
+_prepared = WeakKeyDictionary()
+
+
+class PreparedStatement:
+    """
+    A query which is prepared once per database connection, then executed by name.
+
+    :param str name: A unique name for the prepared statement
+    :param str sql: The query, using ``%s`` placeholders (the same as a normal Django raw query)
+    :param list types: The PostgreSQL type of each placeholder, in order, e.g. ``['bigint', 'text']``
+    """
+    def __init__(self, name: str, sql: str, types: List[str]):
+        self.name, self.sql, self.types = name, sql.strip().rstrip(';'), list(types)
+        # Convert %s placeholders into $1, $2, ... for PREPARE
+        parts = self.sql.split('%s')
+        self.prepare_sql = parts[0] + ''.join(f'${i}{p}' for i, p in enumerate(parts[1:], start=1))
+        self.execute_sql = f"EXECUTE {name}({', '.join(['%s'] * len(self.types))})" if self.types else f'EXECUTE {name}'
+
+    def _prepare(self, cursor):
+        prepared = _prepared.setdefault(connection.connection, set())
+        if self.name not in prepared:
+            types = f"({', '.join(self.types)})" if self.types else ''
+            cursor.execute(f'PREPARE {self.name}{types} AS {self.prepare_sql}')
+            prepared.add(self.name)
+
+    def execute(self, cursor, *params):
+        """Run the statement using ``cursor`` (a Django cursor), preparing it first if needed"""
+        if not settings.DB_PREPARED_STATEMENTS or connection.vendor != 'postgresql':
+            return cursor.execute(self.sql, list(params))
+        self._prepare(cursor)
+        return cursor.execute(self.execute_sql, list(params))
+
+    def fetchone(self, *params) -> Optional[tuple]:
+        with connection.cursor() as cursor:
+            self.execute(cursor, *params)
+            return cursor.fetchone()
+
+
+class PreparedInsert:
+    """
+    A multi-row ``INSERT`` of model instances into every column except an auto-incrementing primary key. A
+    :class:`.PreparedStatement` is made for each number of rows, up to ``batch_size`` rows per statement.
+
+    Like ``bulk_create``, no signals are sent, and auto-incrementing primary keys aren't set on the instances.
+
+    :param str name: A unique name prefix for the prepared statements
+    :param model: The Django model to insert into
+    :param bool ignore_conflicts: Skip rows which conflict with an existing row (``ON CONFLICT DO NOTHING``)
+    :param int batch_size: The most rows to insert with one statement
+    """
+    def __init__(self, name: str, model, ignore_conflicts: bool = False, batch_size: int = 50):
+        self.name, self.model, self.ignore_conflicts, self.batch_size = name, model, ignore_conflicts, batch_size
+        self.fields = [f for f in model._meta.concrete_fields if not isinstance(f, models.AutoField)]
+        self._statements = {}  # type: Dict[int, PreparedStatement]
+
+    def statement(self, rows: int) -> PreparedStatement:
+        """The statement which inserts ``rows`` rows"""
+        if rows not in self._statements:
+            qn = connection.ops.quote_name
+            columns = ', '.join(qn(f.column) for f in self.fields)
+            values = ', '.join([f"({', '.join(['%s'] * len(self.fields))})"] * rows)
+            sql = f'INSERT INTO {qn(self.model._meta.db_table)} ({columns}) VALUES {values}'
+            if self.ignore_conflicts:
+                sql += ' ON CONFLICT DO NOTHING'
+            types = [f.db_type(connection) for f in self.fields] * rows
+            self._statements[rows] = PreparedStatement(f'{self.name}_{rows}', sql, types)
+        return self._statements[rows]
+
+    def insert(self, objs: Iterable[models.Model]) -> int:
+        """Insert the model instances ``objs``, returning the number of rows inserted"""
+        objs, inserted = list(objs), 0
+        with connection.cursor() as cursor:
+            for i in range(0, len(objs), self.batch_size):
+                batch = objs[i:i + self.batch_size]
+                # The same conversion as a normal save, including filling in auto_now / auto_now_add fields
+                params = [f.get_db_prep_save(f.pre_save(obj, True), connection) for obj in batch for f in self.fields]
+                self.statement(len(batch)).execute(cursor, *params)
+                inserted += cursor.rowcount
+        for obj in objs:
+            obj._state.adding, obj._state.db = False, connection.alias
+        return inserted
+
+
+BLOCK_EXISTS = PreparedStatement(
+    'eoshist_block_exists', f'SELECT EXISTS(SELECT 1 FROM {EOSBlock._meta.db_table} WHERE number = %s)', ['bigint']
+)
+
+TX_EXISTS = PreparedStatement(
+    'eoshist_tx_exists', f'SELECT EXISTS(SELECT 1 FROM {EOSTransaction._meta.db_table} WHERE txid = %s)', ['bytea']
+)
+
+_range_table = EOSBlockRange._meta.db_table
+
+UPSERT_RANGE = PreparedStatement('eoshist_upsert_range', f"""
+INSERT INTO {_range_table} (start_block, end_block, updated_at) VALUES (%s, %s, now())
+ON CONFLICT (start_block) DO UPDATE
+    SET end_block = GREATEST({_range_table}.end_block, EXCLUDED.end_block), updated_at = now()
+""", ['bigint', 'bigint'])
+
+INSERT_BLOCK = PreparedInsert('eoshist_insert_block', EOSBlock)
+
+INSERT_TX = PreparedInsert('eoshist_insert_tx', EOSTransaction)
+
+INSERT_ACTION = PreparedInsert('eoshist_insert_action', EOSAction, ignore_conflicts=True)
+
+
+def block_exists(number: int) -> bool:
+    return BLOCK_EXISTS.fetchone(int(number))[0]
+
+
+def tx_exists(txid: str) -> bool:
+    return TX_EXISTS.fetchone(hex_to_bytes(txid))[0]
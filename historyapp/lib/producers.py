@@ -0,0 +1,326 @@
+"""
+Functions for maintaining the block producer statistics - :class:`.ProducerRound` (blocks produced / missed by
+each producer per production round) and :class:`.ProducerSchedule` (which producer owns each schedule position).
+
+EOSIO divides time into 500ms block slots (counted from 2000-01-01), and the producer of slot ``s`` is the producer
+at position ``(s % (PRODUCER_SCHEDULE_SIZE * 12)) // 12`` of the active schedule - each producer gets 12 slots in a
+row, once per round. Every imported block records which producer owns its position, and any slots skipped between
+two consecutive blocks (``N - 1`` and ``N``) are counted as missed by the producers owning those slots.
+
+Blocks can be imported in any order, so rather than counting each block (and the gaps either side of it) in the
+transaction which imports it - which would have to wait for any concurrent import of a neighbouring block to commit -
+the importer calls :func:`.add_blocks` to queue the round containing the block as a :class:`.PendingUpdate`, and
+anything which deletes blocks calls :func:`.remove_blocks` to queue the rounds around them. :func:`.apply_pending`
+then re-calculates each queued round (and the rounds touched by the gaps at either edge) from scratch, from the
+committed blocks, with a single set-based query - see :mod:`historyapp.lib.pending`. As both neighbours of a gap are
+committed before the later of their rounds is re-calculated, every gap is counted once, whatever order the blocks are
+imported in.
+
+Missed slots can only be attributed once a producer has been seen at that position of the schedule. Whenever a
+re-calculation learns a new position, every round already counted with that schedule version is queued again, so the
+slots it missed before the position was learned are counted too. :func:`.recompute_blocks`
+(``./manage.py recompute_producer_stats``) re-calculates a block range straight away, e.g. after importing blocks
+with ``PRODUCER_STATS`` disabled. Rounds within archived block ranges are never re-calculated, as their blocks are no
+longer in the database.
+
+    >>> add_blocks(12345)                    # Queue the round containing block 12345
+    >>> remove_blocks(12340, 12345)          # Queue the rounds of blocks 12339 to 12346 before deleting 12340 - 12345
+    >>> apply_pending(1000)                  # Re-calculate the rounds of up to 1000 queued rows
+    1
+    >>> recompute_blocks(12000, 13000)       # Re-calculate every round which overlaps blocks 12000 to 13000
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min, Max
+
+from historyapp.lib import blocktime, pending
+from historyapp.models import EOSBlock, ProducerRound, ProducerSchedule, ArchiveSegment
+import logging
+
+log = logging.getLogger(__name__)
+
+BLOCK_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+"""Block slot 0 - block slots are counted in half seconds since this time"""
+
+REPETITIONS = 12
+"""How many consecutive block slots each producer gets per round"""
+
+_block_table = EOSBlock._meta.db_table
+_round_table = ProducerRound._meta.db_table
+_schedule_table = ProducerSchedule._meta.db_table
+
+# The blocks within a range of the block table, with their slot numbers
+_blocks = f"""
+SELECT number, producer, schedule_version,
+       round((extract(epoch FROM timestamp) - {int(BLOCK_EPOCH.timestamp())}) * 2)::bigint AS slot,
+       (coalesce(new_producers, '') NOT IN ('', 'None') OR header_extensions @> '[[1]]'::jsonb)::int AS proposed
+FROM {_block_table} WHERE number >= %(block_lo)s AND number <= %(block_hi)s
+"""
+
+query_learn_schedule = f"""
+INSERT INTO {_schedule_table} (version, position, producer)
+SELECT DISTINCT ON (1, 2) schedule_version, (slot %% %(round_slots)s) / {REPETITIONS}, producer
+FROM ({_blocks}) AS b
+WHERE producer IS NOT NULL AND number >= %(produced_lo)s AND number <= %(produced_hi)s
+ORDER BY 1, 2, number
+ON CONFLICT (version, position) DO NOTHING
+RETURNING version;
+"""
+
+query_round_stats = f"""
+WITH b AS ({_blocks}),
+produced AS (
+    SELECT slot / %(round_slots)s AS round, producer, schedule_version, 1 AS produced, 0 AS missed, proposed
+    FROM b
+    WHERE producer IS NOT NULL AND number >= %(produced_lo)s AND number <= %(produced_hi)s
+      AND slot >= %(slot_lo)s AND slot <= %(slot_hi)s
+),
+missed AS (
+    SELECT g / %(round_slots)s AS round, s.producer, prev.schedule_version, 0 AS produced, 1 AS missed, 0 AS proposed
+    FROM b AS cur
+    JOIN b AS prev ON prev.number = cur.number - 1
+    CROSS JOIN generate_series(greatest(prev.slot + 1, %(slot_lo)s), least(cur.slot - 1, %(slot_hi)s)) AS g
+    JOIN {_schedule_table} AS s ON s.version = prev.schedule_version
+                               AND s.position = (g %% %(round_slots)s) / {REPETITIONS}
+    WHERE cur.number >= %(pair_lo)s AND cur.number <= %(pair_hi)s
+)
+INSERT INTO {_round_table} AS r (
+    round, producer, schedule_version, blocks_produced, missed_slots, expected_slots, schedule_changes
+)
+SELECT round, producer, max(schedule_version), sum(produced), sum(missed), sum(produced) + sum(missed), sum(proposed)
+FROM (SELECT * FROM produced UNION ALL SELECT * FROM missed) AS x
+GROUP BY 1, 2;
+"""
+
+MAX_APPLY_ROUNDS = 100
+"""The most rounds :func:`.apply_pending` re-calculates in one transaction - any more are queued again"""
+
+
+def round_slots() -> int:
+    """The number of block slots in each production round"""
+    return settings.PRODUCER_SCHEDULE_SIZE * REPETITIONS
+
+
+def round_start(round_num: int) -> datetime:
+    """The time of the first block slot in the round ``round_num``"""
+    return BLOCK_EPOCH + timedelta(milliseconds=int(round_num) * round_slots() * 500)
+
+
+def time_round(dt: datetime) -> int:
+    """The number of the round which contains the time ``dt``"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int((dt - BLOCK_EPOCH) / timedelta(milliseconds=500)) // round_slots()
+
+
+def _apply(params: dict) -> List[int]:
+    """
+    Count the blocks / gaps selected by ``params``, into rounds which have been deleted beforehand. Returns the
+    schedule versions which learned a new producer position.
+    """
+    params = dict(params, round_slots=round_slots())
+    with connection.cursor() as cursor:
+        cursor.execute(query_learn_schedule, params)
+        learned = sorted(set(row[0] for row in cursor.fetchall()))
+        cursor.execute(query_round_stats, params)
+    return learned
+
+
+def _queue_blocks(start_block: int, end_block: int):
+    """Queue the rounds containing the blocks in the database from ``start_block`` to ``end_block`` (inclusive)"""
+    r = EOSBlock.objects.filter(number__gte=start_block, number__lte=end_block) \
+        .aggregate(first=Min('timestamp'), last=Max('timestamp'))
+    if r['first'] is not None:
+        pending.add(pending.KIND_PRODUCERS, time_round(r['first']), time_round(r['last']))
+
+
+def add_blocks(start_block: int, end_block: int = None):
+    """
+    Queue the rounds containing the blocks ``start_block`` to ``end_block`` (inclusive) to be re-calculated by
+    :func:`.apply_pending`. Must be called in the same transaction which imports the block(s), after they're saved.
+    """
+    start_block = int(start_block)
+    _queue_blocks(start_block, start_block if end_block is None else int(end_block))
+
+
+def remove_blocks(start_block: int, end_block: int = None):
+    """
+    Queue the rounds containing the blocks ``start_block`` to ``end_block`` (inclusive), and their neighbouring
+    blocks, to be re-calculated by :func:`.apply_pending`. Must be called in the same transaction which deletes the
+    block(s), before they're deleted.
+    """
+    start_block = int(start_block)
+    end_block = start_block if end_block is None else int(end_block)
+    # The gaps between the deleted blocks and their neighbours stop being counted too
+    _queue_blocks(start_block - 1, end_block + 1)
+
+
+def remove_block_list(blocks):
+    """Like :func:`.remove_blocks`, for a list of individual blocks - consecutive blocks are removed as one range"""
+    blocks = sorted(set(int(b) for b in blocks))
+    runs = []
+    for b in blocks:
+        if len(runs) > 0 and runs[-1][1] == b - 1:
+            runs[-1][1] = b
+        else:
+            runs.append([b, b])
+    for start, end in runs:
+        remove_blocks(start, end)
+
+
+def _merge(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping / adjacent inclusive ranges"""
+    merged = []
+    for start, end in sorted(ranges):
+        if len(merged) > 0 and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _archived_rounds() -> List[Tuple[int, int]]:
+    """The rounds which overlap an archived block range - their blocks aren't in the database to re-calculate from"""
+    return _merge([
+        (time_round(start), time_round(end))
+        for start, end in ArchiveSegment.objects.exclude(start_time=None).values_list('start_time', 'end_time')
+    ])
+
+
+def _unarchived(first_round: int, last_round: int, archived: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """The parts of the rounds ``first_round`` to ``last_round`` which don't overlap ``archived``"""
+    parts = [(first_round, last_round)]
+    for a_start, a_end in archived:
+        parts = [
+            p for start, end in parts
+            for p in ((start, min(end, a_start - 1)), (max(start, a_end + 1), end)) if p[0] <= p[1]
+        ]
+    return parts
+
+
+def _edges(first_round: int, last_round: int) -> Tuple[Optional[int], Optional[int]]:
+    """
+    The first block at or after the start of ``first_round``, and the first block after the end of ``last_round``
+    (either may be None) - the blocks within the rounds are the ones in between.
+    """
+    first = blocktime.first_block_after(round_start(first_round))
+    return first, blocktime.first_block_after(round_start(last_round + 1))
+
+
+def _block_round(number: int) -> Optional[int]:
+    """The round of the block ``number``, or None if it isn't in the database"""
+    ts = EOSBlock.objects.filter(number=number).values_list('timestamp', flat=True).first()
+    return None if ts is None else time_round(ts)
+
+
+def recompute_rounds(first_round: int, last_round: int) -> int:
+    """
+    Delete and re-calculate the statistics of the rounds ``first_round`` to ``last_round`` (inclusive), from the
+    blocks in the database. Must be called in a transaction. Returns the number of rounds which were re-calculated.
+
+    Any schedule versions which learn a new producer position have their earlier rounds queued to be re-calculated.
+    """
+    rs = round_slots()
+    with connection.cursor() as cursor:
+        # EXCLUSIVE mode still allows reads, but makes anything else re-calculating rounds wait until this commits
+        cursor.execute(f'LOCK TABLE {_round_table} IN EXCLUSIVE MODE;')
+    ProducerRound.objects.filter(round__gte=first_round, round__lte=last_round).delete()
+    first, after = _edges(first_round, last_round)
+    if first is not None:
+        # Gaps are only counted between consecutive block numbers, so the blocks in the rounds, plus the block before
+        # and the block after them, are all the blocks which can be counted in them
+        lo = first - 1
+        hi = EOSBlock.objects.aggregate(highest=Max('number'))['highest'] if after is None else after
+        learned = _apply(dict(
+            block_lo=lo, block_hi=hi, produced_lo=lo, produced_hi=hi, pair_lo=lo + 1, pair_hi=hi,
+            slot_lo=first_round * rs, slot_hi=(last_round + 1) * rs - 1,
+        ))
+        for version in learned:
+            r = ProducerRound.objects.filter(schedule_version=version).aggregate(first=Min('round'), last=Max('round'))
+            if r['first'] is not None:
+                log.debug('Learned new positions of schedule v%d - re-queueing rounds %d to %d', version, *r.values())
+                pending.add(pending.KIND_PRODUCERS, r['first'], r['last'])
+    return last_round - first_round + 1
+
+
+def apply_pending(limit: int = 1000) -> int:
+    """
+    Re-calculate the rounds of up to ``limit`` rows queued by :func:`.add_blocks` / :func:`.remove_blocks`, in one
+    transaction - including the rounds touched by the gaps between the queued rounds' blocks and their neighbours.
+    At most :data:`.MAX_APPLY_ROUNDS` rounds are re-calculated, and the rest are queued again.
+
+    Returns the number of queued rows which were applied.
+    """
+    with transaction.atomic():
+        taken = pending.take(pending.KIND_PRODUCERS, limit)
+        archived, budget = _archived_rounds(), MAX_APPLY_ROUNDS
+        for first_round, last_round in _merge(taken):
+            # Widen the range to the rounds of the gaps at its edges, which the blocks in it may have closed / opened
+            first, after = _edges(first_round, last_round)
+            before = None if first is None else _block_round(first - 1)
+            if before is not None:
+                first_round = min(first_round, before)
+            if after is not None and _block_round(after - 1) is not None:
+                last_round = max(last_round, _block_round(after))
+            for start, end in _unarchived(first_round, last_round, archived):
+                if budget <= 0:
+                    pending.add(pending.KIND_PRODUCERS, start, end)
+                    continue
+                chunk_end = min(end, start + budget - 1)
+                budget -= recompute_rounds(start, chunk_end)
+                if chunk_end < end:
+                    pending.add(pending.KIND_PRODUCERS, chunk_end + 1, end)
+    return len(taken)
+
+
+def recompute_blocks(start_block: int, end_block: int) -> int:
+    """
+    Delete and re-calculate the statistics of every round which overlaps the blocks ``start_block`` to ``end_block``
+    (inclusive), from the blocks in the database. Returns the number of rounds which were re-calculated.
+
+    Runs in a single transaction, while the importer keeps running.
+    """
+    with transaction.atomic():
+        r = EOSBlock.objects.filter(number__gte=start_block, number__lte=end_block) \
+            .aggregate(first=Min('timestamp'), last=Max('timestamp'))
+        if r['first'] is None:
+            return 0
+        parts = _unarchived(time_round(r['first']), time_round(r['last']), _archived_rounds())
+        return sum(recompute_rounds(start, end) for start, end in parts)
+
+
+def recompute_all(start_block: int = None, end_block: int = None, chunk_blocks: int = 50000) -> int:
+    """
+    Re-calculate the statistics for the blocks ``start_block`` to ``end_block`` (default: every block in the database),
+    ``chunk_blocks`` blocks per transaction. Returns the number of rounds which were re-calculated.
+    """
+    r = EOSBlock.objects.aggregate(lowest=Min('number'), highest=Max('number'))
+    if r['lowest'] is None:
+        return 0
+    start_block = r['lowest'] if start_block is None else max(int(start_block), r['lowest'])
+    end_block = r['highest'] if end_block is None else min(int(end_block), r['highest'])
+    total = 0
+    for s in range(start_block, end_block + 1, chunk_blocks):
+        e = min(s + chunk_blocks - 1, end_block)
+        log.info('Re-calculating producer statistics for blocks %d to %d...', s, e)
+        total += recompute_blocks(s, e)
+    return total
@@ -0,0 +1,280 @@
+"""
+Publishes Celery task messages from asyncio code over one persistent AMQP channel, using publisher confirms.
+
+Rather than each task being sent with ``apply_async`` (which checks a connection out of Celery's producer pool and
+publishes synchronously), :class:`.TaskPublisher` builds the same task messages Celery would, and pipelines them over
+a single :class:`pika.adapters.asyncio_connection.AsyncioConnection`. Messages are only considered published once the
+broker has confirmed them - :meth:`.TaskPublisher.flush` waits for that.
+
+If the connection drops, it's re-opened the next time the publisher is used, and any messages which the broker never
+confirmed are published again. Block imports are idempotent, so an occasional duplicate task is harmless.
+
+Example::
+
+    >>> from historyapp.tasks import import_block_message
+    >>> async with TaskPublisher() as pub:
+    ...     for block in range(1000, 2000):
+    ...         task, kwargs, options = import_block_message(block, queue='eoshist')
+    ...         await pub.publish(task, kwargs, **options)
+    ...     await pub.flush()
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import asyncio
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+import pika
+from celery import Task
+from celery.utils import uuid
+from django.conf import settings
+from kombu.serialization import dumps
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.channel import Channel
+from pika.spec import Basic
+
+from eoshistory.celery import app
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class PublishError(Exception):
+    """Raised when the broker connection fails, or published tasks aren't confirmed in time"""
+    pass
+
+
+def connection_params() -> pika.ConnectionParameters:
+    """Returns the :class:`pika.ConnectionParameters` for Celery's configured broker"""
+    conn = app.connection_for_write()
+    return pika.ConnectionParameters(
+        host=conn.hostname or 'localhost', port=conn.port or 5672, virtual_host=conn.virtual_host or '/',
+        credentials=pika.PlainCredentials(conn.userid or 'guest', conn.password or 'guest'),
+    )
+
+
+class TaskPublisher:
+    """
+    Publishes Celery tasks over one persistent AMQP channel with publisher confirms. Not thread safe - it's meant to
+    be shared by the coroutines of a single event loop.
+
+    :param int max_unconfirmed: Pause :meth:`.publish` while this many messages are waiting to be confirmed
+                                (default: ``SYNC_PUBLISH_MAX_UNCONFIRMED``)
+    :param float confirm_timeout: Raise :class:`.PublishError` if no confirms are received for this many seconds
+    """
+    def __init__(self, max_unconfirmed: int = None, confirm_timeout: float = 60):
+        self.max_unconfirmed = settings.SYNC_PUBLISH_MAX_UNCONFIRMED if max_unconfirmed is None else max_unconfirmed
+        self.confirm_timeout = confirm_timeout
+        self.enabled = settings.SYNC_BATCH_PUBLISH
+        self.connection: Optional[AsyncioConnection] = None
+        self.channel: Optional[Channel] = None
+        self.declared = set()
+        # Delivery tag -> (routing_key, body, properties) for every message the broker hasn't confirmed yet
+        self.unconfirmed: Dict[int, Tuple[str, bytes, pika.BasicProperties]] = {}
+        self.next_tag = 1
+        self.published, self.confirmed, self.republished = 0, 0, 0
+        self._waiters: List[asyncio.Future] = []
+        self._ops: List[asyncio.Future] = []
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def publish(self, task: Task, kwargs: dict, queue: str, link=None, link_error=None) -> str:
+        """
+        Publish a ``task`` message with ``kwargs`` onto the Celery queue ``queue``. Returns the new task's ID.
+
+        The message may not have reached the broker yet when this returns - call :meth:`.flush` to wait until
+        every message published so far has been confirmed.
+        """
+        if not self.enabled:
+            return task.apply_async(kwargs=kwargs, queue=queue, link=link, link_error=link_error).id
+
+        while True:
+            await self._ensure_channel()
+            if len(self.unconfirmed) < self.max_unconfirmed:
+                break
+            await self._wait_confirms()
+        await self._declare(queue)
+
+        task_id = uuid()
+        msg = app.amqp.create_task_message(
+            task_id, task.name, (), kwargs, ignore_result=task.ignore_result,
+            # Celery's saferepr is the slowest part of building a message - our kwargs are small and safe to repr
+            argsrepr='()', kwargsrepr=repr(kwargs),
+            callbacks=None if link is None else [link], errbacks=None if link_error is None else [link_error],
+        )
+        content_type, content_encoding, body = dumps(msg.body, serializer=task.serializer)
+        props = pika.BasicProperties(
+            content_type=content_type, content_encoding=content_encoding, headers=msg.headers,
+            correlation_id=task_id, reply_to=msg.properties.get('reply_to') or None, delivery_mode=2, priority=0,
+        )
+        self._publish(queue, body, props)
+        self.published += 1
+        return task_id
+
+    async def flush(self):
+        """Wait until the broker has confirmed every message published so far"""
+        while len(self.unconfirmed) > 0:
+            await self._ensure_channel()
+            if len(self.unconfirmed) > 0:
+                await self._wait_confirms()
+
+    async def close(self):
+        """Wait for any outstanding confirms, then close the connection"""
+        try:
+            await self.flush()
+        except PublishError:
+            log.exception('Closing task publisher with %d unconfirmed messages', len(self.unconfirmed))
+        if self.connection is not None and not (self.connection.is_closed or self.connection.is_closing):
+            self._closing = True
+            closed = self._op()
+            self.connection.close()
+            await asyncio.gather(closed, return_exceptions=True)
+        if self.enabled:
+            log.info('Task publisher closed. Published %d tasks, %d confirmed, %d re-published.',
+                     self.published, self.confirmed, self.republished)
+
+    def _publish(self, routing_key: str, body: bytes, props: pika.BasicProperties):
+        # Must not await between publishing and storing the message, so the delivery tags stay in sync
+        self.channel.basic_publish(exchange='', routing_key=routing_key, body=body, properties=props)
+        self.unconfirmed[self.next_tag] = (routing_key, body, props)
+        self.next_tag += 1
+
+    def _op(self) -> asyncio.Future:
+        """A future which will be failed with :class:`.PublishError` if the connection closes before it's resolved"""
+        fut = asyncio.get_running_loop().create_future()
+        self._ops.append(fut)
+        fut.add_done_callback(lambda f: f in self._ops and self._ops.remove(f))
+        return fut
+
+    async def _wait_confirms(self):
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, self.confirm_timeout)
+        except asyncio.TimeoutError:
+            raise PublishError(
+                f'Broker has not confirmed {len(self.unconfirmed)} messages after {self.confirm_timeout} seconds'
+            )
+        finally:
+            if fut in self._waiters:
+                self._waiters.remove(fut)
+
+    def _notify(self):
+        waiters, self._waiters = self._waiters, []
+        for w in waiters:
+            if not w.done():
+                w.set_result(None)
+
+    async def _declare(self, queue: str):
+        # Celery declares its queues as durable - ours must match, or the broker will close the channel
+        if queue in self.declared:
+            return
+        fut = self._op()
+        self.channel.queue_declare(queue, durable=True, callback=lambda _frame: fut.done() or fut.set_result(True))
+        await fut
+        self.declared.add(queue)
+
+    async def _ensure_channel(self):
+        if self.channel is not None and self.channel.is_open:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.channel is None or not self.channel.is_open:
+                await self._connect()
+
+    async def _connect(self):
+        opened = self._op()
+
+        def on_open(conn):
+            conn.channel(on_open_callback=on_channel)
+
+        def on_channel(ch):
+            ch.add_on_close_callback(self._on_channel_closed)
+            ch.confirm_delivery(self._on_confirm, callback=lambda _frame: opened.done() or opened.set_result(ch))
+
+        def on_open_error(conn, exc):
+            if not opened.done():
+                opened.set_exception(PublishError(f'Could not connect to the Celery broker: {exc!r}'))
+
+        if self.connection is not None:
+            log.warning('Task publisher lost its connection to the broker. Reconnecting...')
+        self._closing = False
+        self.connection = AsyncioConnection(
+            connection_params(), on_open_callback=on_open, on_open_error_callback=on_open_error,
+            on_close_callback=self._on_connection_closed, custom_ioloop=asyncio.get_running_loop(),
+        )
+        self.channel = await opened
+        self.next_tag, self.declared = 1, set()
+
+        # Anything published on the old channel which was never confirmed has to be published again
+        pending, self.unconfirmed = list(self.unconfirmed.values()), {}
+        for routing_key, body, props in pending:
+            await self._declare(routing_key)
+            self._publish(routing_key, body, props)
+        if len(pending) > 0:
+            log.warning('Re-published %d unconfirmed tasks after reconnecting to the broker.', len(pending))
+        self.republished += len(pending)
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        tag = method.delivery_tag
+        tags = list(itertools.takewhile(lambda t: t <= tag, self.unconfirmed)) if method.multiple else [tag]
+        acked = isinstance(method, Basic.Ack)
+        for t in tags:
+            msg = self.unconfirmed.pop(t, None)
+            if msg is None:
+                continue
+            if acked:
+                self.confirmed += 1
+            else:
+                # The broker couldn't take responsibility for the message - send it again
+                log.warning('Broker rejected task message %d on queue "%s", re-publishing it.', t, msg[0])
+                self._publish(*msg)
+                self.republished += 1
+        self._notify()
+
+    def _on_channel_closed(self, channel, reason):
+        self.channel = None
+        if not self._closing:
+            log.warning('Task publisher channel closed: %r', reason)
+            if self.connection is not None and self.connection.is_open:
+                self.connection.close()
+        self._fail_ops(reason)
+
+    def _on_connection_closed(self, connection, reason):
+        self.channel = None
+        if not self._closing:
+            log.warning('Task publisher connection closed: %r', reason)
+        self._fail_ops(reason)
+
+    def _fail_ops(self, reason):
+        ops, self._ops = self._ops, []
+        for op in ops:
+            if op.done():
+                continue
+            if self._closing:
+                op.set_result(None)
+            else:
+                op.set_exception(PublishError(f'Broker connection closed: {reason!r}'))
+        self._notify()
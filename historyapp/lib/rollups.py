@@ -0,0 +1,215 @@
+"""
+Functions for maintaining the token transfer rollup tables :class:`.TransferRollup` (transfers of each token per
+hour / day) and :class:`.AccountTransferRollup` (tokens sent / received by each account per day).
+
+Rollups are applied as deltas. Busy tokens' rows are shared by nearly every block, so rather than updating them in
+the transaction which imports a block (which would make concurrent imports wait for each other's row locks until
+they commit), the importer calls :func:`.add_blocks` to queue the block as a :class:`.PendingUpdate`, and
+:func:`.apply_pending` adds the transfers of a whole batch of committed blocks at once (see
+:mod:`historyapp.lib.pending`). Anything which deletes blocks calls :func:`.remove_blocks` inside of the transaction
+which deletes them, which subtracts the blocks which were applied, and un-queues the rest. So once the queue is
+applied, the totals always match the committed contents of the action table, no matter how often blocks are
+re-imported or rolled back.
+
+Both are aggregated from the action table with a single ``INSERT ... SELECT ... ON CONFLICT DO UPDATE``, with the
+rows sorted by their unique key, so concurrent batches always lock rollup rows in the same order.
+
+Blocks moved into the archive (see :mod:`historyapp.lib.archive`) keep their rollups, and :func:`.rebuild_rollups`
+reads their transfers back from the archive files.
+
+    >>> add_blocks(12345)                    # Queue the transfers in block 12345 to be added to the rollups
+    >>> apply_pending(1000)                  # Add the transfers of up to 1000 queued blocks
+    1
+    >>> remove_blocks(12340, 12345)          # Subtract the transfers in blocks 12340 to 12345 before deleting them
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+from typing import List
+
+from django.db import connection, transaction
+from django.db.models import Min, Max
+
+from historyapp.lib import archive, pending
+from historyapp.lib.packing import name_to_bigint
+from historyapp.models import EOSBlock, EOSAction, TransferRollup, AccountTransferRollup, ArchiveSegment, PendingUpdate
+import logging
+
+log = logging.getLogger(__name__)
+
+_action_table = EOSAction._meta.db_table
+_token_table = TransferRollup._meta.db_table
+_account_table = AccountTransferRollup._meta.db_table
+
+TRANSFER_COLUMNS = ('account', 'tx_symbol', 'tx_from', 'tx_to', 'tx_amount', 'timestamp')
+"""The action columns which the rollups are aggregated from"""
+
+# Transfers within a block range of the action table, from the blocks which match ``{{where}}``
+_db_source = f"""
+(
+    SELECT {', '.join(TRANSFER_COLUMNS)} FROM {_action_table}
+    WHERE block_number >= %(start)s AND block_number <= %(end)s AND {{where}} AND name = 'transfer'
+      AND tx_amount IS NOT NULL AND tx_symbol IS NOT NULL AND timestamp IS NOT NULL
+) AS t
+"""
+
+# Transfers passed in as one array per column (read from an archive file)
+_array_source = f"""
+unnest(
+    %(account)s::bigint[], %(tx_symbol)s::text[], %(tx_from)s::bigint[], %(tx_to)s::bigint[],
+    %(tx_amount)s::numeric[], %(timestamp)s::timestamptz[]
+) AS t ({', '.join(TRANSFER_COLUMNS)})
+"""
+
+query_token_rollups = f"""
+INSERT INTO {_token_table} AS r (contract, symbol, period, bucket, transfers, volume)
+SELECT account, tx_symbol, p.period, date_trunc(p.period, timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+       %(sign)s * count(*), %(sign)s * sum(tx_amount)
+FROM {{source}}, (VALUES ('hour'), ('day')) AS p (period)
+GROUP BY 1, 2, 3, 4
+ORDER BY 1, 2, 3, 4
+ON CONFLICT (contract, symbol, period, bucket) DO UPDATE
+    SET transfers = r.transfers + excluded.transfers, volume = r.volume + excluded.volume
+RETURNING id, transfers;
+"""
+
+query_account_rollups = f"""
+INSERT INTO {_account_table} AS r (
+    account, contract, symbol, bucket, sent_count, sent_volume, received_count, received_volume
+)
+SELECT holder, account, tx_symbol, date_trunc('day', timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+       %(sign)s * sum(sent), %(sign)s * sum(sent * tx_amount),
+       %(sign)s * sum(received), %(sign)s * sum(received * tx_amount)
+FROM {{source}}, LATERAL (VALUES (tx_from, 1, 0), (tx_to, 0, 1)) AS s (holder, sent, received)
+WHERE holder IS NOT NULL
+GROUP BY 1, 2, 3, 4
+ORDER BY 1, 2, 3, 4
+ON CONFLICT (account, contract, symbol, bucket) DO UPDATE
+    SET sent_count = r.sent_count + excluded.sent_count, sent_volume = r.sent_volume + excluded.sent_volume,
+        received_count = r.received_count + excluded.received_count,
+        received_volume = r.received_volume + excluded.received_volume
+RETURNING id, sent_count + received_count;
+"""
+
+
+def _apply(source: str, params: dict, sign: int):
+    """Add (``sign=1``) or subtract (``sign=-1``) the transfers from ``source``, deleting rollups which reach zero"""
+    params = dict(params, sign=int(sign))
+    with connection.cursor() as cursor:
+        for table, query in ((_token_table, query_token_rollups), (_account_table, query_account_rollups)):
+            cursor.execute(query.format(source=source), params)
+            empty = [row_id for row_id, count in cursor.fetchall() if count <= 0]
+            if len(empty) > 0:
+                cursor.execute(f'DELETE FROM {table} WHERE id = ANY(%s);', [empty])
+
+
+def _apply_blocks(blocks: List[int]):
+    """Add the transfers within each of the blocks ``blocks`` to the rollups"""
+    if len(blocks) > 0:
+        params = dict(start=min(blocks), end=max(blocks), blocks=blocks)
+        _apply(_db_source.format(where='block_number = ANY(%(blocks)s::bigint[])'), params, 1)
+
+
+def add_blocks(start_block: int, end_block: int = None):
+    """
+    Queue the transfers within the blocks ``start_block`` to ``end_block`` (inclusive) to be added to the rollups by
+    :func:`.apply_pending`. Must be called in the same transaction which imports the block(s).
+    """
+    start_block = int(start_block)
+    end_block = start_block if end_block is None else int(end_block)
+    PendingUpdate.objects.bulk_create([
+        PendingUpdate(kind=pending.KIND_ROLLUPS, range_start=b, range_end=b) for b in range(start_block, end_block + 1)
+    ])
+
+
+def apply_pending(limit: int = 1000) -> int:
+    """
+    Add the transfers of up to ``limit`` blocks queued by :func:`.add_blocks` to the rollups, in one transaction.
+    Returns the number of blocks which were applied.
+    """
+    with transaction.atomic():
+        blocks = [start for start, _ in pending.take(pending.KIND_ROLLUPS, limit)]
+        _apply_blocks(blocks)
+    return len(blocks)
+
+
+def apply_pending_range(start_block: int, end_block: int):
+    """
+    Add the transfers of the queued blocks within ``start_block`` to ``end_block`` (inclusive) straight away - e.g.
+    before the blocks' actions are moved into the archive. Must be called in the same transaction which moves them.
+    """
+    _apply_blocks([start for start, _ in pending.discard(pending.KIND_ROLLUPS, start_block, end_block)])
+
+
+def remove_blocks(start_block: int, end_block: int = None):
+    """
+    Subtract the transfers within the blocks ``start_block`` to ``end_block`` (inclusive) from the rollups, and
+    un-queue any of the blocks which haven't been added yet. Must be called in the same transaction which deletes the
+    block(s), before they're deleted.
+    """
+    start_block = int(start_block)
+    end_block = start_block if end_block is None else int(end_block)
+    queued = [start for start, _ in pending.discard(pending.KIND_ROLLUPS, start_block, end_block)]
+    params = dict(start=start_block, end=end_block, queued=queued)
+    _apply(_db_source.format(where='block_number <> ALL(%(queued)s::bigint[])'), params, -1)
+
+
+def add_archived(segment: ArchiveSegment):
+    """Add the transfers stored in the archive file of ``segment`` to the rollups"""
+    f = archive.ArchiveFile(segment)
+    for g in f.groups(EOSAction):
+        names, amounts, symbols = (f.raw_column(EOSAction, g, c) for c in ('name', 'tx_amount', 'tx_symbol'))
+        rows = [i for i, n in enumerate(names) if n == 'transfer' and amounts[i] is not None and symbols[i] is not None]
+        if len(rows) == 0:
+            continue
+        params = {}
+        for col in TRANSFER_COLUMNS:
+            values = f.column(EOSAction, g, col)
+            params[col] = [values[i] for i in rows]
+        for col in ('account', 'tx_from', 'tx_to'):
+            params[col] = [None if v is None else name_to_bigint(v) for v in params[col]]
+        _apply(_array_source, params, 1)
+
+
+def rebuild_rollups(chunk_blocks: int = 10000) -> int:
+    """
+    Re-calculate both rollup tables from scratch - from the archive files, and every block in the database, in
+    chunks of ``chunk_blocks``. Returns the number of rollup rows.
+
+    Runs in a single transaction, so the API keeps serving the old totals until it's done. The importer may keep
+    running - it waits for the rebuild to commit before queueing the blocks it imports.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # EXCLUSIVE mode still allows reads, but makes the importer (and anything applying queued blocks) wait
+            # until the rebuild is committed. Every block which is already queued is included in the rebuild.
+            cursor.execute(
+                f'LOCK TABLE {_token_table}, {_account_table}, {PendingUpdate._meta.db_table} IN EXCLUSIVE MODE;'
+            )
+            cursor.execute(f'DELETE FROM {_token_table};')
+            cursor.execute(f'DELETE FROM {_account_table};')
+            pending.discard(pending.KIND_ROLLUPS, 0, 2 ** 62)
+        for seg in ArchiveSegment.objects.defer('txid_filter').order_by('start_block'):
+            log.info('Adding transfers from archived blocks %d to %d...', seg.start_block, seg.end_block)
+            add_archived(seg)
+
+        r = EOSBlock.objects.aggregate(lowest=Min('number'), highest=Max('number'))
+        if r['lowest'] is not None:
+            for s in range(r['lowest'], r['highest'] + 1, chunk_blocks):
+                e = min(s + chunk_blocks - 1, r['highest'])
+                log.info('Adding transfers from blocks %d to %d...', s, e)
+                _apply(_db_source.format(where='true'), dict(start=s, end=e), 1)
+        return TransferRollup.objects.count() + AccountTransferRollup.objects.count()
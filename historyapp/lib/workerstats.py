@@ -0,0 +1,129 @@
+"""
+In-memory import counters for Celery worker processes, used when ``IMPORT_LEAN_TASKS`` is enabled.
+
+Rather than firing a callback task for every imported block, and updating the queue's :class:`.SyncCheckpoint`
+inside every block's import transaction, each worker process adds its results to :data:`.buffer`, which is
+periodically flushed to :class:`.WorkerStats` and :class:`.SyncCheckpoint` in a handful of queries.
+
+Individual failures are written straight to :class:`.FailedBlock` by :func:`.failures.record_failed_block`, as
+they need to be durable.
+
+The database connection / query counters from :data:`.dbconn.stats` are flushed along with the import counters.
+
+**Copyright**::
+
+    +===================================================+
+    |                 © 2019 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        Privex EOS History API                     |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |                                                   |
+    +===================================================+
+
+"""
+import os
+import socket
+import time
+from threading import Lock
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Greatest, Coalesce
+from django.utils import timezone
+
+from historyapp.lib import checkpoint, dbconn
+from historyapp.models import WorkerStats
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def worker_name() -> str:
+    """Returns a name identifying this worker process, e.g. ``worker1.example.com:1234``"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class StatsBuffer:
+    """
+    Accumulates per-queue import counters in memory, flushing them to the database every ``IMPORT_STATS_FLUSH_SECS``
+    seconds or ``IMPORT_STATS_FLUSH_BLOCKS`` blocks (whichever comes first), when :meth:`.maybe_flush` is called.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.queues = {}
+        self.last_flush = time.monotonic()
+        self.pending = 0
+
+    def _queue(self, queue: str) -> dict:
+        if queue not in self.queues:
+            self.queues[queue] = dict(committed=0, failed=0, txs=0, block=None, rpc_ms=0.0, rpc_n=0, db_ms=0.0, db_n=0)
+        return self.queues[queue]
+
+    def add_commit(self, queue: str, block: int, txs: int = 0, rpc_ms: float = None, db_ms: float = None):
+        """Count a successfully imported (committed) block"""
+        with self.lock:
+            q = self._queue(queue)
+            q['committed'] += 1
+            q['txs'] += txs
+            q['block'] = block if q['block'] is None else max(q['block'], block)
+            if rpc_ms is not None: q['rpc_ms'], q['rpc_n'] = q['rpc_ms'] + rpc_ms, q['rpc_n'] + 1
+            if db_ms is not None: q['db_ms'], q['db_n'] = q['db_ms'] + db_ms, q['db_n'] + 1
+            self.pending += 1
+
+    def add_failure(self, queue: str):
+        """Count a failed block import attempt"""
+        with self.lock:
+            self._queue(queue)['failed'] += 1
+            self.pending += 1
+
+    def maybe_flush(self):
+        """Flush the counters if the flush interval has passed, or enough blocks are waiting to be flushed"""
+        if self.pending >= settings.IMPORT_STATS_FLUSH_BLOCKS or \
+                (time.monotonic() - self.last_flush) >= settings.IMPORT_STATS_FLUSH_SECS:
+            self.flush()
+
+    def flush(self):
+        """Write all counters to :class:`.SyncCheckpoint` / :class:`.WorkerStats` and reset them"""
+        with self.lock:
+            queues, self.queues, self.pending = self.queues, {}, 0
+            self.last_flush = time.monotonic()
+        db_connects, db_queries, db_query_ms = dbconn.stats.take()
+        if len(queues) == 0 and db_queries == 0 and db_connects == 0:
+            return
+        imported, failed, txs, last_block = 0, 0, 0, None
+        for queue, q in queues.items():
+            checkpoint.record_commits(
+                queue, q['committed'], q['block'], failed=q['failed'],
+                rpc_ms=q['rpc_ms'] / q['rpc_n'] if q['rpc_n'] > 0 else None,
+                db_ms=q['db_ms'] / q['db_n'] if q['db_n'] > 0 else None,
+            )
+            imported, failed, txs = imported + q['committed'], failed + q['failed'], txs + q['txs']
+            if q['block'] is not None:
+                last_block = q['block'] if last_block is None else max(last_block, q['block'])
+
+        updates = dict(
+            blocks_imported=F('blocks_imported') + imported, blocks_failed=F('blocks_failed') + failed,
+            txs_imported=F('txs_imported') + txs, flushes=F('flushes') + 1, updated_at=timezone.now(),
+            db_connects=F('db_connects') + db_connects, db_queries=F('db_queries') + db_queries,
+            db_query_ms=F('db_query_ms') + db_query_ms,
+        )
+        if last_block is not None:
+            updates['last_block'] = Greatest(Coalesce(F('last_block'), last_block), last_block)
+        name = worker_name()
+        if WorkerStats.objects.filter(worker=name).update(**updates) == 0:
+            WorkerStats.objects.create(
+                worker=name, blocks_imported=imported, blocks_failed=failed, txs_imported=txs, last_block=last_block,
+                flushes=1, db_connects=db_connects, db_queries=db_queries, db_query_ms=db_query_ms,
+            )
+        log.debug('Flushed import stats: %d imported, %d failed, %d transactions, %d queries (%.1f ms)',
+                  imported, failed, txs, db_queries, db_query_ms)
+
+
+buffer = StatsBuffer()
+"""The import counters for this worker process"""
+
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from historyapp.tasks import apply_pending_updates
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Apply every queued block to the derived tables which are updated in batches (e.g. the transfer rollups). ' \
+           'The Celery workers do this automatically - this is for blocks imported while no worker is running.'
+
+    def __init__(self):
+        super(Command, self).__init__()
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            '-l', '--limit', type=int, default=settings.PENDING_APPLY_LIMIT, dest='limit',
+            help=f'Apply this many queued blocks per transaction (default: {settings.PENDING_APPLY_LIMIT})',
+        )
+
+    def handle(self, *args, **options):
+        log.info(' >>> Applying queued updates...')
+        total = 0
+        while True:
+            applied = apply_pending_updates(options['limit'])
+            if applied == 0:
+                break
+            total += applied
+            log.info(' >>> Applied %d queued updates so far...', total)
+        log.info(' [+++] Finished applying %d queued updates.', total)
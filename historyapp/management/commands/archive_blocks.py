@@ -0,0 +1,82 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from historyapp.lib import archive, partitions
+from historyapp.lib.coverage import highest_block
+from historyapp.models import ArchiveSegment, EOSBlock
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Move old blocks (with their transactions and actions) out of the database, into compressed columnar ' \
+           'archive files in ARCHIVE_DIR, which the API can still search'
+
+    def __init__(self):
+        super(Command, self).__init__()
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            '-k', '--keep', type=int, default=None, dest='keep',
+            help=f'Archive every block older than this many blocks behind the highest imported block '
+                 f'(default: EOS_START_BLOCK = {settings.EOS_START_BLOCK})',
+        )
+        parser.add_argument(
+            '-b', '--before', type=int, default=None, dest='before',
+            help='Archive every block lower than this block number (instead of --keep)',
+        )
+        parser.add_argument(
+            '-s', '--start', type=int, default=None, dest='start',
+            help='Only archive blocks from this block number onwards (default: the lowest block in the database)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', default=False, dest='dry_run',
+            help='Only show which block ranges would be archived',
+        )
+        parser.add_argument(
+            '-l', '--list', action='store_true', default=False, dest='list',
+            help='List the block ranges which have been archived',
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for seg in ArchiveSegment.objects.defer('txid_filter').order_by('start_block'):
+                print(f'{seg.start_block:>12} - {seg.end_block:>12}   {seg.total_blocks:>8} blocks   '
+                      f'{seg.total_transactions:>10} txs   {seg.total_actions:>10} actions   '
+                      f'{seg.size_bytes / 1024 / 1024:>9.1f} MB   {seg.path}')
+            return
+
+        before = options['before']
+        if before is None:
+            head = highest_block()
+            if head is None:
+                log.error(' !!! There are no blocks in the database.')
+                return sys.exit(1)
+            before = head - (settings.EOS_START_BLOCK if options['keep'] is None else options['keep'])
+
+        if options['dry_run']:
+            start = options['start']
+            if start is None:
+                start = EOSBlock.objects.order_by('number').values_list('number', flat=True).first()
+            for s, e in ([] if start is None else archive.archive_ranges(start, before - 1)):
+                print(f'Would archive blocks {s} to {e}')
+            return
+
+        indexed = archive.index_segments()
+        if indexed > 0:
+            log.info(' [+++] Built the TXID / action ID index of %d older archive files.', indexed)
+
+        log.info(' >>> Archiving blocks lower than %d into %s', before, settings.ARCHIVE_DIR)
+        segments = archive.archive_blocks(before, start_block=options['start'])
+        log.info(' [+++] Archived %d block ranges.', len(segments))
+
+        # The archived rows were deleted, leaving their partitions empty - drop them (unless a --start was given, as
+        # partitions below it may still hold blocks which weren't archived)
+        if len(segments) > 0 and options['start'] is None and \
+                all(partitions.is_partitioned(t) for t in partitions.PARTITIONED_TABLES):
+            dropped = partitions.drop_partitions(max(s.end_block for s in segments) + 1, keep_blocks=True)
+            log.info(' [+++] Dropped %d empty partitions.', dropped)
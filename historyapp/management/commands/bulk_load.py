@@ -0,0 +1,81 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from historyapp.lib import bulkload
+from historyapp.models import DeferredIndex
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Drop the secondary indexes of the history tables before a large backfill (--begin), and rebuild them ' \
+           'in parallel afterwards (--finish)'
+
+    def __init__(self):
+        super(Command, self).__init__()
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            '--begin', action='store_true', default=False, dest='begin',
+            help='Record and drop the secondary indexes, then run your backfill (sync_blocks / import_blocks)',
+        )
+        parser.add_argument(
+            '--finish', action='store_true', default=False, dest='finish',
+            help='Rebuild every dropped index (stop the importer first, or use --concurrently). Safe to re-run '
+                 'if interrupted.',
+        )
+        parser.add_argument(
+            '-c', '--concurrently', action='store_true', default=False, dest='concurrently',
+            help='With --finish: rebuild with CREATE INDEX CONCURRENTLY, so the importer can keep writing. Slower, '
+                 'and only one index per table is built at a time.',
+        )
+        parser.add_argument(
+            '--status', action='store_true', default=False, dest='status',
+            help='List the indexes which are currently dropped / being rebuilt',
+        )
+        parser.add_argument(
+            '-w', '--workers', type=int, default=4, dest='workers',
+            help='With --finish: how many indexes to build at once (default: 4)',
+        )
+        parser.add_argument(
+            '-m', '--maintenance-mem', type=str, default=None, dest='maintenance_mem',
+            help="With --finish: maintenance_work_mem for each index build, e.g. '1GB' (default: server setting)",
+        )
+        parser.add_argument(
+            '--progress-secs', type=float, default=30, dest='progress_secs',
+            help='With --finish: how often to log the progress of the index builds (default: 30 seconds)',
+        )
+
+    def handle(self, *args, **options):
+        if not (options['begin'] or options['finish'] or options['status']):
+            print(' !!! ERROR: Specify one of --begin, --finish or --status')
+            return sys.exit(1)
+
+        if options['begin']:
+            dropped = bulkload.drop_indexes()
+            total = DeferredIndex.objects.count()
+            log.info(' [+++] Dropped %d secondary indexes (%d indexes are waiting to be rebuilt).', len(dropped), total)
+            log.info(' [+++] Run your backfill now, then run: ./manage.py bulk_load --finish')
+
+        if options['finish']:
+            built, failed = bulkload.rebuild_indexes(
+                workers=options['workers'], maintenance_mem=options['maintenance_mem'],
+                progress_secs=options['progress_secs'], concurrently=options['concurrently']
+            )
+            if failed > 0:
+                log.error(' !!! Rebuilt %d indexes, but %d failed. Fix the errors shown above (or with --status) '
+                          'and re-run --finish.', built, failed)
+                return sys.exit(1)
+            log.info(' [+++] Rebuilt %d indexes. Bulk load mode is finished.', built)
+
+        if options['status']:
+            pending = DeferredIndex.objects.order_by('table', 'name')
+            if len(pending) == 0:
+                print('No indexes are dropped - bulk load mode is not active.')
+            for di in pending:
+                print(f'{di.table:<30} {di.name:<50} {di.status:<10} dropped: {di.dropped_at:%Y-%m-%d %H:%M}')
+                if di.error:
+                    print(f'    error: {di.error}')
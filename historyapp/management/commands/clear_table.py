@@ -4,7 +4,17 @@ from django.core.management import BaseCommand, CommandParser
 from lockmgr import lockmgr
 from lockmgr.lockmgr import LockMgr
 
-from historyapp.models import EOSTransaction, EOSBlock, EOSAction
+from historyapp.lib import pending
+from historyapp.models import EOSTransaction, EOSBlock, EOSAction, EOSBlockRange, TransferRollup, \
+    AccountTransferRollup, ProducerRound, ProducerSchedule, AccountBalance, PendingUpdate
+
+
+def clear_rollups():
+    # The transfer rollups / balances are totals of the actions in the database - once they're gone, so are they
+    TransferRollup.objects.all().delete()
+    AccountTransferRollup.objects.all().delete()
+    PendingUpdate.objects.filter(kind=pending.KIND_ROLLUPS).delete()
+    AccountBalance.objects.all().delete()
 
 
 class Command(BaseCommand):
@@ -27,14 +37,22 @@ class Command(BaseCommand):
         if t == 'transactions':
             print('Please wait... deleting all EOS transactions + related actions...')
             EOSTransaction.objects.all().delete()
+            clear_rollups()
             return print('Deleted all EOS transactions + related actions.')
         if t == 'blocks':
             print('Please wait... deleting all EOS blocks + related transactions + related actions...')
             EOSBlock.objects.all().delete()
+            EOSBlockRange.objects.all().delete()
+            clear_rollups()
+            # The producer statistics are only counted from blocks, transactions / actions don't affect them
+            ProducerRound.objects.all().delete()
+            ProducerSchedule.objects.all().delete()
+            PendingUpdate.objects.filter(kind=pending.KIND_PRODUCERS).delete()
             return print('Deleted all EOS blocks + related transactions + related actions.')
         if t == 'actions':
             print('Please wait... deleting all EOS actions...')
             EOSAction.objects.all().delete()
+            clear_rollups()
             return print('Deleted all EOS actions.')
         
         print(f'Unknown table "{t}". Options: blocks, transactions, actions')
@@ -0,0 +1,74 @@
+from django import db
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models import Max, Min, Prefetch
+
+from historyapp.lib.loader import compact_packed_trx
+from historyapp.models import EOSTransaction, EOSAction
+
+import logging
+
+log = logging.getLogger(__name__)
+
+# Only rows whose hex_data is valid hex can be stored as binary
+compact_actions_sql = f"""
+UPDATE {EOSAction._meta.db_table} SET raw_data = decode(hex_data, 'hex'), hex_data = NULL
+WHERE block_number >= %s AND block_number <= %s AND hex_data IS NOT NULL AND hex_data ~ '^([0-9a-fA-F]{{2}})*$';
+"""
+
+
+class Command(BaseCommand):
+    help = 'Convert already imported transactions / actions to the compact storage profile (STORAGE_PROFILE=compact)'
+
+    def __init__(self):
+        super(Command, self).__init__()
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            '--start', type=int, default=None, help='Convert blocks starting from this number (default: lowest block)',
+        )
+        parser.add_argument(
+            '--end', type=int, default=None, help='Convert blocks up to this number (default: highest block)',
+        )
+        parser.add_argument(
+            '--batch', type=int, default=1000, help='Convert this many blocks per transaction (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        bounds = EOSTransaction.objects.aggregate(lo=Min('block_id'), hi=Max('block_id'))
+        if bounds['lo'] is None:
+            log.info(' >>> There are no transactions to convert.')
+            return
+        start = bounds['lo'] if options['start'] is None else options['start']
+        end = bounds['hi'] if options['end'] is None else options['end']
+        batch = max(1, options['batch'])
+
+        log.info(' >>> Converting transactions / actions in blocks %d to %d to compact storage', start, end)
+        total_txs, total_acts = 0, 0
+        for lo in range(start, end + 1, batch):
+            hi = min(lo + batch - 1, end)
+            with transaction.atomic():
+                txs = self.compact_transactions(lo, hi)
+                with db.connection.cursor() as cursor:
+                    cursor.execute(compact_actions_sql, [lo, hi])
+                    acts = cursor.rowcount
+            total_txs, total_acts = total_txs + txs, total_acts + acts
+            log.info(' -> Blocks %d to %d: compacted %d transactions and %d actions', lo, hi, txs, acts)
+            db.reset_queries()
+        log.info(' [+++] Finished. Compacted %d transactions and %d actions.', total_txs, total_acts)
+        log.info(' [+++] Run VACUUM (or VACUUM FULL, which locks the tables) to reclaim the freed space.')
+
+    @staticmethod
+    def compact_transactions(start: int, end: int) -> int:
+        txs = EOSTransaction.objects.filter(block_id__gte=start, block_id__lte=end, packed_trx__isnull=False) \
+            .prefetch_related(Prefetch('actions', queryset=EOSAction.objects.order_by('action_index')))
+        changed = []
+        for tx in txs:
+            trx = dict(tx.metadata or {}, actions=[
+                dict(account=a.account, name=a.name, authorization=a.authorization, hex_data=a.get_hex_data(),
+                     data=a.data) for a in tx.actions.all()
+            ])
+            tx.packed_trx, tx.packed_trx_bin = compact_packed_trx(trx, tx.packed_trx, tx.compression)
+            changed.append(tx)
+        EOSTransaction.objects.bulk_update(changed, ['packed_trx', 'packed_trx_bin'], batch_size=500)
+        return len(changed)
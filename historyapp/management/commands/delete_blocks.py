@@ -4,6 +4,8 @@ from django import db
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from historyapp.lib import rollups, producers, balances
+from historyapp.lib.coverage import uncover_blocks
 from historyapp.models import EOSBlock
 
 import logging
@@ -43,7 +45,14 @@ class Command(BaseCommand):
             log.info(" >>> Deleting blocks: %s", options['blocks'])
             with transaction.atomic():
                 blocks = EOSBlock.objects.filter(number__in=options['blocks'])
+                for b in set(options['blocks']):
+                    balances.remove_blocks(b)
+                producers.remove_block_list(options['blocks'])
+                for b in set(options['blocks']):
+                    rollups.remove_blocks(b)
                 res = blocks.delete()
+                for b in options['blocks']:
+                    uncover_blocks(b)
             log.info(f" [+++] Finished deleting {res[0]} blocks within: {options['blocks']}")
             log.info(" [+++] Objects deleted: %s", res[1])
             return
@@ -68,7 +77,11 @@ class Command(BaseCommand):
                     log.info(f" -> Deleting 2000 blocks - {curr_start} to {curr_end} ({end_block - curr_start} blocks left)")
                     with transaction.atomic():
                         blocks = EOSBlock.objects.filter(number__gte=curr_start, number__lte=curr_end)
+                        balances.remove_blocks(curr_start, curr_end)
+                        producers.remove_blocks(curr_start, curr_end)
+                        rollups.remove_blocks(curr_start, curr_end)
                         res = blocks.delete()
+                        uncover_blocks(curr_start, curr_end)
                         total_deleted += res[0]
                     log.info(f" [+++] {res[0]} Objects deleted: {res[1]}")
                     
@@ -88,7 +101,11 @@ class Command(BaseCommand):
     
                 with transaction.atomic():
                     blocks = EOSBlock.objects.filter(number__gte=start_block, number__lte=end_block)
+                    balances.remove_blocks(start_block, end_block)
+                    producers.remove_blocks(start_block, end_block)
+                    rollups.remove_blocks(start_block, end_block)
                     res = blocks.delete()
+                    uncover_blocks(start_block, end_block)
                     total_deleted = res[0]
                     log.info(" [+++] Objects deleted: %s", res[1])
             log.info(f" [+++] Successfully deleted {total_deleted} blocks between (and including) {start_block} and {end_block}")
@@ -1,7 +1,10 @@
 from django.core.management import BaseCommand, CommandParser
+from django.db import transaction
 
+from historyapp.lib import rollups, producers, balances
+from historyapp.lib.coverage import uncover_blocks
 from historyapp.models import EOSBlock
-from historyapp.tasks import import_block
+from historyapp.tasks import import_block, apply_pending_updates
 import logging
 
 log = logging.getLogger(__name__)
@@ -13,7 +16,12 @@ def load_block(block_num, force=False):
         print(f" >>> Block number {block_num} already exists.")
         if force:
             print(f" >>> Option --force specified. Deleting block {block_num}")
-            EOSBlock.objects.filter(number=block_num).delete()
+            with transaction.atomic():
+                balances.remove_blocks(block_num)
+                producers.remove_blocks(block_num)
+                rollups.remove_blocks(block_num)
+                EOSBlock.objects.filter(number=block_num).delete()
+                uncover_blocks(block_num)
             print(f" >>> Re-importing block {block_num}...")
             return import_block(block_num)
         return None
@@ -62,3 +70,6 @@ class Command(BaseCommand):
                     print(f' +++ Block {b} and {res.get("txs_imported")} transactions were imported successfully :)')
             except (BaseException, Exception) as e:
                 log.exception("Exception while importing block %d", b)
+        # Blocks imported outside of a worker queue their rollups like any other, so apply them straight away
+        while apply_pending_updates() > 0:
+            pass
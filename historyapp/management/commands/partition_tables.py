@@ -0,0 +1,90 @@
+import random
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from privex.helpers import run_sync
+
+from historyapp.lib import eos, partitions
+from historyapp.lib.coverage import highest_block
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Convert the transaction / action tables to block range partitioned tables, pre-create upcoming ' \
+           'partitions, or drop old partitions'
+
+    def __init__(self):
+        super(Command, self).__init__()
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            '--convert', action='store_true', default=False, dest='convert',
+            help='Convert the existing (unpartitioned) tables into partitioned tables, copying over their rows. '
+                 'Stop Celery and the API first - the tables are locked until the copy finishes.',
+        )
+        parser.add_argument(
+            '--drop-old', action='store_true', default=False, dest='drop_old',
+            help='With --convert: drop the original tables after copying, instead of keeping them as '
+                 '<table>_unpartitioned',
+        )
+        parser.add_argument(
+            '--drop-before', type=int, default=None, dest='drop_before',
+            help='Drop every partition which only contains blocks lower than this block number',
+        )
+        parser.add_argument(
+            '--keep-blocks', action='store_true', default=False, dest='keep_blocks',
+            help='With --drop-before: keep the dropped blocks in the block table (only drop transactions / actions)',
+        )
+        parser.add_argument(
+            '-a', '--ahead', type=int, default=None, dest='ahead',
+            help=f'Create this many partitions past the head block (default: {settings.PARTITION_AHEAD})',
+        )
+        parser.add_argument(
+            '-l', '--list', action='store_true', default=False, dest='list',
+            help='List the partitions of each table',
+        )
+
+    def handle(self, *args, **options):
+        if options['convert']:
+            for table in partitions.PARTITIONED_TABLES:
+                if partitions.is_partitioned(table):
+                    log.info(' >>> Table %s is already partitioned. Skipping.', table)
+                    continue
+                log.info(' >>> Converting table %s into a partitioned table...', table)
+                rows = partitions.convert_table(table, drop_old=options['drop_old'])
+                log.info(' [+++] Converted %s - copied %d rows.', table, rows)
+                log.warning(' !!! The primary / foreign keys of %s are no longer managed by Django migrations '
+                            '(see the "Partitioning" section of the README).', table)
+
+        if not all(partitions.is_partitioned(t) for t in partitions.PARTITIONED_TABLES):
+            log.error(' !!! The tables are not partitioned yet. Run this command with --convert first.')
+            return sys.exit(1)
+
+        if options['drop_before'] is not None:
+            dropped = partitions.drop_partitions(options['drop_before'], keep_blocks=options['keep_blocks'])
+            log.info(' [+++] Dropped %d partitions below block %d', dropped, options['drop_before'])
+
+        head = self.get_head_block()
+        created = partitions.ensure_partitions(head, ahead=options['ahead'])
+        log.info(' [+++] Created %d new partitions (head block: %d)', created, head)
+
+        if options['list']:
+            for table in partitions.PARTITIONED_TABLES:
+                print(f'\n=== Partitions of {table} ===')
+                for p in partitions.list_partitions(table):
+                    print(f'{p.name:<50} blocks {p.start:>12} - {p.end - 1:>12}   ~{p.rows} rows')
+
+    @staticmethod
+    def get_head_block() -> int:
+        """Returns the head block from an RPC node, falling back to the highest imported block"""
+        try:
+            info = run_sync(eos.Api(url=random.choice(settings.EOS_NODE)).get_info)
+            return int(info['head_block_num'])
+        except Exception:
+            log.exception('Failed to get the head block from the RPC node. Using the highest imported block instead.')
+            head = highest_block()
+            return 0 if head is None else head
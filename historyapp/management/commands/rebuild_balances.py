@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from historyapp.lib import balances
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Re-calculate the running balance of every account / token from the archive files and the transfer ledger'
+
+    def __init__(self):
+        super(Command, self).__init__()
+
+    def handle(self, *args, **options):
+        log.info(' >>> Rebuilding the account balances...')
+        total = balances.rebuild_balances()
+        log.info(' [+++] Finished rebuilding the account balances (%d rows).', total)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from historyapp.lib import rollups
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Re-calculate the token transfer rollups (hourly / daily transfer totals) from the archive files and ' \
+           'every block in the database'
+
+    def __init__(self):
+        super(Command, self).__init__()
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            '-c', '--chunk', type=int, default=10000, dest='chunk',
+            help='Aggregate the blocks in the database this many blocks at a time (default: 10000)',
+        )
+
+    def handle(self, *args, **options):
+        log.info(' >>> Rebuilding the token transfer rollups...')
+        total = rollups.rebuild_rollups(chunk_blocks=options['chunk'])
+        log.info(' [+++] Finished rebuilding the transfer rollups (%d rows).', total)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from historyapp.lib import producers
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Re-calculate the block producer statistics (blocks produced / missed per round) for a range of blocks ' \
+           '(default: every block in the database)'
+
+    def __init__(self):
+        super(Command, self).__init__()
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            '--start', type=int, default=None, help='Re-calculate from this block number (default: lowest block)',
+        )
+        parser.add_argument(
+            '--end', type=int, default=None, help='Re-calculate up to this block number (default: highest block)',
+        )
+        parser.add_argument(
+            '-c', '--chunk', type=int, default=50000, dest='chunk',
+            help='Re-calculate this many blocks per transaction (default: 50000)',
+        )
+
+    def handle(self, *args, **options):
+        log.info(' >>> Re-calculating the block producer statistics...')
+        total = producers.recompute_all(options['start'], options['end'], chunk_blocks=options['chunk'])
+        log.info(' [+++] Finished re-calculating the producer statistics (%d rounds).', total)
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from privex.helpers import empty
+
+from historyapp.lib import failures, lanes
+from historyapp.models import FailedBlock
+from historyapp.tasks import task_import_block
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Re-queue blocks from the failed block ledger which are due to be retried'
+
+    def __init__(self):
+        super(Command, self).__init__()
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            '-l', '--limit', type=int, default=1000, dest='limit',
+            help='Maximum amount of failed blocks to re-queue (default: 1000)',
+        )
+        parser.add_argument(
+            '-c', '--error-class', type=str, default=None, dest='error_class',
+            choices=[c for c, _ in FailedBlock.ERROR_CLASSES],
+            help='Only re-queue blocks which failed with this class of error',
+        )
+        parser.add_argument(
+            '-a', '--all', action='store_true', default=False, dest='include_future',
+            help='Re-queue failed blocks even if they are not due to be retried yet',
+        )
+        parser.add_argument(
+            '-q', '--queue', type=str, default=None, dest='queue',
+            help='Re-queue blocks onto this Celery queue, instead of the queue each block originally failed on',
+        )
+
+    def handle(self, *args, **options):
+        blocks = failures.claim_due(
+            limit=options['limit'], error_class=options['error_class'], include_future=options['include_future']
+        )
+        if len(blocks) == 0:
+            log.info(' >>> No failed blocks are due to be retried.')
+            return
+
+        log.info(' >>> Re-queueing %d failed blocks...', len(blocks))
+        for block, queue in blocks:
+            queue = options['queue'] if not empty(options['queue']) else queue
+            queue = settings.DEFAULT_CELERY_QUEUE if empty(queue) else queue
+            task_import_block(block, queue=queue, lane=lanes.LANE_GAPS)
+        log.info(' [+++] Finished re-queueing %d failed blocks.', len(blocks))
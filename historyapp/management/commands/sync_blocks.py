@@ -1,105 +1,41 @@
 import asyncio
 import getpass
 import json
-import math
 import random
 import sys
 from asyncio import CancelledError
 from datetime import timedelta
 from decimal import Decimal
-from threading import Thread
 from typing import Tuple, List
 
 from django.conf import settings
 from django.core.management import BaseCommand, CommandParser
-from django.db.models.aggregates import Max
 from django.utils import timezone
 from lockmgr.lockmgr import LockMgr, renew_lock
 from privex.helpers import dec_round, empty
 
 from eoshistory.connections import get_celery_message_count
 # from eoshistory.settings import
-from historyapp.lib import eos
-from historyapp.models import EOSBlock
-from historyapp.tasks import task_import_block
-from django.db import connection
+from historyapp.lib import eos, checkpoint, leases, lanes, partitions
+from historyapp.lib.publisher import TaskPublisher
+from historyapp.lib.concurrency import AIMDController, checkpoint_stats, save_window
+from historyapp.lib.coverage import find_gaps, compact_ranges, rebuild_ranges, missing_in_range
+from historyapp.tasks import import_block_message
 
 import logging
 
 log = logging.getLogger(__name__)
 
-MAX_QUEUE_THREADS, MAX_WAIT_THREADS = settings.MAX_QUEUE_THREADS, settings.MAX_WAIT_THREADS
-MAX_BLOCKS = settings.MAX_BLOCKS_THREAD
-
-
-query_gaps = """
-SELECT
-       gap_start, gap_end FROM (
-              SELECT number + 1 AS gap_start,
-              next_nr - 1 AS gap_end
-              FROM (
-                     SELECT number, lead(number) OVER (ORDER BY number) AS next_nr
-                     FROM historyapp_eosblock
-              ) nr
-              WHERE nr.number + 1 <> nr.next_nr
-       ) AS g
-UNION ALL (
-       SELECT
-              0 AS gap_start,
-              number AS gap_end
-       FROM
-              historyapp_eosblock
-       ORDER BY
-              number
-       ASC LIMIT 1
-)
-ORDER BY
-       gap_start DESC;
-"""
-
-
-def find_gaps(ignore_zero=True) -> List[Tuple[int, int]]:
-    """Finds gaps in the block database. If ignore_zero is True, will skip the gap between 0 and the lowest block"""
-    with connection.cursor() as cursor:
-        cursor.execute(query_gaps)
-        rows = list(cursor.fetchall())
-        if ignore_zero and len(rows) > 0 and int(rows[0][0]) == 0:
-            rows.pop(0)
-    return rows
-
-
-class BlockQueue(Thread):
-    def __init__(self, start_block: int, end_block: int, thread_num=1, queue=None):
-        super().__init__()
-        self.start_block = start_block
-        self.end_block = end_block
-        self.thread_num = thread_num
-        self.queue = queue
-    
-    def run(self) -> None:
-        i = 1
-        current_block = int(self.start_block)
-        total_blocks = self.end_block - self.start_block
-        
-        while current_block < self.end_block:
-            if i % 100 == 0 or current_block == self.end_block - 1:
-                log.info('[Thread %d] Queued %d blocks out of %d blocks to import',
-                         self.thread_num, i, total_blocks)
-            args = {"block": current_block}
-            if self.queue is not None: args['queue'] = self.queue
-            task_import_block(**args)
-            i += 1
-            current_block += 1
-
 
 class Command(BaseCommand):
     help = "Sync EOS blocks to the database"
     
-    queue_threads = []
-    wait_threads = []
     lock_sync_blocks = None
     lock_fill_gaps = None
     queue: str = None
+    controller: AIMDController = None
+    followed_block: int = None
+    publisher: TaskPublisher = None
     
     def __init__(self):
         super(Command, self).__init__()
@@ -124,6 +60,9 @@ class Command(BaseCommand):
                             help='Do not attempt to fill block gaps.')
         parser.add_argument('-k', '--gaps-only', action='store_true', dest='gaps_only', default=False,
                             help='Only fill gaps (do not sync blocks)')
+        parser.add_argument('--rebuild-ranges', action='store_true', dest='rebuild_ranges', default=False,
+                            help='Rebuild the block coverage table from scratch by scanning every block in the '
+                                 'database, before detecting gaps. Slow on large databases.')
         parser.add_argument(
             '--start-type', type=str, help="Either 'rel' (start block means relative blocks behind head),\n"
                                            "or 'exact' (start block means start from this exact block number)",
@@ -135,7 +74,12 @@ class Command(BaseCommand):
                                             "multiple instances of sync_blocks)",
             dest='queue', default=None
         )
-    
+        parser.add_argument(
+            '-s', '--sharded', action='store_true', dest='sharded', default=False,
+            help="Claim block ranges from the shared lease table instead of syncing from a single checkpoint, "
+                 "allowing multiple sync hosts to run at the same time without overlapping."
+        )
+
     def handle(self, *args, **options):
         print()
         print(
@@ -160,54 +104,52 @@ class Command(BaseCommand):
         log.info(' >>> Using Celery queue "%s"', Command.queue)
         log.info(' >>> Started SYNC_BLOCKS Django command. Booting up AsyncIO event loop. ')
 
-        asyncio.run(self.sync_blocks(**options))
+        if options.pop('sharded', False):
+            log.info(' >>> Running in sharded mode as "%s"', leases.holder_name())
+            asyncio.run(self.with_publisher(self.sync_sharded, **options))
+            return
+        asyncio.run(self.with_publisher(self.sync_blocks, **options))
 
     @classmethod
-    async def sync_between(cls, start_block, end_block, renew=None):
-        blocks_left = end_block - start_block
-        
-        current_block = int(start_block)
-        current_threads = 0
-        if blocks_left > MAX_BLOCKS:
-            max_threads = math.ceil(blocks_left / MAX_BLOCKS)
-            spin_threads = max_threads if max_threads < MAX_QUEUE_THREADS else MAX_QUEUE_THREADS
-            spin_threads = 1 if spin_threads < 1 else spin_threads
-            log.info(" >>> Launching %d import queue threads...", spin_threads)
-            
-            while current_block <= end_block:
-                while current_threads < spin_threads:
-                    if current_block > end_block:
-                        break
-                    _end = current_block + MAX_BLOCKS
-                    _end = end_block if _end > end_block else _end
-                    t = BlockQueue(current_block, _end, len(cls.queue_threads) + 1, queue=cls.queue)
-                    t.start()
-                    cls.queue_threads += [t]
-                    current_threads += 1
-                    current_block += MAX_BLOCKS
-                    try:
-                        await asyncio.sleep(1)
-                        await cls.check_celery(renew=renew)
-                    except (KeyboardInterrupt, CancelledError):
-                        await cls.clean_import_threads()
-                        return
-                    except Exception:
-                        log.exception('ERROR - Something went wrong checking Celery queue length.')
-                await cls.clean_import_threads()
-                await asyncio.sleep(1)
-                current_threads = 0
-        else:
-            t = BlockQueue(start_block, end_block, len(cls.queue_threads) + 1, queue=cls.queue)
-            t.start()
-            cls.queue_threads += [t]
+    async def with_publisher(cls, sync_func, **options):
+        """Run ``sync_func(**options)`` with :attr:`.publisher` open, closing it once every task is confirmed"""
+        cls.publisher = TaskPublisher()
+        try:
+            await sync_func(**options)
+        finally:
+            await cls.publisher.close()
 
     @classmethod
-    async def clean_import_threads(cls):
-        log.info(' >>> Waiting on queue threads to finish...')
-        while len(cls.queue_threads) > 0:
-            t = cls.queue_threads.pop()
-            t.join()
-    
+    async def sync_between(cls, start_block, end_block, renew=None, lane=None):
+        """
+        Queue an import task for each block from ``start_block`` up to (but not including) ``end_block``.
+
+        Tasks are published through :attr:`.publisher` in batches of ``SYNC_PUBLISH_BATCH``. After each batch, we
+        wait for the broker to confirm it, then pause while the Celery queue is full. When this returns, every task
+        has been confirmed by the broker.
+        """
+        current_block, end_block = int(start_block), int(end_block)
+        total_blocks = end_block - current_block
+        # Make sure the transaction / action tables (if partitioned) have somewhere to put these blocks
+        partitions.ensure_partitions(current_block, end_block)
+
+        while current_block < end_block:
+            _end = min(current_block + settings.SYNC_PUBLISH_BATCH, end_block)
+            for block in range(current_block, _end):
+                task, kwargs, options = import_block_message(block, queue=cls.queue, lane=lane)
+                await cls.publisher.publish(task, kwargs, **options)
+            await cls.publisher.flush()
+            log.info(' >>> Queued %d blocks out of %d blocks to import', _end - int(start_block), total_blocks)
+            current_block = _end
+            if current_block >= end_block:
+                break
+            try:
+                await cls.check_celery(renew=renew, lane=lane)
+            except (KeyboardInterrupt, CancelledError):
+                raise
+            except Exception:
+                log.exception('ERROR - Something went wrong checking Celery queue length.')
+
     @classmethod
     async def sync_blocks(cls, start_block=None, start_type=None, **options):
         lck = cls.lock_sync_blocks
@@ -215,27 +157,30 @@ class Command(BaseCommand):
         try:
             await cls.check_celery()
         except (KeyboardInterrupt, CancelledError):
-            await cls.clean_import_threads()
             return
         except Exception:
             log.exception('ERROR - Something went wrong checking Celery queue length.')
 
-        if not options['skip_gaps']:
-            await cls.fill_gaps()
-        
+        if options.pop('rebuild_ranges', False):
+            log.info('Rebuilding block coverage ranges from the block table. This may take a while...')
+            log.info('Found %d contiguous block ranges.', rebuild_ranges())
+
         if options['gaps_only']:
             log.info('Requested gaps_only, not skipping blocks...')
+            await cls.fill_gaps()
             return
         
         end_block = options.pop('end_block')
         relative_end = options.pop('relative_end', False)
+        follow = end_block is None
         
         if start_block is None:
             start_block = settings.EOS_START_BLOCK
-            if EOSBlock.objects.count() > 0:
-                start_block = EOSBlock.objects.aggregate(Max('number'))['number__max']
+            resume_from = checkpoint.resume_block(cls.queue)
+            if resume_from is not None:
+                start_block = resume_from
                 start_type = 'exact'
-                log.info('Found existing blocks. Starting from block %d (changed start_type to exact)', start_block)
+                log.info('Found sync checkpoint. Starting from block %d (changed start_type to exact)', start_block)
 
         if end_block is not None and relative_end:
             _end = int(end_block)
@@ -266,20 +211,41 @@ class Command(BaseCommand):
             current_block = int(start_block)
             total_blocks = end_block - start_block
 
+            # Gaps below our starting block are filled concurrently with the forward sync
+            gap_task = None
+            if not options['skip_gaps']:
+                gap_task = asyncio.ensure_future(cls.fill_gaps(below=start_block))
+
+            # If this is a long backfill, keep queueing new head blocks into the live lane while it runs, instead of
+            # leaving them until the next run
+            follow_task, cls.followed_block = None, None
+            if follow and settings.IMPORT_LANES and (end_block - start_block) > settings.SYNC_LIVE_DISTANCE:
+                follow_task = asyncio.ensure_future(cls.follow_head(end_block))
+
             log.info(
                 "Importing blocks starting from %d - to end block %d. Total blocks to load: %d",
                 start_block, end_block, total_blocks
             )
 
+            checkpoint.start_run(cls.queue, start_block, end_block)
             time_start = timezone.now()
 
+            counters = None
+            if settings.SYNC_ADAPTIVE:
+                cls.controller = AIMDController()
+                _, counters = checkpoint_stats(cls.queue)
+                save_window(cls.queue, cls.controller)
+                log.info(' >>> Adaptive concurrency enabled. Starting with an in-flight window of %d blocks',
+                         cls.controller.window)
+
             i = 0
             
             while current_block < end_block:
                 lm.renew(expires=300, add_time=False)
                 blocks_left = end_block - current_block
                 
-                if i > 0 and (i % 100 == 0 or current_block == end_block):
+                if i > 0:
+                    prog = checkpoint.progress(cls.queue)
                     log.info('End block: %d // Head block: %d', end_block, head_block)
                     log.info('Current block: %d', current_block)
                     log.info(
@@ -287,42 +253,55 @@ class Command(BaseCommand):
                          i, total_blocks
                     )
                     log.info(
-                        ' >>> %d blocks remaining. Progress: %f%%',
-                        blocks_left, dec_round(
-                            Decimal((i / total_blocks) * 100)
-                        )
+                        ' >>> %d blocks imported, %d blocks remaining. Progress: %f%%',
+                        prog['committed'], blocks_left if prog['remaining'] is None else prog['remaining'],
+                        dec_round(Decimal((prog['committed'] / total_blocks) * 100))
                     )
-                    time_taken = timezone.now() - time_start
-                    time_taken_sec = time_taken.total_seconds()
                     log.info(' >>> Started at %s', time_start)
-                    bps = Decimal(i / time_taken_sec)
-                    eta_secs = blocks_left // bps
-                    log.info(' >>> Estd. blocks per second %f', dec_round(bps))
-                    log.info(' >>> Estd. finish in %f seconds //// %f hours', eta_secs, eta_secs / 60 / 60)
-                    log.info(' >>> Estd. finish date/time: %s', timezone.now() + timedelta(seconds=int(eta_secs)))
+                    log.info(' >>> Estd. blocks per second %f', dec_round(prog['blocks_per_sec']))
+                    if prog['eta_secs'] is not None:
+                        eta_secs = prog['eta_secs']
+                        log.info(' >>> Estd. finish in %f seconds //// %f hours', eta_secs, eta_secs / 60 / 60)
+                        log.info(' >>> Estd. finish date/time: %s', prog['eta'])
 
-                _end = current_block + settings.EOS_SYNC_MAX_QUEUE
+                _end = current_block + cls.sync_window()
                 _end = end_block if _end > end_block else _end
                 blocks_queued = _end - current_block
+                lane = lanes.block_lane(current_block, head_block)
                 try:
-                    await cls.sync_between(current_block, _end, renew=lck)
-                    await cls.clean_import_threads()
+                    await cls.sync_between(current_block, _end, renew=lck, lane=lane)
+                    checkpoint.record_queued(cls.queue, _end - 1)
                     await asyncio.sleep(3)
+                    if cls.controller is not None:
+                        stats, counters = checkpoint_stats(cls.queue, last=counters)
+                        cls.controller.update(**stats)
+                        save_window(cls.queue, cls.controller)
                 except (KeyboardInterrupt, CancelledError):
-                    log.error('CTRL-C detected. Please wait while threads terminate...')
-                    await cls.clean_import_threads()
+                    log.error('CTRL-C detected. Please wait while queued tasks are confirmed...')
+                    if gap_task is not None: gap_task.cancel()
+                    if follow_task is not None: follow_task.cancel()
                     return
                 current_block += blocks_queued
                 i += blocks_queued
 
+            if follow_task is not None:
+                follow_task.cancel()
+                await asyncio.gather(follow_task, return_exceptions=True)
+                # Only mark the followed head blocks as queued now that the backfill behind them is fully queued
+                if cls.followed_block is not None:
+                    checkpoint.record_queued(cls.queue, cls.followed_block)
+
+            if gap_task is not None:
+                await gap_task
+
             if not options['skip_gaps']:
                 log.info('=============================================================================')
                 log.info('Finished syncing blocks. Waiting for Celery queue to empty completely,')
                 log.info('then filling any leftover gaps.')
                 log.info('=============================================================================')
-                await cls.check_celery(max_queue=2)
+                await cls.check_celery(max_queue=2, lane=lanes.LANE_BACKFILL)
                 await cls.fill_gaps()
-                await cls.check_celery(max_queue=2)
+                await cls.check_celery(max_queue=2, lane=lanes.LANE_GAPS)
 
             print(
                 "\n============================================================================================\n"
@@ -331,8 +310,142 @@ class Command(BaseCommand):
             )
 
     @classmethod
-    async def fill_gaps(cls):
-        gaps = find_gaps()
+    async def follow_head(cls, last_block: int):
+        """
+        Queue new blocks into the live lane as they're produced, starting after ``last_block``, until cancelled.
+        The highest block queued is stored in :attr:`.followed_block`.
+        """
+        log.info(' >>> Following the head block from %d in the live lane while backfilling.', last_block)
+        while True:
+            await asyncio.sleep(settings.SYNC_FOLLOW_INTERVAL)
+            try:
+                head_block = await cls.get_head_block()
+                if head_block <= last_block:
+                    continue
+                log.info(' >>> Queueing new head blocks %d to %d in the live lane', last_block + 1, head_block)
+                await cls.sync_between(last_block + 1, head_block + 1, lane=lanes.LANE_LIVE)
+                last_block = cls.followed_block = head_block
+            except CancelledError:
+                raise
+            except Exception:
+                log.exception('ERROR - Something went wrong while following the head block.')
+
+    @classmethod
+    async def get_head_block(cls) -> int:
+        _node = random.choice(settings.EOS_NODE)
+        log.info("Getting blockchain info from RPC node: %s", _node)
+        info = await eos.Api(url=_node).get_info()
+        return int(info['head_block_num'])
+
+    @classmethod
+    def renew_leases(cls, held: List[dict]):
+        """Renew the lease on each range in ``held``, dropping any ranges which another host has taken over"""
+        for h in list(held):
+            if not leases.renew_range(h['lease']):
+                log.warning('Lost the lease on block range %s - another host has reclaimed it.', h['lease'])
+                held.remove(h)
+
+    @classmethod
+    async def sync_sharded(cls, start_block=None, start_type=None, **options):
+        """
+        Sharded version of :meth:`.sync_blocks` - instead of syncing forward from this queue's checkpoint while
+        holding an exclusive lock, claim block ranges from :class:`.BlockRangeLease` (see :mod:`historyapp.lib.leases`)
+        and queue them, until there are no ranges left to claim.
+
+        Any number of hosts may run ``sync_blocks --sharded`` at the same time. If a host dies, its leases expire
+        after ``SYNC_LEASE_SECONDS`` and its ranges are reclaimed by the remaining hosts.
+        """
+        held: List[dict] = []
+        log.info("Main sync_sharded loop started.")
+
+        if start_block is None:
+            start_block, start_type = settings.EOS_START_BLOCK, settings.EOS_START_TYPE
+            resume_from = checkpoint.resume_block(cls.queue)
+            if resume_from is not None:
+                start_block, start_type = resume_from, 'exact'
+        start_type = settings.EOS_START_TYPE if start_type is None else start_type
+
+        if settings.SYNC_ADAPTIVE:
+            cls.controller = AIMDController()
+        checkpoint.get_checkpoint(cls.queue)
+        counters = None
+
+        try:
+            while True:
+                head_block = await cls.get_head_block()
+                _start = head_block - int(start_block) if start_type.lower() == 'relative' else int(start_block)
+                # Ranges are only created from start_block if no ranges exist yet, otherwise they continue from the last
+                leases.plan_ranges(head_block, _start)
+
+                while len(held) < settings.SYNC_LEASES_PER_HOST:
+                    lease = leases.claim_range()
+                    if lease is None:
+                        break
+                    log.info(' >>> Claimed block range %s (attempt %d). Queueing blocks...', lease, lease.attempts)
+                    held.append(dict(lease=lease, requeued=0, missing=lease.total_blocks, since=timezone.now()))
+                    await cls.sync_between(
+                        lease.start_block, lease.end_block + 1, lane=lanes.block_lane(lease.start_block, head_block)
+                    )
+                    checkpoint.record_queued(cls.queue, lease.end_block)
+                    cls.renew_leases(held)
+
+                if len(held) == 0:
+                    log.info(' >>> No block ranges left to claim. Finished sharded sync.')
+                    return
+
+                # Wait for Celery to work through the queue, renewing our leases so they aren't reclaimed
+                backfill_queue = lanes.lane_queue(cls.queue, lanes.LANE_BACKFILL)
+                while get_celery_message_count(queue=backfill_queue) >= cls.sync_window():
+                    cls.renew_leases(held)
+                    await asyncio.sleep(5)
+                await asyncio.sleep(5)
+                cls.renew_leases(held)
+
+                for h in list(held):
+                    await cls._check_lease(h, held)
+
+                if cls.controller is not None:
+                    stats, counters = checkpoint_stats(cls.queue, last=counters)
+                    cls.controller.update(**stats)
+                    save_window(cls.queue, cls.controller)
+        except (KeyboardInterrupt, CancelledError):
+            log.error('CTRL-C detected. Releasing our block ranges...')
+            for h in held:
+                leases.release_range(h['lease'], done=False)
+
+    @classmethod
+    async def _check_lease(cls, h: dict, held: List[dict]):
+        """Release a held range if it has been fully imported, or re-queue its missing blocks if it has stalled"""
+        lease = h['lease']
+        missing = missing_in_range(lease.start_block, lease.end_block)
+        total_missing = sum((end - start) + 1 for start, end in missing)
+        if total_missing == 0:
+            log.info(' >>> Block range %s has been fully imported. Marking as done.', lease)
+            leases.release_range(lease, done=True)
+            held.remove(h)
+            return
+        if total_missing < h['missing']:
+            h['missing'], h['since'] = total_missing, timezone.now()
+            return
+        # No blocks have been imported in this range since the last check - give the importer a little longer
+        if (timezone.now() - h['since']).total_seconds() < settings.SYNC_LEASE_SECONDS:
+            return
+        if h['requeued'] >= settings.SYNC_LEASE_MAX_REQUEUE:
+            log.warning('Block range %s still has %d missing blocks after re-queueing %d times. Releasing it '
+                        'back to pending.', lease, total_missing, h['requeued'])
+            leases.release_range(lease, done=False)
+            held.remove(h)
+            return
+        h['requeued'] += 1
+        h['since'] = timezone.now()
+        log.info(' >>> Re-queueing %d missing blocks in range %s (attempt %d)', total_missing, lease, h['requeued'])
+        for gap_start, gap_end in missing:
+            await cls.sync_between(gap_start, gap_end + 1, lane=lanes.LANE_GAPS)
+
+    @classmethod
+    async def fill_gaps(cls, below: int = None):
+        compact_ranges()
+        gaps = find_gaps(below=below)
         if len(gaps) == 0:
             return
         lck = cls.lock_fill_gaps
@@ -346,21 +459,27 @@ class Command(BaseCommand):
                 i += 1
                 if gap_start == gap_end:
                     log.info('[Gap %d / %d] Filling individual missing block %d', i, total_gaps, gap_start)
-                    task_import_block(gap_start, queue=cls.queue)
+                    await cls.sync_between(gap_start, gap_start + 1, lane=lanes.LANE_GAPS)
                     continue
                 gap_end = gap_end + 1
                 log.info('[Gap %d / %d] Filling gap between block %d and block %d ...',
                          i, total_gaps, gap_start, gap_end)
-                await cls.sync_between(gap_start, gap_end)
-                await cls.clean_import_threads()
-                await asyncio.sleep(1)
-                await cls.check_celery(renew=lck)
+                await cls.sync_between(gap_start, gap_end, lane=lanes.LANE_GAPS)
+                await cls.check_celery(renew=lck, lane=lanes.LANE_GAPS)
                 lm.renew(expires=300, add_time=False)
     
     @classmethod
-    async def check_celery(cls, renew=None, max_queue=settings.MAX_CELERY_QUEUE):
-        while get_celery_message_count(queue=cls.queue) >= max_queue:
-            msg_count = get_celery_message_count(queue=cls.queue)
+    def sync_window(cls) -> int:
+        """Maximum amount of blocks to queue per round - chosen by :attr:`.controller` if adaptive sync is enabled"""
+        return settings.EOS_SYNC_MAX_QUEUE if cls.controller is None else cls.controller.window
+
+    @classmethod
+    async def check_celery(cls, renew=None, max_queue=None, lane=None):
+        if max_queue is None:
+            max_queue = settings.MAX_CELERY_QUEUE if cls.controller is None else cls.controller.window
+        queue = lanes.lane_queue(cls.queue, lane)
+        while get_celery_message_count(queue=queue) >= max_queue:
+            msg_count = get_celery_message_count(queue=queue)
             log.info(' !!! > Celery currently has %d tasks in queue. Pausing until tasks fall below %d',
                      msg_count, max_queue)
             if renew is not None:
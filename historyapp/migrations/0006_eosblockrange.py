@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:55
+
+from django.db import migrations, models
+
+# Populate the block coverage table from any blocks which were imported before it existed
+populate_ranges = """
+INSERT INTO historyapp_eosblockrange (start_block, end_block, updated_at)
+SELECT min(number), max(number), now() FROM (
+    SELECT number, number - row_number() OVER (ORDER BY number) AS grp FROM historyapp_eosblock
+) AS islands
+GROUP BY grp;
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0005_auto_20200118_0837'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EOSBlockRange',
+            fields=[
+                ('start_block', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('end_block', models.BigIntegerField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Update')),
+            ],
+        ),
+        migrations.RunSQL(populate_ranges, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0006_eosblockrange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCheckpoint',
+            fields=[
+                ('queue', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('queued_block', models.BigIntegerField(blank=True, null=True)),
+                ('committed_block', models.BigIntegerField(blank=True, null=True)),
+                ('blocks_committed', models.BigIntegerField(default=0)),
+                ('start_block', models.BigIntegerField(blank=True, null=True)),
+                ('target_block', models.BigIntegerField(blank=True, null=True)),
+                ('run_started_at', models.DateTimeField(blank=True, null=True)),
+                ('run_blocks_committed', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation Time')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Update')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0007_synccheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='synccheckpoint',
+            name='avg_db_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='synccheckpoint',
+            name='avg_rpc_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='synccheckpoint',
+            name='blocks_failed',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='synccheckpoint',
+            name='window',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='synccheckpoint',
+            name='window_reason',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
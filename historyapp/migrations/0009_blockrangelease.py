@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0008_synccheckpoint_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockRangeLease',
+            fields=[
+                ('start_block', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('end_block', models.BigIntegerField(db_index=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('claimed', 'Claimed'), ('done', 'Done')], db_index=True, default='pending', max_length=20)),
+                ('holder', models.CharField(blank=True, max_length=255, null=True)),
+                ('lease_expires', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation Time')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Update')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0009_blockrangelease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailedBlock',
+            fields=[
+                ('block', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('queue', models.CharField(blank=True, max_length=255, null=True)),
+                ('error_type', models.CharField(blank=True, max_length=255, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=1)),
+                ('first_failed_at', models.DateTimeField(auto_now_add=True)),
+                ('last_failed_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WorkerStats',
+            fields=[
+                ('worker', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('blocks_imported', models.BigIntegerField(default=0)),
+                ('blocks_failed', models.BigIntegerField(default=0)),
+                ('txs_imported', models.BigIntegerField(default=0)),
+                ('last_block', models.BigIntegerField(blank=True, null=True)),
+                ('flushes', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation Time')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Update')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0010_failedblock_workerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failedblock',
+            name='error_class',
+            field=models.CharField(choices=[('node', 'RPC Node Error'), ('db', 'Database Error'), ('data', 'Bad Block Data'), ('unknown', 'Unknown Error')], db_index=True, default='unknown', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='failedblock',
+            name='next_retry_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
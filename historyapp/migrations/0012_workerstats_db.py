@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0011_failedblock_retry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workerstats',
+            name='db_connects',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workerstats',
+            name='db_queries',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workerstats',
+            name='db_query_ms',
+            field=models.FloatField(default=0),
+        ),
+    ]
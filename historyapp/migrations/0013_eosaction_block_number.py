@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:20
+
+from django.db import migrations, models
+
+# Copy the block number onto every action which was imported before the column existed
+populate_block_number = """
+UPDATE historyapp_eosaction AS a SET block_number = t.block_id
+FROM historyapp_eostransaction AS t
+WHERE a.transaction_id = t.txid AND a.block_number IS NULL;
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0012_workerstats_db'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eosaction',
+            name='block_number',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunSQL(populate_block_number, reverse_sql=migrations.RunSQL.noop),
+    ]
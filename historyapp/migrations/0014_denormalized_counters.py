@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:24
+
+from django.db import migrations, models
+
+# Fill in the new columns for everything which was imported before they existed
+populate_denormalized = """
+UPDATE historyapp_eostransaction AS t SET timestamp = b.timestamp
+FROM historyapp_eosblock AS b WHERE t.block_id = b.number AND t.timestamp IS NULL;
+
+UPDATE historyapp_eosaction AS a SET timestamp = b.timestamp
+FROM historyapp_eosblock AS b WHERE a.block_number = b.number AND a.timestamp IS NULL;
+
+UPDATE historyapp_eostransaction AS t SET total_actions = c.total
+FROM (SELECT transaction_id, count(*) AS total FROM historyapp_eosaction GROUP BY transaction_id) AS c
+WHERE t.txid = c.transaction_id;
+
+UPDATE historyapp_eosblock AS b SET total_transactions = c.total
+FROM (SELECT block_id, count(*) AS total FROM historyapp_eostransaction GROUP BY block_id) AS c
+WHERE b.number = c.block_id;
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0013_eosaction_block_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eosaction',
+            name='timestamp',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eosblock',
+            name='total_transactions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eostransaction',
+            name='timestamp',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eostransaction',
+            name='total_actions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunSQL(populate_denormalized, reverse_sql=migrations.RunSQL.noop),
+    ]
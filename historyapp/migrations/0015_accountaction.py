@@ -0,0 +1,52 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Build the account history for every action imported before the table existed
+populate_account_actions = """
+INSERT INTO historyapp_accountaction (account, block_number, action_id, roles)
+SELECT x.account, x.block_number, x.id, bit_or(x.role) FROM (
+    SELECT a.id, a.block_number, a.account, 1 AS role FROM historyapp_eosaction AS a
+    UNION ALL
+    SELECT a.id, a.block_number, auth->>'actor', 2 FROM historyapp_eosaction AS a,
+        jsonb_array_elements(CASE jsonb_typeof(a."authorization") WHEN 'array' THEN a."authorization" ELSE '[]' END)
+        AS auth
+    UNION ALL
+    SELECT a.id, a.block_number, a.data->>k.key, 4 FROM historyapp_eosaction AS a,
+        (VALUES ('from'), ('payer'), ('creator'), ('voter')) AS k(key) WHERE jsonb_typeof(a.data) = 'object'
+    UNION ALL
+    SELECT a.id, a.block_number, a.data->>k.key, 8 FROM historyapp_eosaction AS a,
+        (VALUES ('to'), ('receiver')) AS k(key) WHERE jsonb_typeof(a.data) = 'object'
+) AS x
+WHERE x.block_number IS NOT NULL AND x.account ~ '^[a-z1-5.]{1,13}$'
+GROUP BY x.account, x.block_number, x.id;
+"""
+
+# Created after the backfill, as building the index once is much faster than updating it for each row
+create_history_index = """
+CREATE UNIQUE INDEX historyapp_accountaction_history
+ON historyapp_accountaction (account, block_number DESC, action_id DESC);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0014_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountAction',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('account', models.CharField(max_length=150)),
+                ('block_number', models.BigIntegerField()),
+                ('roles', models.SmallIntegerField(default=0)),
+                ('action', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='accounts', to='historyapp.EOSAction')),
+            ],
+        ),
+        migrations.RunSQL(populate_account_actions, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(create_history_index, reverse_sql='DROP INDEX IF EXISTS historyapp_accountaction_history;'),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:29
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+# Index name -> (table, column)
+GIN_INDEXES = {
+    'eosaction_data_gin': ('historyapp_eosaction', 'data'),
+    'eostx_signatures_gin': ('historyapp_eostransaction', 'signatures'),
+    'eostx_metadata_gin': ('historyapp_eostransaction', 'metadata'),
+}
+
+
+def create_indexes(apps, schema_editor):
+    """
+    Build the GIN indexes with CREATE INDEX CONCURRENTLY, so the importer and API can keep writing to / reading from
+    the tables while they're built. PostgreSQL can't build an index concurrently on a partitioned table, so those
+    (see historyapp.lib.partitions) are indexed normally.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        for name, (table, column) in GIN_INDEXES.items():
+            # An interrupted concurrent build leaves behind an invalid index, which must be dropped before retrying
+            cursor.execute(
+                'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s;',
+                [name]
+            )
+            row = cursor.fetchone()
+            if row is not None and row[0]:
+                continue
+            if row is not None:
+                cursor.execute(f'DROP INDEX {name};')
+            cursor.execute('SELECT EXISTS(SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass);', [table])
+            concurrently = '' if cursor.fetchone()[0] else 'CONCURRENTLY'
+            cursor.execute(f'CREATE INDEX {concurrently} {name} ON {table} USING gin ("{column}" jsonb_path_ops);')
+
+
+def drop_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for name in GIN_INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS {name};')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('historyapp', '0015_accountaction'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='eosaction',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['data'], name='eosaction_data_gin', opclasses=['jsonb_path_ops']),
+                ),
+                migrations.AddIndex(
+                    model_name='eostransaction',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['signatures'], name='eostx_signatures_gin', opclasses=['jsonb_path_ops']),
+                ),
+                migrations.AddIndex(
+                    model_name='eostransaction',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['metadata'], name='eostx_metadata_gin', opclasses=['jsonb_path_ops']),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0016_json_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eosaction',
+            name='raw_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eostransaction',
+            name='packed_trx_bin',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
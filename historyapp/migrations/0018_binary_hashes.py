@@ -0,0 +1,78 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:35
+
+from django.db import migrations
+import historyapp.fields
+
+# Table -> (column, original type) for each hash column converted from hex text to binary
+HASH_COLUMNS = [
+    ('historyapp_eosblock', 'id', 'varchar(255)'),
+    ('historyapp_eostransaction', 'txid', 'varchar(100)'),
+    ('historyapp_eosaction', 'transaction_id', 'varchar(100)'),
+]
+
+find_referencing_fks = """
+SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint
+WHERE confrelid = 'historyapp_eostransaction'::regclass AND contype = 'f' AND conparentid = 0;
+"""
+
+# varchar_pattern_ops (LIKE) indexes can't be converted to bytea - they're useless for hashes anyway
+find_like_indexes = """
+SELECT i.indexrelid::regclass::text FROM pg_index i JOIN pg_class c ON c.oid = i.indrelid
+JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+WHERE c.relname = %s AND a.attname = %s AND pg_get_indexdef(i.indexrelid) LIKE '%%pattern_ops%%'
+AND NOT EXISTS(SELECT 1 FROM pg_inherits h WHERE h.inhrelid = i.indexrelid);
+"""
+
+
+def _convert(schema_editor, using):
+    """
+    Django would convert the columns with ``USING col::bytea``, which stores the hex characters as bytes - so the
+    columns are converted here instead, with ``decode(col, 'hex')`` / ``encode(col, 'hex')``.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(find_referencing_fks)
+        foreign_keys = cursor.fetchall()
+        for table, name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {name};')
+        for table, column, old_type in HASH_COLUMNS:
+            cursor.execute(find_like_indexes, [table, column])
+            for idx, in cursor.fetchall():
+                cursor.execute(f'DROP INDEX {idx};')
+            cursor.execute(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE {using(column, old_type)};')
+        for table, name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition};')
+
+
+def hex_to_binary(apps, schema_editor):
+    _convert(schema_editor, lambda col, old_type: f"bytea USING decode({col}, 'hex')")
+
+
+def binary_to_hex(apps, schema_editor):
+    _convert(schema_editor, lambda col, old_type: f"{old_type} USING encode({col}, 'hex')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0017_compact_storage'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(hex_to_binary, binary_to_hex),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='eosblock',
+                    name='id',
+                    field=historyapp.fields.HexBinaryField(blank=True, max_length=64, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='eostransaction',
+                    name='txid',
+                    field=historyapp.fields.HexBinaryField(max_length=64, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,136 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:37
+
+from django.db import migrations
+import historyapp.fields
+
+# Table, column, original type - for each EOS name column converted from text to bigint
+NAME_COLUMNS = [
+    ('historyapp_eosblock', 'producer', 'varchar(50)'),
+    ('historyapp_eosaction', 'account', 'varchar(150)'),
+    ('historyapp_eosaction', 'tx_from', 'varchar(150)'),
+    ('historyapp_eosaction', 'tx_to', 'varchar(150)'),
+    ('historyapp_accountaction', 'account', 'varchar(150)'),
+]
+
+# SQL versions of historyapp.lib.packing.name_to_bigint / bigint_to_name - also handy for querying by hand, e.g.
+#   SELECT eosio_bigint_to_name(account) FROM historyapp_eosaction WHERE tx_to = eosio_name_to_bigint('eosio');
+create_functions = r"""
+CREATE OR REPLACE FUNCTION eosio_name_to_bigint(n text) RETURNS bigint AS $$
+DECLARE
+    v bigint := 0;
+    c bigint;
+BEGIN
+    -- Only canonical names can be stored (up to 13 chars, 13th char must be .1-5a-j, no trailing dots)
+    IF n IS NULL OR n !~ '^[a-z1-5.]{0,12}[a-j1-5.]?$' OR n ~ '\.$' THEN
+        RETURN NULL;
+    END IF;
+    FOR i IN 0..12 LOOP
+        c := CASE WHEN i < length(n) THEN position(substr(n, i + 1, 1) IN '.12345abcdefghijklmnopqrstuvwxyz') - 1
+                  ELSE 0 END;
+        -- Shifting into the sign bit wraps around, giving the same signed value as packing.name_to_bigint
+        v := v | CASE WHEN i < 12 THEN c << (64 - 5 * (i + 1)) ELSE c END;
+    END LOOP;
+    RETURN v;
+END
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION eosio_bigint_to_name(v bigint) RETURNS text AS $$
+DECLARE
+    s text := '';
+    c int;
+BEGIN
+    IF v IS NULL THEN
+        RETURN NULL;
+    END IF;
+    FOR i IN 0..12 LOOP
+        c := CASE WHEN i = 0 THEN v & 15 ELSE (v >> (4 + 5 * (i - 1))) & 31 END;
+        s := substr('.12345abcdefghijklmnopqrstuvwxyz', c + 1, 1) || s;
+    END LOOP;
+    RETURN rtrim(s, '.');
+END
+$$ LANGUAGE plpgsql IMMUTABLE;
+"""
+
+drop_functions = """
+DROP FUNCTION IF EXISTS eosio_name_to_bigint(text);
+DROP FUNCTION IF EXISTS eosio_bigint_to_name(bigint);
+"""
+
+# varchar_pattern_ops (LIKE) indexes can't be converted to bigint
+find_like_indexes = """
+SELECT i.indexrelid::regclass::text FROM pg_index i JOIN pg_class c ON c.oid = i.indrelid
+JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+WHERE c.relname = %s AND a.attname = %s AND pg_get_indexdef(i.indexrelid) LIKE '%%pattern_ops%%'
+AND NOT EXISTS(SELECT 1 FROM pg_inherits h WHERE h.inhrelid = i.indexrelid);
+"""
+
+
+def _producer_index(schema_editor) -> str:
+    return schema_editor._create_index_name('historyapp_eosblock', ['producer'], suffix='')
+
+
+def names_to_bigint(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(create_functions)
+        # Only the contract / authorizers are guaranteed to be valid names - drop any history rows which aren't
+        cursor.execute('DELETE FROM historyapp_accountaction WHERE eosio_name_to_bigint(account) IS NULL;')
+        for table, column, _ in NAME_COLUMNS:
+            cursor.execute(find_like_indexes, [table, column])
+            for idx, in cursor.fetchall():
+                cursor.execute(f'DROP INDEX {idx};')
+            cursor.execute(
+                f'ALTER TABLE {table} ALTER COLUMN {column} TYPE bigint USING eosio_name_to_bigint({column});'
+            )
+        cursor.execute(f'CREATE INDEX {_producer_index(schema_editor)} ON historyapp_eosblock (producer);')
+
+
+def bigint_to_names(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP INDEX IF EXISTS {_producer_index(schema_editor)};')
+        for table, column, old_type in NAME_COLUMNS:
+            cursor.execute(
+                f'ALTER TABLE {table} ALTER COLUMN {column} TYPE {old_type} USING eosio_bigint_to_name({column});'
+            )
+        cursor.execute(drop_functions)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0018_binary_hashes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(names_to_bigint, bigint_to_names),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='accountaction',
+                    name='account',
+                    field=historyapp.fields.EOSNameField(max_length=13),
+                ),
+                migrations.AlterField(
+                    model_name='eosaction',
+                    name='account',
+                    field=historyapp.fields.EOSNameField(db_index=True, max_length=13),
+                ),
+                migrations.AlterField(
+                    model_name='eosaction',
+                    name='tx_from',
+                    field=historyapp.fields.EOSNameField(blank=True, db_index=True, max_length=13, null=True, verbose_name='TX Sender (from data)'),
+                ),
+                migrations.AlterField(
+                    model_name='eosaction',
+                    name='tx_to',
+                    field=historyapp.fields.EOSNameField(blank=True, db_index=True, max_length=13, null=True, verbose_name='TX Recipient (from data)'),
+                ),
+                migrations.AlterField(
+                    model_name='eosblock',
+                    name='producer',
+                    field=historyapp.fields.EOSNameField(blank=True, db_index=True, max_length=13, null=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0019_eos_name_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeferredIndex',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('table', models.CharField(max_length=100)),
+                ('definition', models.TextField()),
+                ('status', models.CharField(choices=[('dropped', 'Dropped'), ('building', 'Building'), ('failed', 'Failed')], default='dropped', max_length=20)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('dropped_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0020_deferredindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('start_block', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('end_block', models.BigIntegerField(db_index=True)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('path', models.CharField(max_length=255)),
+                ('total_blocks', models.BigIntegerField(default=0)),
+                ('total_transactions', models.BigIntegerField(default=0)),
+                ('total_actions', models.BigIntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation Time')),
+            ],
+        ),
+    ]
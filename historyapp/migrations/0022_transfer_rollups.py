@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:59
+
+from django.db import migrations, models
+import historyapp.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0021_archivesegment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountTransferRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('account', historyapp.fields.EOSNameField(max_length=13)),
+                ('contract', historyapp.fields.EOSNameField(max_length=13)),
+                ('symbol', models.CharField(max_length=100)),
+                ('bucket', models.DateTimeField()),
+                ('sent_count', models.BigIntegerField(default=0)),
+                ('sent_volume', models.DecimalField(decimal_places=20, default=0, max_digits=40)),
+                ('received_count', models.BigIntegerField(default=0)),
+                ('received_volume', models.DecimalField(decimal_places=20, default=0, max_digits=40)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TransferRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('contract', historyapp.fields.EOSNameField(max_length=13)),
+                ('symbol', models.CharField(max_length=100)),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket', models.DateTimeField()),
+                ('transfers', models.BigIntegerField(default=0)),
+                ('volume', models.DecimalField(decimal_places=20, default=0, max_digits=40)),
+            ],
+            options={
+                'unique_together': {('contract', 'symbol', 'period', 'bucket')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='accounttransferrollup',
+            index=models.Index(fields=['contract', 'symbol', 'bucket'], name='accttransferrollup_token'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='accounttransferrollup',
+            unique_together={('account', 'contract', 'symbol', 'bucket')},
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+import historyapp.fields
+
+# SQL version of historyapp.lib.packing.symbol_code_to_int, e.g.
+#   SELECT * FROM historyapp_eostransfer WHERE symbol = eosio_symbol_to_bigint('EOS');
+create_functions = r"""
+CREATE OR REPLACE FUNCTION eosio_symbol_to_bigint(s text) RETURNS bigint AS $$
+    SELECT sum(ascii(substr(s, i, 1))::bigint << (8 * (i - 1)))::bigint FROM generate_series(1, length(s)) AS i
+    WHERE s ~ '^[A-Z]{1,7}$';
+$$ LANGUAGE sql IMMUTABLE;
+"""
+
+drop_functions = """
+DROP FUNCTION IF EXISTS eosio_symbol_to_bigint(text);
+"""
+
+# Build the ledger from every transfer imported before the table existed - parsed the same way as
+# historyapp.lib.packing.parse_asset
+populate_transfers = r"""
+INSERT INTO historyapp_eostransfer (action_id, block_number, contract, sender, receiver, amount, precision, symbol)
+SELECT id, block_number, account, tx_from, tx_to, amount::bigint, precision, eosio_symbol_to_bigint(q[4]) FROM (
+    SELECT a.id, a.block_number, a.account, a.tx_from, a.tx_to, q,
+           (q[2] || coalesce(q[3], ''))::numeric * CASE q[1] WHEN '-' THEN -1 ELSE 1 END AS amount,
+           length(coalesce(q[3], '')) AS precision
+    FROM historyapp_eosaction AS a,
+        regexp_match(a.data->>'quantity', '^(-?)([0-9]+)(?:\.([0-9]+))? ([A-Z]{1,7})$') AS q
+    WHERE a.name = 'transfer' AND a.block_number IS NOT NULL AND jsonb_typeof(a.data) = 'object'
+) AS t
+WHERE q IS NOT NULL AND precision <= 18 AND amount BETWEEN -9223372036854775808 AND 9223372036854775807;
+"""
+
+# Created after the backfill, as building the indexes once is much faster than updating them for each row
+create_indexes = """
+CREATE INDEX historyapp_eostransfer_sender ON historyapp_eostransfer (sender, block_number DESC, action_id DESC)
+    WHERE sender IS NOT NULL;
+CREATE INDEX historyapp_eostransfer_receiver ON historyapp_eostransfer (receiver, block_number DESC, action_id DESC)
+    WHERE receiver IS NOT NULL;
+CREATE INDEX historyapp_eostransfer_token
+    ON historyapp_eostransfer (contract, symbol, block_number DESC, action_id DESC);
+CREATE INDEX historyapp_eostransfer_block ON historyapp_eostransfer (block_number);
+"""
+
+drop_indexes = """
+DROP INDEX IF EXISTS historyapp_eostransfer_sender;
+DROP INDEX IF EXISTS historyapp_eostransfer_receiver;
+DROP INDEX IF EXISTS historyapp_eostransfer_token;
+DROP INDEX IF EXISTS historyapp_eostransfer_block;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0022_transfer_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EOSTransfer',
+            fields=[
+                ('action', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='transfer', serialize=False, to='historyapp.EOSAction')),
+                ('block_number', models.BigIntegerField()),
+                ('contract', historyapp.fields.EOSNameField(max_length=13)),
+                ('sender', historyapp.fields.EOSNameField(blank=True, max_length=13, null=True)),
+                ('receiver', historyapp.fields.EOSNameField(blank=True, max_length=13, null=True)),
+                ('amount', models.BigIntegerField()),
+                ('precision', models.SmallIntegerField()),
+                ('symbol', historyapp.fields.EOSSymbolField(max_length=7)),
+            ],
+        ),
+        migrations.RunSQL(create_functions, reverse_sql=drop_functions),
+        migrations.RunSQL(populate_transfers, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(create_indexes, reverse_sql=drop_indexes),
+    ]
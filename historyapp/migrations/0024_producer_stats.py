@@ -0,0 +1,47 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:11
+
+from django.db import migrations, models
+import historyapp.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0023_eostransfer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProducerRound',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('round', models.BigIntegerField()),
+                ('producer', historyapp.fields.EOSNameField(max_length=13)),
+                ('schedule_version', models.BigIntegerField(default=0)),
+                ('blocks_produced', models.IntegerField(default=0)),
+                ('expected_slots', models.IntegerField(default=0)),
+                ('missed_slots', models.IntegerField(default=0)),
+                ('schedule_changes', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProducerSchedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+                ('position', models.SmallIntegerField()),
+                ('producer', historyapp.fields.EOSNameField(max_length=13)),
+            ],
+            options={
+                'unique_together': {('version', 'position')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='producerround',
+            index=models.Index(fields=['producer', 'round'], name='producerround_producer'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='producerround',
+            unique_together={('round', 'producer')},
+        ),
+    ]
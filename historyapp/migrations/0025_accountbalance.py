@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:15
+
+from django.db import migrations, models
+import historyapp.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0024_producer_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalance',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('account', historyapp.fields.EOSNameField(max_length=13)),
+                ('contract', historyapp.fields.EOSNameField(max_length=13)),
+                ('symbol', historyapp.fields.EOSSymbolField(max_length=7)),
+                ('precision', models.SmallIntegerField()),
+                ('block_number', models.BigIntegerField()),
+                ('action_id', models.BigIntegerField()),
+                ('delta', models.BigIntegerField()),
+                ('balance', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='accountbalance',
+            index=models.Index(fields=['block_number'], name='accountbalance_block'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='accountbalance',
+            unique_together={('account', 'contract', 'symbol', 'block_number', 'action_id')},
+        ),
+    ]
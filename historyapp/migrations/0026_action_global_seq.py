@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:26
+
+from django.db import migrations, models
+
+# Number the actions imported before the column existed. Each block's transactions were imported one after another in
+# chain order, so ordering them by their lowest action ID gives their position in the block.
+populate_global_seq = """
+UPDATE historyapp_eosaction AS a
+SET global_seq = (a.block_number << 31) | (t.position << 15) | a.action_index
+FROM (
+    SELECT transaction_id, block_number, row_number() OVER (PARTITION BY block_number ORDER BY min(id)) - 1 AS position
+    FROM historyapp_eosaction
+    WHERE block_number IS NOT NULL
+    GROUP BY transaction_id, block_number
+) AS t
+WHERE a.transaction_id = t.transaction_id AND a.block_number = t.block_number;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0025_accountbalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eosaction',
+            name='global_seq',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        # Backfilled before the index is created, as building the index once is much faster than updating it per row
+        migrations.RunSQL(populate_global_seq, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='eosaction',
+            index=models.Index(fields=['global_seq'], name='eosaction_global_seq'),
+        ),
+    ]
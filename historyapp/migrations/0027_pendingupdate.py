@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0026_action_global_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingUpdate',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('rollups', 'Transfer rollups')], max_length=20)),
+                ('range_start', models.BigIntegerField()),
+                ('range_end', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation Time')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='pendingupdate',
+            index=models.Index(fields=['kind', 'range_start'], name='pendingupdate_kind_start'),
+        ),
+    ]
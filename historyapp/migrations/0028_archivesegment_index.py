@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0027_pendingupdate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivesegment',
+            name='max_action_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivesegment',
+            name='min_action_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivesegment',
+            name='txid_filter',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historyapp', '0028_archivesegment_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pendingupdate',
+            name='kind',
+            field=models.CharField(choices=[('rollups', 'Transfer rollups'), ('producers', 'Producer statistics')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='producerround',
+            index=models.Index(fields=['schedule_version', 'round'], name='producerround_version'),
+        ),
+    ]
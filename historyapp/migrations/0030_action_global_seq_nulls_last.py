@@ -0,0 +1,49 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:02
+
+from django.db import migrations
+
+# Actions without a block number (imported before it was stored on the action) have no sequence. Ordering the action
+# list newest first has to put them last, and Django can't declare NULLS LAST on an index, so the index is re-created
+# by hand in that order - Postgres can then read it forwards for the newest-first list, and backwards for the feed
+# (which orders by ``global_seq ASC NULLS FIRST`` to match). Django's migration state keeps the plain index.
+TABLE = 'historyapp_eosaction'
+INDEX = 'eosaction_global_seq'
+NEW_INDEX = 'eosaction_global_seq_new'
+
+
+def replace_index(cursor, columns: str):
+    """
+    Build the new index under a temporary name with CREATE INDEX CONCURRENTLY, then swap it in for the old one, so
+    the importer and API can keep using the action table while it's built. PostgreSQL can't build an index
+    concurrently on a partitioned table (see historyapp.lib.partitions), so those are indexed normally.
+    """
+    cursor.execute('SELECT EXISTS(SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass);', [TABLE])
+    concurrently = '' if cursor.fetchone()[0] else 'CONCURRENTLY'
+    # An interrupted concurrent build leaves behind an invalid index, which must be dropped before retrying
+    cursor.execute(f'DROP INDEX {concurrently} IF EXISTS {NEW_INDEX};')
+    cursor.execute(f'CREATE INDEX {concurrently} {NEW_INDEX} ON {TABLE} ({columns});')
+    cursor.execute(f'DROP INDEX {concurrently} IF EXISTS {INDEX};')
+    cursor.execute(f'ALTER INDEX {NEW_INDEX} RENAME TO {INDEX};')
+
+
+def create_desc_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        replace_index(cursor, 'global_seq DESC NULLS LAST')
+
+
+def create_asc_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        replace_index(cursor, 'global_seq')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('historyapp', '0029_producer_pending'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_desc_index, create_asc_index),
+    ]
@@ -17,10 +17,16 @@ Django database models
     +===================================================+
 
 """
-from datetime import datetime
+import struct
+from typing import List, Optional
+
 from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
+from historyapp.fields import HexBinaryField, EOSNameField, EOSSymbolField
+from historyapp.lib.packing import pack_action, pack_transaction, action_bytes, format_asset
+
 # Create your models here.
 
 MAX_STORED_DP = 20
@@ -43,11 +49,14 @@ class EOSBlock(models.Model):
     timestamp = models.DateTimeField()
     """This holds the actual timestamp of when the block was produced"""
     
-    producer = models.CharField(max_length=50, null=True, blank=True)
+    producer = EOSNameField(null=True, blank=True, db_index=True)
     """The block producer (BP) whom produced this block"""
     
-    id = models.CharField(max_length=255, null=True, blank=True)
-    """This is not the database ID, but represents the hex 'id' field on the block data"""
+    id = HexBinaryField(null=True, blank=True)
+    """
+    The block's ID (hash) - stored as binary, but read / written as hex. This is not the database ID, but represents
+    the hex 'id' field on the block data.
+    """
     
     new_producers = models.TextField(max_length=10000, null=True, blank=True)
     transaction_mroot = models.CharField(max_length=255, null=True, blank=True)
@@ -58,14 +67,13 @@ class EOSBlock(models.Model):
     ref_block_prefix = models.BigIntegerField(default=0)
     confirmed = models.BigIntegerField(default=0)
     schedule_version = models.BigIntegerField(default=0)
+    total_transactions = models.IntegerField(default=0)
+    """The amount of transactions imported from this block - stored by the importer, rather than counted"""
     
     # The date/time that this database entry was added/updated
     created_at = models.DateTimeField('Creation Time', auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField('Last Update', auto_now=True)
     
-    @property
-    def total_transactions(self):
-        return self.transactions.count()
 
 
 class EOSTransaction(models.Model):
@@ -76,7 +84,17 @@ class EOSTransaction(models.Model):
     
     You can access related actions ( :class:`.EOSAction` ) using the attribute :py:attr:`.actions`
     """
-    txid = models.CharField(max_length=100, primary_key=True, null=False, blank=False)
+
+    class Meta:
+        # jsonb_path_ops GIN indexes only support containment (``@>`` / ``__contains``), but are much smaller and faster
+        # than the default jsonb_ops. They're built concurrently by migration 0016.
+        indexes = [
+            GinIndex(fields=['signatures'], name='eostx_signatures_gin', opclasses=['jsonb_path_ops']),
+            GinIndex(fields=['metadata'], name='eostx_metadata_gin', opclasses=['jsonb_path_ops']),
+        ]
+
+    txid = HexBinaryField(primary_key=True, null=False, blank=False)
+    """The transaction ID (hash) - stored as binary, but read / written as hex"""
     status = models.CharField(max_length=255, default='executed')
     compression = models.CharField(max_length=255, default='none')
     cpu_usage_us = models.BigIntegerField(default=0)
@@ -84,27 +102,46 @@ class EOSTransaction(models.Model):
     signatures = JSONField(default=list, null=True, blank=True)
     context_free_data = JSONField(default=list, null=True, blank=True)
     packed_trx = models.TextField(max_length=1000, blank=True, null=True)
+    packed_trx_bin = models.BinaryField(null=True, blank=True)
+    """
+    With ``STORAGE_PROFILE=compact``, :py:attr:`.packed_trx` is only stored (as binary, in this field) if it can't be
+    rebuilt from :py:attr:`.metadata` and the actions. Use :meth:`.get_packed_trx` to read it regardless of profile.
+    """
 
     metadata = JSONField(default=dict, blank=True, null=True)
     """Metadata contains the data from ``x['transactions'][?]['trx']['transaction']`` minus the ``actions`` key."""
     
     block = models.ForeignKey(EOSBlock, on_delete=models.CASCADE, related_name='transactions')
 
+    timestamp = models.DateTimeField(null=True, blank=True, db_index=True)
+    """The timestamp of the block this transaction is in (copied from :attr:`.EOSBlock.timestamp`)"""
+    total_actions = models.IntegerField(default=0)
+    """The amount of actions in this transaction - stored by the importer, rather than counted"""
+
     # The date/time that this database entry was added/updated
     created_at = models.DateTimeField('Creation Time', auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField('Last Update', auto_now=True)
 
-    @property
-    def timestamp(self) -> datetime:
-        return self.block.timestamp
-
     @property
     def block_number(self) -> int:
-        return self.block.number
+        return self.block_id
 
-    @property
-    def total_actions(self):
-        return self.actions.count()
+    def get_packed_trx(self) -> Optional[str]:
+        """
+        Returns the hex packed transaction - from :py:attr:`.packed_trx`, :py:attr:`.packed_trx_bin`, or if neither
+        were stored (compact storage profile), rebuilt from :py:attr:`.metadata` and :py:attr:`.actions`
+        """
+        if self.packed_trx is not None:
+            return self.packed_trx
+        if self.packed_trx_bin is not None:
+            return bytes(self.packed_trx_bin).hex()
+        if not isinstance(self.metadata, dict) or self.compression != 'none':
+            return None
+        try:
+            actions = sorted(self.actions.all(), key=lambda a: a.action_index)
+            return pack_transaction(self.metadata, [a.packed() for a in actions]).hex()
+        except (KeyError, ValueError, TypeError, struct.error):
+            return None
 
 
 class EOSAction(models.Model):
@@ -121,6 +158,9 @@ class EOSAction(models.Model):
     are not a standard part of EOS actions, however to/from/memo/amount/symbol are all included in a ``transfer``
     action's ``data`` section, so we make them available as optional model fields to allow for easier querying
     of transfer actions in the DB.
+
+    :py:attr:`account`, :py:attr:`tx_from` and :py:attr:`tx_to` are :class:`.EOSNameField` s (stored as 64-bit
+    integers), so ``tx_from`` / ``tx_to`` are left empty if the ``from`` / ``to`` in the data isn't a valid name.
     """
 
     class Meta:
@@ -129,25 +169,51 @@ class EOSAction(models.Model):
         has a unique `vout` number.
         """
         unique_together = (('transaction', 'action_index'),)
+        indexes = [
+            GinIndex(fields=['data'], name='eosaction_data_gin', opclasses=['jsonb_path_ops']),
+            models.Index(fields=['global_seq'], name='eosaction_global_seq'),
+        ]
     
     id = models.BigAutoField(primary_key=True, null=False)
 
     transaction = models.ForeignKey(EOSTransaction, on_delete=models.CASCADE, related_name='actions')
     action_index = models.IntegerField(default=0)
     
-    account = models.CharField(max_length=150, db_index=True)
+    account = EOSNameField(db_index=True)
     name = models.CharField(max_length=255, db_index=True)
     authorization = JSONField(default=list)
     data = JSONField(default=None)
     
-    tx_from = models.CharField('TX Sender (from data)', max_length=150, null=True, blank=True, db_index=True)
-    tx_to = models.CharField('TX Recipient (from data)', max_length=150, null=True, blank=True, db_index=True)
+    tx_from = EOSNameField('TX Sender (from data)', null=True, blank=True, db_index=True)
+    tx_to = EOSNameField('TX Recipient (from data)', null=True, blank=True, db_index=True)
     tx_memo = models.TextField('TX Memo (from data)', max_length=1000, null=True, blank=True)
     tx_amount = models.DecimalField('Amount of tokens transacted (from data)', null=True, blank=True,
                                     max_digits=MAX_STORED_DIGITS, decimal_places=MAX_STORED_DP)
     tx_precision = models.IntegerField('TX Token Decimal Places', default=4)
     tx_symbol = models.CharField('TX Token Symbol (from data)', max_length=100, null=True, blank=True, db_index=True)
     hex_data = models.TextField(max_length=1000, null=True, blank=True)
+    raw_data = models.BinaryField(null=True, blank=True)
+    """
+    With ``STORAGE_PROFILE=compact``, :py:attr:`.hex_data` is stored in this field as binary instead of hex.
+    Use :meth:`.get_hex_data` to read it regardless of profile.
+    """
+
+    block_number = models.BigIntegerField(null=True, blank=True, db_index=True)
+    """
+    The number of the block this action's transaction is in - the same as ``transaction.block_id``. Stored on the
+    action itself so that the action table can be partitioned by block number (see :mod:`historyapp.lib.partitions`)
+    """
+    timestamp = models.DateTimeField(null=True, blank=True, db_index=True)
+    """The timestamp of the block this action is in (copied from :attr:`.EOSBlock.timestamp`)"""
+    global_seq = models.BigIntegerField(null=True, blank=True)
+    """
+    This action's position in the chain, built from its block number, its transaction's position in the block, and
+    :py:attr:`.action_index` (see :func:`historyapp.lib.feed.action_seq`) - so it always increases in chain order,
+    no matter which order blocks are imported in.
+
+    Only ``None`` for actions without a :py:attr:`.block_number`, which sort after every other action (the index is
+    built as ``global_seq DESC NULLS LAST`` by migration 0030, as Django can't declare the NULL order of an index).
+    """
 
     # The date/time that this database entry was added/updated
     created_at = models.DateTimeField('Creation Time', auto_now_add=True, db_index=True)
@@ -159,15 +225,588 @@ class EOSAction(models.Model):
 
     @property
     def txid(self) -> str:
-        return self.transaction.txid
+        return self.transaction_id
+    
+    @property
+    def block_url(self) -> int:
+        """This exists just as an alias for Django Rest Framework :class:`.EOSActionSerializer`"""
+        return self.block_number
+
+    def get_hex_data(self) -> Optional[str]:
+        """Returns the hex encoded binary data of this action, from :py:attr:`.hex_data` or :py:attr:`.raw_data`"""
+        if self.hex_data is not None:
+            return self.hex_data
+        return None if self.raw_data is None else bytes(self.raw_data).hex()
+
+    def packed(self) -> bytes:
+        """Returns this action in EOSIO's binary format, as it appears in a packed transaction"""
+        data = action_bytes(self.hex_data, self.raw_data)
+        if data is None:
+            # Only load ``data`` (which the API's prefetch defers) if there's no binary data
+            data = action_bytes(None, data=self.data)
+        if data is None:
+            raise ValueError(f'Action {self.id} has no binary data')
+        return pack_action(self.account, self.name, self.authorization, data)
+
+
+class AccountAction(models.Model):
+    """
+    Maps an account to each action it was involved in, so an account's history can be read from one index.
+
+    One row is written by :func:`historyapp.lib.loader.import_actions` for each distinct account involved in an
+    action - the contract it was sent to, each authorizing actor, and the sender / receiver accounts found in the
+    action's data. :py:attr:`.roles` is a bitmask of the ways the account was involved (see :py:attr:`.ROLES`).
+
+    Migration 0015 adds a unique index on ``(account, block_number DESC, action_id DESC)``, which both "latest N
+    actions for an account" and block range queries are answered from with a single index range scan.
+    """
+    ROLE_CONTRACT, ROLE_AUTH, ROLE_SENDER, ROLE_RECEIVER = 1, 2, 4, 8
+    ROLES = (
+        (ROLE_CONTRACT, 'contract'),
+        (ROLE_AUTH, 'auth'),
+        (ROLE_SENDER, 'sender'),
+        (ROLE_RECEIVER, 'receiver'),
+    )
+
+    id = models.BigAutoField(primary_key=True, null=False)
+
+    account = EOSNameField()
+    """The account involved in :py:attr:`.action`"""
+
+    block_number = models.BigIntegerField()
+    """The number of the block :py:attr:`.action` is in (copied from :attr:`.EOSAction.block_number`)"""
+
+    action = models.ForeignKey(EOSAction, on_delete=models.CASCADE, related_name='accounts', db_constraint=False)
+    """
+    Not enforced by the database, as the action table's primary key becomes ``(id, block_number)`` once it's
+    partitioned (see :mod:`historyapp.lib.partitions`)
+    """
+
+    roles = models.SmallIntegerField(default=0)
+    """Bitmask of :py:attr:`.ROLES` - how :py:attr:`.account` was involved in the action"""
 
     @property
-    def timestamp(self) -> datetime:
-        return self.block.timestamp
-    
+    def role_names(self) -> List[str]:
+        return [name for bit, name in self.ROLES if self.roles & bit]
+
+    def __str__(self):
+        return f'{self.account} @ {self.block_number} (action {self.action_id})'
+
+
+class EOSBlockRange(models.Model):
+    """
+    Represents a contiguous, inclusive range of block numbers which have been fully imported into :class:`.EOSBlock`
+
+    This table is maintained by the importer (see :mod:`historyapp.lib.coverage`) every time a block import is
+    committed, allowing gaps in the block history to be detected by reading a handful of rows, instead of sorting
+    the entire block table.
+
+    Adjacent ranges (e.g. ``100-199`` and ``200-250``) may temporarily exist when two neighbouring blocks were
+    committed concurrently - they're treated as contiguous, and are merged by :func:`.coverage.compact_ranges`
+    """
+    start_block = models.BigIntegerField(primary_key=True)
+    """The first block number in this range"""
+
+    end_block = models.BigIntegerField(db_index=True)
+    """The last block number in this range (inclusive)"""
+
+    updated_at = models.DateTimeField('Last Update', auto_now=True)
+
     @property
-    def block_number(self) -> int:
-        return self.block.number
+    def total_blocks(self) -> int:
+        return (self.end_block - self.start_block) + 1
+
+    def __str__(self):
+        return f'{self.start_block} - {self.end_block}'
+
+
+class SyncCheckpoint(models.Model):
+    """
+    Persisted progress of ``sync_blocks`` for an individual Celery queue.
+
+    :py:attr:`.queued_block` is updated by ``sync_blocks`` whenever it has finished queueing a chunk of blocks, while
+    :py:attr:`.committed_block` and :py:attr:`.blocks_committed` are updated by the importer as part of each block's
+    import transaction (see :mod:`historyapp.lib.checkpoint`).
+
+    This allows ``sync_blocks`` to work out where to resume from with a single primary key lookup, instead of
+    counting / aggregating the entire block table.
+    """
+    queue = models.CharField(max_length=255, primary_key=True)
+    """The Celery queue name which this checkpoint belongs to"""
+
+    queued_block = models.BigIntegerField(null=True, blank=True)
+    """The highest block number which has been queued for import on this queue"""
+
+    committed_block = models.BigIntegerField(null=True, blank=True)
+    """The highest block number which has been imported (committed) from this queue"""
+
+    blocks_committed = models.BigIntegerField(default=0)
+    """Total amount of blocks which have been imported (committed) from this queue"""
+
+    start_block = models.BigIntegerField(null=True, blank=True)
+    """The block number which the current/last sync run started from"""
+
+    target_block = models.BigIntegerField(null=True, blank=True)
+    """The block number which the current/last sync run is syncing up to"""
+
+    run_started_at = models.DateTimeField(null=True, blank=True)
+    """The date/time that the current/last sync run was started"""
+
+    run_blocks_committed = models.BigIntegerField(default=0)
+    """The value of :py:attr:`.blocks_committed` when the current/last sync run was started"""
+
+    blocks_failed = models.BigIntegerField(default=0)
+    """Total amount of block import attempts from this queue which raised an exception"""
+
+    avg_rpc_ms = models.FloatField(null=True, blank=True)
+    """Moving average of how long (in milliseconds) the importer took to fetch a block from the RPC node"""
+
+    avg_db_ms = models.FloatField(null=True, blank=True)
+    """Moving average of how long (in milliseconds) the importer spent writing a block to the database"""
+
+    window = models.IntegerField(null=True, blank=True)
+    """The current in-flight block window chosen by the adaptive concurrency controller"""
+
+    window_reason = models.CharField(max_length=255, null=True, blank=True)
+    """Why the adaptive concurrency controller last changed (or kept) :py:attr:`.window`"""
+
+    created_at = models.DateTimeField('Creation Time', auto_now_add=True)
+    updated_at = models.DateTimeField('Last Update', auto_now=True)
+
+    def __str__(self):
+        return f'{self.queue} (queued: {self.queued_block} / committed: {self.committed_block})'
+
+
+class BlockRangeLease(models.Model):
+    """
+    A range of blocks which can be claimed by a ``sync_blocks --sharded`` instance, allowing any number of sync hosts
+    to share the work of importing blocks without manually splitting queues / block ranges between them.
+
+    A host claims a ``pending`` range (or a ``claimed`` range whose lease has expired, i.e. its holder died), renews
+    the lease while it's queueing/waiting on the range, and marks it ``done`` once every block in the range has
+    been imported. See :mod:`historyapp.lib.leases`
+    """
+    STATUS_PENDING, STATUS_CLAIMED, STATUS_DONE = 'pending', 'claimed', 'done'
+    STATUSES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_CLAIMED, 'Claimed'),
+        (STATUS_DONE, 'Done'),
+    )
+
+    start_block = models.BigIntegerField(primary_key=True)
+    """The first block number in this range"""
+
+    end_block = models.BigIntegerField(db_index=True)
+    """The last block number in this range (inclusive)"""
+
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_PENDING, db_index=True)
+
+    holder = models.CharField(max_length=255, null=True, blank=True)
+    """The sync host/process which currently holds the lease on this range, e.g. ``sync1.example.com:1234``"""
+
+    lease_expires = models.DateTimeField(null=True, blank=True, db_index=True)
+    """The lease on this range may be reclaimed by another host after this date/time, unless it's renewed"""
+
+    attempts = models.IntegerField(default=0)
+    """How many times this range has been claimed"""
+
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField('Creation Time', auto_now_add=True)
+    updated_at = models.DateTimeField('Last Update', auto_now=True)
+
+    @property
+    def total_blocks(self) -> int:
+        return (self.end_block - self.start_block) + 1
+
+    def __str__(self):
+        return f'{self.start_block} - {self.end_block} ({self.status})'
+
+
+class FailedBlock(models.Model):
+    """
+    A block which failed to import, after the importer ran out of retries (or immediately, for bad data).
+
+    Rows are written by the importer itself (rather than by a Celery error callback), so failures are still recorded
+    when running with ``IMPORT_LEAN_TASKS`` enabled. Each failure is classified by :py:attr:`.error_class`, which
+    decides how long to back off before :py:attr:`.next_retry_at` - see :mod:`historyapp.lib.failures` and the
+    ``retry_failed_blocks`` management command.
+    """
+    ERROR_NODE, ERROR_DB, ERROR_DATA, ERROR_UNKNOWN = 'node', 'db', 'data', 'unknown'
+    ERROR_CLASSES = (
+        (ERROR_NODE, 'RPC Node Error'),
+        (ERROR_DB, 'Database Error'),
+        (ERROR_DATA, 'Bad Block Data'),
+        (ERROR_UNKNOWN, 'Unknown Error'),
+    )
+
+    block = models.BigIntegerField(primary_key=True)
+    """The block number which failed to import"""
+
+    queue = models.CharField(max_length=255, null=True, blank=True)
+    """The Celery queue the block was being imported from"""
+
+    error_class = models.CharField(max_length=20, choices=ERROR_CLASSES, default=ERROR_UNKNOWN, db_index=True)
+    """Whether the last failure was caused by the RPC node, the database, or bad block data"""
+
+    error_type = models.CharField(max_length=255, null=True, blank=True)
+    """The class name of the exception raised by the last failed import attempt, e.g. ``IntegrityError``"""
+
+    error_message = models.TextField(null=True, blank=True)
+    """The message of the exception raised by the last failed import attempt"""
+
+    attempts = models.IntegerField(default=1)
+    """How many times this block has failed to import (after exhausting its retries each time)"""
+
+    next_retry_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    """The block will be re-queued by ``retry_failed_blocks`` once this date/time has passed"""
+
+    first_failed_at = models.DateTimeField(auto_now_add=True)
+    last_failed_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.block} ({self.error_class} / {self.error_type}: {self.error_message})'
+
+
+class WorkerStats(models.Model):
+    """
+    Import counters for an individual Celery worker process.
+
+    When ``IMPORT_LEAN_TASKS`` is enabled, each worker process counts the blocks it imports (or fails to import)
+    in memory, and periodically adds them to its row here - instead of sending a callback task for every block.
+
+    The database counters are tracked for every worker process, regardless of ``IMPORT_LEAN_TASKS``.
+    """
+    worker = models.CharField(max_length=255, primary_key=True)
+    """The worker process these stats belong to, e.g. ``worker1.example.com:1234``"""
+
+    blocks_imported = models.BigIntegerField(default=0)
+    blocks_failed = models.BigIntegerField(default=0)
+    txs_imported = models.BigIntegerField(default=0)
+
+    last_block = models.BigIntegerField(null=True, blank=True)
+    """The highest block number this worker has imported"""
+
+    flushes = models.BigIntegerField(default=0)
+    """How many times the worker has flushed its counters to this row"""
+
+    db_connects = models.BigIntegerField(default=0)
+    """How many database connections the worker has opened"""
+    db_queries = models.BigIntegerField(default=0)
+    db_query_ms = models.FloatField(default=0)
+    """Total time spent running :attr:`.db_queries` (in milliseconds)"""
+
+    created_at = models.DateTimeField('Creation Time', auto_now_add=True)
+    updated_at = models.DateTimeField('Last Update', auto_now=True)
+
+    def __str__(self):
+        return f'{self.worker} (imported: {self.blocks_imported} / failed: {self.blocks_failed})'
+
+
+class DeferredIndex(models.Model):
+    """
+    A secondary index which was dropped by ``./manage.py bulk_load --begin``, and hasn't been rebuilt yet.
+
+    The index's definition is recorded here in the same transaction as it's dropped, so it can always be rebuilt
+    (by ``bulk_load --finish``) even if the command crashes part way through. Rows are deleted once their index
+    has been rebuilt - see :mod:`historyapp.lib.bulkload`.
+    """
+    STATUSES = (
+        ('dropped', 'Dropped'),
+        ('building', 'Building'),
+        ('failed', 'Failed'),
+    )
+
+    name = models.CharField(max_length=100, primary_key=True)
+    """The name of the index"""
+
+    table = models.CharField(max_length=100)
+    """The table the index belongs to"""
+
+    definition = models.TextField()
+    """The index's original ``CREATE INDEX`` statement (from ``pg_get_indexdef``)"""
+
+    status = models.CharField(max_length=20, choices=STATUSES, default='dropped')
+    error = models.TextField(null=True, blank=True)
+    """The error from the last attempt to rebuild the index, if it failed"""
+
+    dropped_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    """When the latest attempt to rebuild the index started"""
+
+    def __str__(self):
+        return f'{self.name} on {self.table} ({self.status})'
+
+
+class ArchiveSegment(models.Model):
+    """
+    A range of blocks which has been moved out of the database, into a compressed columnar archive file (see
+    :mod:`historyapp.lib.archive`). The blocks stay marked as imported in the coverage table, so they aren't
+    re-imported.
+    """
+    start_block = models.BigIntegerField(primary_key=True)
+    """The first block number this archive file can hold"""
+
+    end_block = models.BigIntegerField(db_index=True)
+    """The last block number this archive file can hold (inclusive)"""
+
+    start_time = models.DateTimeField(null=True, blank=True)
+    """The timestamp of the oldest block in the file"""
+
+    end_time = models.DateTimeField(null=True, blank=True)
+    """The timestamp of the newest block in the file"""
+
+    path = models.CharField(max_length=255)
+    """The archive file's name, relative to ``settings.ARCHIVE_DIR``"""
+
+    total_blocks = models.BigIntegerField(default=0)
+    total_transactions = models.BigIntegerField(default=0)
+    total_actions = models.BigIntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+
+    txid_filter = models.BinaryField(null=True, blank=True)
+    """
+    A bloom filter of the TXIDs in the file (see :class:`historyapp.lib.archive.TxidFilter`), so looking up a TXID
+    only has to open the files which may contain it. ``None`` until the file has been indexed.
+    """
+
+    min_action_id = models.BigIntegerField(null=True, blank=True)
+    max_action_id = models.BigIntegerField(null=True, blank=True)
+    """The range of action IDs in the file - ``None`` until the file has been indexed"""
+
+    created_at = models.DateTimeField('Creation Time', auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.start_block} - {self.end_block} ({self.path})'
+
+
+class TransferRollup(models.Model):
+    """
+    The number and total amount of token transfers of each token (contract + symbol), per hour and per day.
+
+    Each imported block is queued as a :class:`.PendingUpdate`, and added in batches shortly after it's committed (see
+    :mod:`historyapp.lib.rollups`). Blocks are subtracted again when they're deleted, so totals stay correct across
+    re-imports. Rows of blocks moved into the archive (``archive_blocks``) are kept.
+    """
+    PERIODS = (
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    )
+
+    class Meta:
+        unique_together = (('contract', 'symbol', 'period', 'bucket'),)
+
+    id = models.BigAutoField(primary_key=True, null=False)
+
+    contract = EOSNameField()
+    """The token contract the transfers were sent to, e.g. ``eosio.token``"""
+
+    symbol = models.CharField(max_length=100)
+    period = models.CharField(max_length=10, choices=PERIODS)
+
+    bucket = models.DateTimeField()
+    """The start of the hour / day (UTC) which this row counts the transfers of"""
+
+    transfers = models.BigIntegerField(default=0)
+    volume = models.DecimalField(max_digits=MAX_STORED_DIGITS, decimal_places=MAX_STORED_DP, default=0)
+    """The total amount of tokens transferred"""
+
+    def __str__(self):
+        return f'{self.symbol}@{self.contract} {self.period} {self.bucket:%Y-%m-%d %H:%M}'
+
+
+class AccountTransferRollup(models.Model):
+    """
+    The number and total amount of each token sent and received by each account, per day. Maintained the same way as
+    :class:`.TransferRollup`.
+    """
+    class Meta:
+        unique_together = (('account', 'contract', 'symbol', 'bucket'),)
+        indexes = [
+            # For "top senders / receivers of a token" - every account's rows for a token within a time range
+            models.Index(fields=['contract', 'symbol', 'bucket'], name='accttransferrollup_token'),
+        ]
+
+    id = models.BigAutoField(primary_key=True, null=False)
+
+    account = EOSNameField()
+    contract = EOSNameField()
+    symbol = models.CharField(max_length=100)
+
+    bucket = models.DateTimeField()
+    """The start of the day (UTC) which this row counts the transfers of"""
+
+    sent_count = models.BigIntegerField(default=0)
+    sent_volume = models.DecimalField(max_digits=MAX_STORED_DIGITS, decimal_places=MAX_STORED_DP, default=0)
+    received_count = models.BigIntegerField(default=0)
+    received_volume = models.DecimalField(max_digits=MAX_STORED_DIGITS, decimal_places=MAX_STORED_DP, default=0)
+
+    def __str__(self):
+        return f'{self.account} {self.symbol}@{self.contract} {self.bucket:%Y-%m-%d}'
+
+
+class PendingUpdate(models.Model):
+    """
+    A range of blocks (or production rounds) whose changes haven't been applied to a derived table yet. The importer
+    (and anything which deletes blocks) queues one of these in its own transaction, instead of updating rows which
+    every import shares, and they're applied in batches once committed - see :mod:`historyapp.lib.pending`.
+
+    Rows are only ever inserted and deleted, and nothing about them is unique, so imports never wait for each other.
+    """
+    KINDS = (
+        ('rollups', 'Transfer rollups'),
+        ('producers', 'Producer statistics'),
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'range_start'], name='pendingupdate_kind_start'),
+        ]
+
+    id = models.BigAutoField(primary_key=True, null=False)
+    kind = models.CharField(max_length=20, choices=KINDS)
+
+    range_start = models.BigIntegerField()
+    range_end = models.BigIntegerField()
+    """The inclusive range of block numbers (round numbers for ``producers``) which changed"""
+
+    created_at = models.DateTimeField('Creation Time', auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.kind} {self.range_start} - {self.range_end}'
+
+
+class EOSTransfer(models.Model):
+    """
+    A token transfer, stored the way EOSIO stores an asset - an integer amount in the token's smallest unit, its
+    precision, and its symbol code as a 64-bit integer - instead of the Decimal / text columns of :class:`.EOSAction`.
+
+    One row is written by :func:`historyapp.lib.loader.import_actions` for each ``transfer`` action with a valid
+    ``quantity``. Migration 0023 adds indexes on ``(sender, block_number DESC, action_id DESC)``,
+    ``(receiver, block_number DESC, action_id DESC)`` and ``(contract, symbol, block_number DESC, action_id DESC)``,
+    so an account's / token's transfers (newest first) are each read with a single index range scan.
+    """
+    action = models.OneToOneField(
+        EOSAction, primary_key=True, on_delete=models.CASCADE, related_name='transfer', db_constraint=False
+    )
+    """Not enforced by the database, for the same reason as :attr:`.AccountAction.action`"""
+
+    block_number = models.BigIntegerField()
+    """The number of the block the transfer is in (copied from :attr:`.EOSAction.block_number`)"""
+
+    contract = EOSNameField()
+    """The token contract which the transfer action was sent to, e.g. ``eosio.token``"""
+
+    sender = EOSNameField(null=True, blank=True)
+    receiver = EOSNameField(null=True, blank=True)
+
+    amount = models.BigIntegerField()
+    """The amount transferred in the token's smallest unit, e.g. ``12500`` for ``1.2500 EOS``"""
+
+    precision = models.SmallIntegerField()
+    symbol = EOSSymbolField()
+
+    @property
+    def quantity(self) -> str:
+        """The amount as an EOSIO asset string, e.g. ``1.2500 EOS``"""
+        return format_asset(self.amount, self.precision, self.symbol)
+
+    def __str__(self):
+        return f'{self.sender} -> {self.receiver} {self.quantity} ({self.contract})'
+
+
+class ProducerSchedule(models.Model):
+    """
+    Which producer owns each position of a producer schedule version - learned from the blocks they produce (see
+    :mod:`historyapp.lib.producers`), and used to work out which producer missed a block slot.
+    """
+    class Meta:
+        unique_together = (('version', 'position'),)
+
+    version = models.BigIntegerField()
+    """The producer schedule version (:attr:`.EOSBlock.schedule_version`)"""
+
+    position = models.SmallIntegerField()
+    """The producer's index in the schedule - it produces the blocks of every slot where
+    ``(slot % (PRODUCER_SCHEDULE_SIZE * 12)) // 12 == position``"""
+
+    producer = EOSNameField()
+
+    def __str__(self):
+        return f'v{self.version} #{self.position}: {self.producer}'
+
+
+class ProducerRound(models.Model):
+    """
+    Counters of how reliably a producer produced its blocks during one production round (``PRODUCER_SCHEDULE_SIZE``
+    producers x 12 block slots), re-calculated shortly after each block in the round is imported (see
+    :mod:`historyapp.lib.producers`).
+
+    :py:attr:`.expected_slots` is always :py:attr:`.blocks_produced` + :py:attr:`.missed_slots`
+    """
+    class Meta:
+        unique_together = (('round', 'producer'),)
+        indexes = [
+            models.Index(fields=['producer', 'round'], name='producerround_producer'),
+            # Finds the rounds to re-calculate when a schedule version learns a new producer position
+            models.Index(fields=['schedule_version', 'round'], name='producerround_version'),
+        ]
+
+    id = models.BigAutoField(primary_key=True, null=False)
+
+    round = models.BigIntegerField()
+    """The round number - the block slot number (half seconds since 2000-01-01) divided by the slots per round"""
+
+    producer = EOSNameField()
+    schedule_version = models.BigIntegerField(default=0)
+
+    blocks_produced = models.IntegerField(default=0)
+    expected_slots = models.IntegerField(default=0)
+    missed_slots = models.IntegerField(default=0)
+    schedule_changes = models.IntegerField(default=0)
+    """How many of the producer's blocks in this round proposed a new producer schedule"""
+
+    def __str__(self):
+        return f'{self.producer} round {self.round} ({self.blocks_produced}/{self.expected_slots})'
+
+
+class AccountBalance(models.Model):
+    """
+    An account's running balance of a token, after each :class:`.EOSTransfer` which sent or received it - maintained
+    by the importer (see :mod:`historyapp.lib.balances`).
+
+    The unique key ``(account, contract, symbol, block_number, action_id)`` is also the lookup index - an account's
+    balance at block ``N`` is the newest row at or below ``N``, which is a single backwards index lookup.
+    """
+    class Meta:
+        unique_together = (('account', 'contract', 'symbol', 'block_number', 'action_id'),)
+        indexes = [
+            models.Index(fields=['block_number'], name='accountbalance_block'),
+        ]
+
+    id = models.BigAutoField(primary_key=True, null=False)
+
+    account = EOSNameField()
+    contract = EOSNameField()
+    symbol = EOSSymbolField()
+    precision = models.SmallIntegerField()
+
+    block_number = models.BigIntegerField()
+    action_id = models.BigIntegerField()
+    """The :class:`.EOSAction` (transfer) which changed the balance - not a foreign key, as balances are kept when
+    their blocks are archived"""
+
+    delta = models.BigIntegerField()
+    """How much the transfer changed the balance by, in the token's smallest unit (negative when sent)"""
+
+    balance = models.BigIntegerField()
+    """The account's balance after the transfer, in the token's smallest unit"""
+
+    @property
+    def quantity(self) -> str:
+        """The balance as an EOSIO asset string, e.g. ``1.2500 EOS``"""
+        return format_asset(self.balance, self.precision, self.symbol)
 
-    block_url = block_number
-    """This exists just as an alias for Django Rest Framework :class:`.EOSActionSerializer`"""
+    def __str__(self):
+        return f'{self.account} @ {self.block_number}: {self.quantity} ({self.contract})'
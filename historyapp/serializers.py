@@ -19,7 +19,11 @@ Django Rest Framework serializer and filter classes
 """
 from rest_framework import serializers
 
-from historyapp.models import EOSBlock, EOSTransaction, EOSAction
+from historyapp.lib import producers
+from historyapp.lib.packing import format_asset
+from historyapp.models import EOSBlock, EOSTransaction, EOSAction, SyncCheckpoint, AccountAction, TransferRollup, \
+    AccountTransferRollup, EOSTransfer, ProducerRound, ProducerSchedule, AccountBalance, MAX_STORED_DIGITS, \
+    MAX_STORED_DP
 
 
 class EOSBlockSerializer(serializers.HyperlinkedModelSerializer):
@@ -42,6 +46,7 @@ class EOSBlockSerializer(serializers.HyperlinkedModelSerializer):
             'ref_block_prefix',
             'confirmed',
             'schedule_version',
+            'total_transactions',
             'transactions',
             'created_at',
             'updated_at',
@@ -71,6 +76,7 @@ class EOSBlockSerializer(serializers.HyperlinkedModelSerializer):
 
 class EOSTransactionSerializer(serializers.HyperlinkedModelSerializer):
     total_actions = serializers.ReadOnlyField()
+    packed_trx = serializers.ReadOnlyField(source='get_packed_trx')
     block_number = serializers.ReadOnlyField()
     timestamp = serializers.ReadOnlyField()
 
@@ -104,6 +110,7 @@ class EOSActionSerializer(serializers.HyperlinkedModelSerializer):
     txid = serializers.ReadOnlyField()
     block_number = serializers.ReadOnlyField()
     timestamp = serializers.ReadOnlyField()
+    hex_data = serializers.ReadOnlyField(source='get_hex_data')
     
     block_url = serializers.HyperlinkedRelatedField(
         'eosblock-detail', read_only=True,
@@ -123,6 +130,7 @@ class EOSActionSerializer(serializers.HyperlinkedModelSerializer):
             'block_url',
             'block_number',
             'action_index',
+            'global_seq',
             'account',
             'name',
             'authorization',
@@ -137,3 +145,161 @@ class EOSActionSerializer(serializers.HyperlinkedModelSerializer):
             'created_at',
             'updated_at',
         )
+
+
+class AccountActionSerializer(serializers.ModelSerializer):
+    roles = serializers.ReadOnlyField(source='role_names')
+    action = EOSActionSerializer(read_only=True)
+
+    class Meta:
+        model = AccountAction
+        fields = (
+            'account',
+            'block_number',
+            'roles',
+            'action',
+        )
+
+
+class EOSTransferSerializer(serializers.ModelSerializer):
+    quantity = serializers.ReadOnlyField()
+    action = serializers.HyperlinkedRelatedField('eosaction-detail', read_only=True)
+
+    class Meta:
+        model = EOSTransfer
+        fields = (
+            'action',
+            'block_number',
+            'contract',
+            'sender',
+            'receiver',
+            'quantity',
+            'amount',
+            'precision',
+            'symbol',
+        )
+
+
+class AccountBalanceSerializer(serializers.ModelSerializer):
+    quantity = serializers.ReadOnlyField()
+    change = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AccountBalance
+        fields = (
+            'account',
+            'contract',
+            'symbol',
+            'block_number',
+            'action_id',
+            'quantity',
+            'change',
+            'balance',
+            'precision',
+        )
+
+    def get_change(self, obj: AccountBalance):
+        return format_asset(obj.delta, obj.precision, obj.symbol)
+
+
+class SyncCheckpointSerializer(serializers.HyperlinkedModelSerializer):
+    class Meta:
+        model = SyncCheckpoint
+        fields = (
+            'queue',
+            'url',
+            'queued_block',
+            'committed_block',
+            'blocks_committed',
+            'blocks_failed',
+            'start_block',
+            'target_block',
+            'run_started_at',
+            'avg_rpc_ms',
+            'avg_db_ms',
+            'window',
+            'window_reason',
+            'updated_at',
+        )
+
+
+class TransferRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TransferRollup
+        fields = (
+            'contract',
+            'symbol',
+            'period',
+            'bucket',
+            'transfers',
+            'volume',
+        )
+
+
+class AccountTransferRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AccountTransferRollup
+        fields = (
+            'account',
+            'contract',
+            'symbol',
+            'bucket',
+            'sent_count',
+            'sent_volume',
+            'received_count',
+            'received_volume',
+        )
+
+
+class TopAccountSerializer(serializers.Serializer):
+    """An account's summed :class:`.AccountTransferRollup` rows, for ``/api/account_rollups/top/``"""
+    account = serializers.CharField()
+    sent_count = serializers.IntegerField()
+    sent_volume = serializers.DecimalField(max_digits=MAX_STORED_DIGITS, decimal_places=MAX_STORED_DP)
+    received_count = serializers.IntegerField()
+    received_volume = serializers.DecimalField(max_digits=MAX_STORED_DIGITS, decimal_places=MAX_STORED_DP)
+
+
+class ProducerRoundSerializer(serializers.ModelSerializer):
+    round_start = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProducerRound
+        fields = (
+            'round',
+            'round_start',
+            'producer',
+            'schedule_version',
+            'blocks_produced',
+            'expected_slots',
+            'missed_slots',
+            'schedule_changes',
+        )
+
+    def get_round_start(self, obj: ProducerRound):
+        return producers.round_start(obj.round)
+
+
+class ProducerSummarySerializer(serializers.Serializer):
+    """A producer's summed :class:`.ProducerRound` rows, for ``/api/producers/summary/``"""
+    producer = serializers.CharField()
+    rounds = serializers.IntegerField()
+    blocks_produced = serializers.IntegerField()
+    expected_slots = serializers.IntegerField()
+    missed_slots = serializers.IntegerField()
+    schedule_changes = serializers.IntegerField()
+    reliability = serializers.SerializerMethodField()
+
+    def get_reliability(self, obj: dict):
+        """The percentage of the producer's expected block slots which it actually produced"""
+        return round(obj['blocks_produced'] / obj['expected_slots'] * 100, 4) if obj['expected_slots'] else None
+
+
+class ProducerScheduleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProducerSchedule
+        fields = (
+            'version',
+            'position',
+            'producer',
+        )
@@ -18,19 +18,22 @@ Celery tasks for running in the background
 
 """
 import asyncio
+import time
+from typing import Tuple
 
 from celery.app.task import Context, Task
+from celery.signals import worker_process_shutdown, worker_init, worker_process_init, task_prerun, task_postrun
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.db import transaction
 from django.db.utils import IntegrityError
-from lockmgr.lockmgr import LockMgr
 from privex.helpers import run_sync
 from privex.loghelper import LogHelper
 from psycopg2 import errors
-from lockmgr.lockmgr import LockMgr
 from eoshistory.celery import app
 from eoshistory.settings import config_logger
-from historyapp.lib import eos, loader
+from historyapp.lib import eos, loader, coverage, checkpoint, locking, workerstats, lanes, failures, dbconn, \
+    rollups, producers, balances, pending
 from historyapp.lib.loader import _import_block, InvalidTransaction
 from historyapp.models import EOSBlock, EOSTransaction
 import logging
@@ -54,37 +57,150 @@ class TaskBase(Task):
         _l.handlers.clear()
 
 
-async def import_tx_actions(tx, db_block):
+async def import_tx_actions(tx, db_block, tx_index: int = 0):
     await loader.import_transaction(db_block, tx)
-    await loader.import_actions(tx)
+    await loader.import_actions(tx, tx_index=tx_index)
 
 
 async def import_block_transactions(raw_block: eos.EOSBlock, db_block: EOSBlock):
     coros = []
 
-    for tx in raw_block.transactions:
-        coros += [import_tx_actions(tx, db_block)]
+    for i, tx in enumerate(raw_block.transactions):
+        coros += [import_tx_actions(tx, db_block, tx_index=i)]
     
     await asyncio.gather(*coros, return_exceptions=True)
 
 
-@app.task(base=TaskBase, autoretry_for=(Exception,), retry_kwargs={'max_retries': 5, 'countdown': 2})
-def import_block(block: int) -> dict:
-    with LockMgr(f'eoshist_impblock:{block}'):
-        log.debug('Importing block %d via _import_block...', block)
-        with transaction.atomic():
-            _b = run_sync(_import_block, block)
-            if type(_b) not in [tuple, list] or len(_b) == 1:
-                return dict(block_num=_b.number, timestamp=str(_b.timestamp), txs_imported=0)
-            db_block, raw_block = _b
-        
-            raw_block: eos.EOSBlock
-            db_block: EOSBlock
-            
-            total_txs = len(raw_block.transactions)
-            run_sync(import_block_transactions, raw_block, db_block)
-            
-        return dict(block_num=db_block.number, timestamp=str(db_block.timestamp), txs_imported=total_txs)
+@app.task(base=TaskBase, bind=True, max_retries=settings.IMPORT_MAX_RETRIES)
+def import_block(self: Task, block: int, queue: str = None) -> dict:
+    try:
+        return _import_block_locked(block, queue)
+    except locking.ImportLocked as e:
+        # Another worker is already importing this block (and will retry / record it if that fails), so drop this
+        # task without using up a retry or counting it as a failure
+        log.info('Skipping block %s: %s', block, str(e))
+        return dict(block_num=block, locked=True, txs_imported=0)
+    except Exception as e:
+        # Failures are counted against the queue's checkpoint, which feeds the adaptive concurrency controller
+        checkpoint.record_failure(queue)
+        _retry_or_record(self, block, queue, e)
+        raise
+
+
+@app.task(base=TaskBase, bind=True, ignore_result=True, max_retries=settings.IMPORT_MAX_RETRIES)
+def import_block_lean(self: Task, block: int, queue: str = None):
+    """
+    Same as :func:`.import_block`, but doesn't store a result, and counts successes / failures in the worker's
+    in-memory :data:`.workerstats.buffer` instead of in the block's transaction. Used when ``IMPORT_LEAN_TASKS`` is on.
+    """
+    try:
+        _import_block_locked(block, queue, lean=True)
+    except locking.ImportLocked as e:
+        log.info('Skipping block %s: %s', block, str(e))
+    except Exception as e:
+        workerstats.buffer.add_failure(queue)
+        _retry_or_record(self, block, queue, e)
+
+
+def _retry_or_record(task: Task, block: int, queue: str, exc: Exception):
+    """
+    Retry a failed import task with exponential backoff based on the error class (raises :class:`.Retry`), or if the
+    error class isn't worth retrying / we've run out of retries, record the block in :class:`.FailedBlock`
+    """
+    error_class = failures.classify_error(exc)
+    countdown = failures.retry_countdown(error_class, task.request.retries)
+    if countdown is not None and task.request.retries < task.max_retries:
+        log.warning('Failed to import block %s (%s error: %s %s) - retrying in %.1f seconds',
+                    block, error_class, type(exc).__name__, str(exc), countdown)
+        raise task.retry(exc=exc, countdown=countdown)
+    log.exception('Giving up on importing block %s after %d retries (%s error)',
+                  block, task.request.retries, error_class)
+    failures.record_failed_block(block, queue, exc)
+
+
+@worker_process_shutdown.connect
+def flush_worker_stats(**kwargs):
+    workerstats.buffer.flush()
+
+
+@worker_init.connect
+@worker_process_init.connect
+def init_worker_db(**kwargs):
+    dbconn.install()
+
+
+@task_prerun.connect
+def check_db_connection(**kwargs):
+    dbconn.before_task()
+
+
+@task_postrun.connect
+def finish_task(**kwargs):
+    dbconn.after_task()
+    workerstats.buffer.maybe_flush()
+    if pending.schedule.due():
+        try:
+            apply_pending_updates()
+        except Exception:
+            log.exception('Failed to apply queued updates - they will be retried after a later task')
+
+
+def apply_pending_updates(limit: int = None) -> int:
+    """
+    Apply a batch of up to ``limit`` (default: ``PENDING_APPLY_LIMIT``) queued blocks to each derived table which
+    queues them (see :mod:`historyapp.lib.pending`). Returns the number of queued rows which were applied.
+    """
+    limit = settings.PENDING_APPLY_LIMIT if limit is None else int(limit)
+    return rollups.apply_pending(limit) + producers.apply_pending(limit)
+
+
+def _import_block_locked(block: int, queue: str = None, lean=False) -> dict:
+    with transaction.atomic(), locking.block_lock(block):
+        return _import_block_tx(block, queue, lean=lean)
+
+
+def _import_block_tx(block: int, queue: str = None, lean=False) -> dict:
+    """Import ``block`` - must be called inside a transaction, while holding a block or range lock"""
+    log.debug('Importing block %d via _import_block...', block)
+    t_start = time.monotonic()
+    _b = run_sync(_import_block, block)
+    if type(_b) not in [tuple, list] or len(_b) == 1:
+        coverage.cover_blocks(_b.number)
+        return dict(block_num=_b.number, timestamp=str(_b.timestamp), txs_imported=0)
+    db_block, raw_block = _b
+
+    raw_block: eos.EOSBlock
+    db_block: EOSBlock
+
+    run_sync(import_block_transactions, raw_block, db_block)
+    # Store the amount of transactions which were actually imported, so the API doesn't have to count them
+    total_txs = EOSTransaction.objects.filter(block_id=db_block.number).count()
+    EOSBlock.objects.filter(number=db_block.number).update(total_transactions=total_txs)
+    # Waits for the locks of each account / token the block's transfers change, so it goes before any shared rows
+    if settings.TRANSFER_LEDGER and settings.BALANCE_HISTORY:
+        balances.add_blocks(db_block.number)
+    # The producer statistics and rollups only queue the block, and are applied in batches once it's committed
+    if settings.PRODUCER_STATS:
+        producers.add_blocks(db_block.number)
+    if settings.TRANSFER_ROLLUPS:
+        rollups.add_blocks(db_block.number)
+    # Merge this block into the block coverage ranges as part of the same transaction
+    coverage.cover_blocks(db_block.number)
+    rpc_ms = raw_block.rpc_ms
+    db_ms = (time.monotonic() - t_start) * 1000 - (0 if rpc_ms is None else rpc_ms)
+    if lean:
+        # Only count the block once it's actually been committed - the counters are flushed later in a batch
+        transaction.on_commit(
+            lambda: workerstats.buffer.add_commit(queue, db_block.number, total_txs, rpc_ms=rpc_ms, db_ms=db_ms)
+        )
+    else:
+        # Every import updates the same checkpoint row, so only update it once the block is committed - in its own
+        # short transaction, rather than holding the row lock until the block's transaction ends
+        transaction.on_commit(
+            lambda: checkpoint.record_commit(queue, db_block.number, rpc_ms=rpc_ms, db_ms=db_ms)
+        )
+
+    return dict(block_num=db_block.number, timestamp=str(db_block.timestamp), txs_imported=total_txs)
 
 
 @app.task(base=TaskBase)
@@ -124,13 +240,25 @@ def success_import_block(block_res: dict):
     # log.info('success_import_block finished.')
 
 
-def task_import_block(block: int, queue='celery'):
-    return import_block.apply_async(
-        kwargs=dict(block=int(block)),
-        link=success_import_block.s(),
-        link_error=handle_errors.s(block),
-        queue=queue,
-    )
+def import_block_message(block: int, queue='celery', lane: str = None) -> Tuple[Task, dict, dict]:
+    """
+    Returns ``(task, kwargs, options)`` for queueing the import of ``block`` - shared by :func:`.task_import_block`
+    and the batched :class:`.TaskPublisher` used by sync_blocks, so both send identical tasks.
+
+    ``queue`` is the base queue (which the block's import is recorded against in its :class:`.SyncCheckpoint`),
+    while ``lane`` picks which of the base queue's priority lanes the task is sent to.
+    """
+    kwargs, options = dict(block=int(block), queue=queue), dict(queue=lanes.lane_queue(queue, lane))
+    if settings.IMPORT_LEAN_TASKS:
+        return import_block_lean, kwargs, options
+    options.update(link=success_import_block.s(), link_error=handle_errors.s(block))
+    return import_block, kwargs, options
+
+
+def task_import_block(block: int, queue='celery', lane: str = None):
+    """Queue ``block`` for import (see :func:`.import_block_message`)"""
+    task, kwargs, options = import_block_message(block, queue=queue, lane=lane)
+    return task.apply_async(kwargs=kwargs, **options)
 
 
 # @app.task
@@ -17,18 +17,33 @@ Django views, including JSON API views for Django Rest Framework.
     +===================================================+
 
 """
+import json
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import render
 
 # Create your views here.
-from django_filters import FilterSet, CharFilter
-from rest_framework import viewsets
-from rest_framework.decorators import api_view
-from rest_framework.pagination import LimitOffsetPagination
+from django.db.models import Prefetch
+from django.db.models import F, Sum, Count
+from django_filters import FilterSet, CharFilter, NumberFilter, IsoDateTimeFilter, ChoiceFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import viewsets, mixins
+from rest_framework.decorators import api_view, action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import LimitOffsetPagination, CursorPagination
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 
-from historyapp.models import EOSBlock, EOSTransaction, EOSAction
-from historyapp.serializers import EOSBlockSerializer, EOSTransactionSerializer, EOSActionSerializer
+from historyapp.fields import HexBinaryField
+from historyapp.lib import archive, producers, balances, blocktime, feed
+from historyapp.models import EOSBlock, EOSTransaction, EOSAction, SyncCheckpoint, AccountAction, TransferRollup, \
+    AccountTransferRollup, EOSTransfer, ProducerRound, ProducerSchedule, AccountBalance
+from historyapp.serializers import EOSBlockSerializer, EOSTransactionSerializer, EOSActionSerializer, \
+    SyncCheckpointSerializer, AccountActionSerializer, TransferRollupSerializer, AccountTransferRollupSerializer, \
+    TopAccountSerializer, EOSTransferSerializer, ProducerRoundSerializer, ProducerSummarySerializer, \
+    ProducerScheduleSerializer, AccountBalanceSerializer
 
 
 @api_view(['GET'])
@@ -37,6 +52,15 @@ def api_root(request, format=None):
         'blocks':           reverse('eosblock-list', request=request, format=format),
         'transactions':     reverse('eostransaction-list', request=request, format=format),
         'actions':          reverse('eosaction-list', request=request, format=format),
+        'feed':             reverse('feed-list', request=request, format=format),
+        'history':          reverse('accountaction-list', request=request, format=format),
+        'transfers':        reverse('eostransfer-list', request=request, format=format),
+        'balances':         reverse('accountbalance-list', request=request, format=format),
+        'sync':             reverse('synccheckpoint-list', request=request, format=format),
+        'transfer_rollups': reverse('transferrollup-list', request=request, format=format),
+        'account_rollups':  reverse('accounttransferrollup-list', request=request, format=format),
+        'producers':        reverse('producerround-list', request=request, format=format),
+        'schedules':        reverse('producerschedule-list', request=request, format=format),
     })
 
 
@@ -45,7 +69,151 @@ class CustomPaginator(LimitOffsetPagination):
     max_limit = 1000
 
 
-class BlockAPI(viewsets.ReadOnlyModelViewSet):
+class ArchiveFallbackMixin:
+    """
+    Falls back to the archive files (see :mod:`historyapp.lib.archive`) when ``ARCHIVE_READS`` is enabled:
+
+     - Lists which are filtered to a block range (e.g. ``block_from`` / ``block_to``) or time range overlapping an
+       archived block range return the matching archived rows after the rows from the database.
+     - Objects which aren't in the database are looked up in the archive.
+
+    Filters which span a relation are mapped to the archived column they match with :py:attr:`.archive_fields`.
+    """
+    archive_fields = {}
+    """Maps filter field names (e.g. ``block__number``) to the archived column which holds the same value"""
+
+    def archive_query(self):
+        """Returns an :class:`.ArchiveQuery` for this request's filters, or None if it doesn't target the archive"""
+        model = self.get_queryset().model
+        filterset = DjangoFilterBackend().get_filterset(self.request, self.get_queryset(), self)
+        if filterset is None or not filterset.is_valid():
+            return None
+        key, predicates, bounds = archive.ARCHIVE_MODELS[model], [], {}
+        columns = {fld.attname: fld for fld in model._meta.concrete_fields}
+        for name, value in filterset.form.cleaned_data.items():
+            if value is None or value == '':
+                continue
+            f = filterset.filters[name]
+            column = self.archive_fields.get(f.field_name, f.field_name)
+            if f.method is not None or f.lookup_expr not in archive.LOOKUPS or f.exclude or column not in columns:
+                raise ValidationError({name: 'This filter can not be used to search archived blocks.'})
+            if isinstance(f, JSONContainsFilter):
+                value = f.parse(value)
+            fld = columns[column].target_field if columns[column].is_relation else columns[column]
+            if isinstance(fld, HexBinaryField) and isinstance(value, str):
+                # Hashes are archived as lowercase hex
+                value = value.lower()
+            predicates.append((column, f.lookup_expr, value))
+            # Only search the archive files which could hold the requested block / time range
+            if column in (key, 'timestamp') and f.lookup_expr in ('exact', 'gt', 'gte', 'lt', 'lte'):
+                prefix = 'block' if column == key else 'time'
+                if f.lookup_expr in ('exact', 'gt', 'gte'):
+                    bounds[f'start_{prefix}'] = value
+                if f.lookup_expr in ('exact', 'lt', 'lte'):
+                    bounds[f'end_{prefix}'] = value
+        if len(bounds) == 0:
+            return None
+        if 'start_block' in bounds or 'end_block' in bounds:
+            bounds = {k: int(v) if k.endswith('_block') else v for k, v in bounds.items()}
+        query = archive.ArchiveQuery(model, predicates, **bounds)
+        return query if query.segments.exists() else None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        archived = self.archive_query() if settings.ARCHIVE_READS else None
+        if archived is not None:
+            queryset = archive.CombinedResults(queryset, archived)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if not settings.ARCHIVE_READS:
+                raise
+            lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            obj = archive.get_archived(self.get_queryset().model, lookup)
+            if obj is None:
+                raise
+            return obj
+
+
+class ArchivedRangeMixin:
+    """
+    For lists of tables which aren't archived (the account history and transfer ledger), whose rows are deleted when
+    their blocks are moved into the archive files (see :mod:`historyapp.lib.archive`):
+
+     - A ``block_from`` which reaches into archived blocks is rejected, rather than silently returning a partial list.
+     - Without a ``block_from``, the results only cover the blocks in the database, and the ``X-Archived-Until``
+       header holds the highest archived block number in the requested range - older results are missing.
+    """
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            start = int(params['block_from']) if params.get('block_from') else None
+            end = int(params['block_to']) if params.get('block_to') else None
+        except ValueError:
+            # The filter set rejects them
+            return super().list(request, *args, **kwargs)
+        archived = archive.archived_overlap(start, end)
+        if archived is not None and start is not None:
+            raise ValidationError({
+                'block_from': f'Blocks {archived[0]} to {archived[1]} have been archived, and this list only '
+                              f'covers the blocks in the database. Use a block_from after {archived[1]}.'
+            })
+        response = super().list(request, *args, **kwargs)
+        if archived is not None:
+            response['X-Archived-Until'] = str(archived[1])
+        return response
+
+
+class BlockTimeFilter(IsoDateTimeFilter):
+    """
+    Filters by time, by converting the time into a range of block numbers (see :mod:`historyapp.lib.blocktime`) and
+    filtering on the block number column ``block_field`` instead - so a time range is answered with an index range
+    scan on the block number, rather than a scan of (or join through to) a timestamp column.
+
+    The filter keeps its timestamp ``field_name``, which is what archived blocks are searched by.
+    """
+    def __init__(self, *args, block_field: str = 'block_number', **kwargs):
+        self.block_field = block_field
+        kwargs.setdefault('field_name', 'timestamp')
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if value in (None, ''):
+            return qs
+        start, end = blocktime.block_range(value, self.lookup_expr)
+        if start is not None:
+            qs = qs.filter(**{f'{self.block_field}__gte': start})
+        if end is not None:
+            qs = qs.filter(**{f'{self.block_field}__lte': end})
+        return qs
+
+
+class BlockFilter(FilterSet):
+    block_from = NumberFilter(field_name='number', lookup_expr='gte')
+    block_to = NumberFilter(field_name='number', lookup_expr='lte')
+    time_from = BlockTimeFilter(lookup_expr='gte', block_field='number')
+    time_to = BlockTimeFilter(lookup_expr='lte', block_field='number')
+    timestamp = BlockTimeFilter(block_field='number')
+
+    class Meta:
+        model = EOSBlock
+        fields = (
+            'number', 'producer', 'id', 'new_producers', 'producer_signature', 'ref_block_prefix', 'confirmed',
+            'timestamp', 'total_transactions', 'created_at', 'updated_at'
+        )
+
+
+class BlockAPI(ArchiveFallbackMixin, viewsets.ReadOnlyModelViewSet):
     """
     This is the highest level of data provided by [Privex EOS History API](https://github.com/Privex/EOSHistory)
     
@@ -57,30 +225,72 @@ class BlockAPI(viewsets.ReadOnlyModelViewSet):
     You can also filter blocks by various fields, see the "Filters" button in the top right.
     
     Most fields can be queried just by entering their name as a GET query, e.g. ``/api/blocks/?producer=bitfinexeos1``
+
+    Use ``block_from`` / ``block_to`` (inclusive), or ``time_from`` / ``time_to``, to only return a range of blocks.
+    Archived (older) blocks are only searched when you specify a range.
     """
-    queryset = EOSBlock.objects.all().order_by('-number')
+    # Only the TXIDs are needed for the transaction hyperlinks - fetch them for the whole page in one query
+    queryset = EOSBlock.objects.all().order_by('-number').prefetch_related(
+        Prefetch('transactions', queryset=EOSTransaction.objects.only('txid', 'block_id'))
+    )
     order_by = 'number'
     serializer_class = EOSBlockSerializer
-    filterset_fields = (
-        'number', 'producer', 'id', 'new_producers', 'producer_signature', 'ref_block_prefix', 'confirmed',
-        'timestamp', 'created_at', 'updated_at'
-    )
+    filterset_class = BlockFilter
     pagination_class = CustomPaginator
 
 
+class JSONContainsFilter(CharFilter):
+    """
+    Filters a JSONField by containment (``@>``), which is answered by the field's ``jsonb_path_ops`` GIN index.
+
+    The value is parsed as JSON, e.g. ``{"to": "privexinceos"}`` matches every row whose JSON object has a ``to`` key
+    of ``privexinceos``. Values which aren't valid JSON are treated as a string, so ``?signatures=SIG_K1_xxx`` matches
+    a list containing that string.
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('lookup_expr', 'contains')
+        super().__init__(*args, **kwargs)
+
+    @staticmethod
+    def parse(value):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+
+    def filter(self, qs, value):
+        if value in (None, ''):
+            return qs
+        return super().filter(qs, self.parse(value))
+
+
 class SignatureFilter(FilterSet):
-    signatures = CharFilter(lookup_expr='contains')
-    metadata = CharFilter(lookup_expr='contains')
+    signatures = JSONContainsFilter()
+    metadata = JSONContainsFilter()
+    # Filter on the block_id column itself, so a partitioned transaction table only scans the matching partitions
+    block_from = NumberFilter(field_name='block_id', lookup_expr='gte')
+    block_to = NumberFilter(field_name='block_id', lookup_expr='lte')
+    time_from = BlockTimeFilter(lookup_expr='gte', block_field='block_id')
+    time_to = BlockTimeFilter(lookup_expr='lte', block_field='block_id')
+    timestamp = BlockTimeFilter(block_field='block_id')
+    block__timestamp = BlockTimeFilter(field_name='block__timestamp', block_field='block_id')
     
     class Meta:
         model = EOSTransaction
         fields = (
             'txid', 'status', 'block__number', 'packed_trx', 'block__timestamp', 'signatures',
-            'compression', 'metadata'
+            'compression', 'metadata', 'timestamp', 'total_actions'
         )
 
 
-class TransactionAPI(viewsets.ReadOnlyModelViewSet):
+# The compact storage profile doesn't store packed_trx - fetch what's needed to rebuild it along with the action links
+_tx_action_fields = ('id', 'transaction_id') + (
+    ('action_index', 'account', 'name', 'authorization', 'hex_data', 'raw_data')
+    if settings.STORAGE_PROFILE == 'compact' else ()
+)
+
+
+class TransactionAPI(ArchiveFallbackMixin, viewsets.ReadOnlyModelViewSet):
     """
     A transaction is a part of a [block](/api/blocks) which contains zero or more **actions** - the actions
     are what actually contain more useful information such as who sent it, and what it's actually doing.
@@ -102,10 +312,13 @@ class TransactionAPI(viewsets.ReadOnlyModelViewSet):
     qVNxEkGHJHN5P7Eodrs4sF7aFQsaSjy3qx2R7FGZj8FpPEKi2)
     
     """
-    queryset = EOSTransaction.objects.all().order_by('-created_at')
+    queryset = EOSTransaction.objects.all().order_by('-block_id', '-created_at').prefetch_related(
+        Prefetch('actions', queryset=EOSAction.objects.only(*_tx_action_fields))
+    )
     order_by = 'created'
     serializer_class = EOSTransactionSerializer
     filterset_class = SignatureFilter
+    archive_fields = {'block__number': 'block_id', 'block__timestamp': 'timestamp'}
     # filterset_fields = (
     #     'txid', 'status', 'block__number', 'packed_trx', 'block__timestamp', 'signatures',
     #     'compression'
@@ -113,7 +326,24 @@ class TransactionAPI(viewsets.ReadOnlyModelViewSet):
     pagination_class = CustomPaginator
 
 
-class ActionAPI(viewsets.ReadOnlyModelViewSet):
+class ActionFilter(FilterSet):
+    data_contains = JSONContainsFilter(field_name='data')
+    block_from = NumberFilter(field_name='block_number', lookup_expr='gte')
+    block_to = NumberFilter(field_name='block_number', lookup_expr='lte')
+    time_from = BlockTimeFilter(lookup_expr='gte')
+    time_to = BlockTimeFilter(lookup_expr='lte')
+    timestamp = BlockTimeFilter()
+    transaction__block__timestamp = BlockTimeFilter(field_name='transaction__block__timestamp')
+
+    class Meta:
+        model = EOSAction
+        fields = (
+            'transaction__txid', 'transaction__block__timestamp', 'action_index', 'account', 'name',
+            'tx_from', 'tx_to', 'tx_memo', 'tx_amount', 'tx_precision', 'tx_symbol', 'block_number', 'timestamp',
+        )
+
+
+class ActionAPI(ArchiveFallbackMixin, viewsets.ReadOnlyModelViewSet):
     """
     An action is a part of a transaction, and contains useful information such as who sent it, and what it's
     actually doing.
@@ -139,12 +369,315 @@ class ActionAPI(viewsets.ReadOnlyModelViewSet):
     Most fields can be queried just by entering their name as a GET query, for example:
     [/api/transactions/?tx_from=privexinceos](/api/transactions/?tx_from=privexinceos)
 
+    Use ``block_number``, or ``block_from`` / ``block_to`` (inclusive), to only search a range of blocks, e.g.
+    [/api/actions/?block_from=90000000&block_to=90001000](/api/actions/?block_from=90000000&block_to=90001000)
+
+    Similarly, use ``time_from`` / ``time_to`` (ISO 8601 date/times) to only search a range of time. Archived (older)
+    blocks are only searched when you specify a block or time range.
+
+    To search inside the ``data`` of actions, pass a JSON object to ``data_contains`` - each action whose data
+    contains all of those keys / values is returned, e.g. ``/api/actions/?data_contains={"receiver":"privexinceos"}``
+
+    Actions are returned newest first in chain order (by ``global_seq``) - to follow every new action as it's
+    imported, use the [change feed](/api/feed/) instead.
     """
-    queryset = EOSAction.objects.all().order_by('-created_at')
+    # Actions without a sequence (see EOSAction.global_seq) go last - migration 0030 builds the index in this order
+    queryset = EOSAction.objects.all().order_by(F('global_seq').desc(nulls_last=True))
     order_by = 'created'
     serializer_class = EOSActionSerializer
-    filterset_fields = (
-        'transaction__txid', 'transaction__block__timestamp', 'action_index', 'account', 'name',
-        'tx_from', 'tx_to', 'tx_memo', 'tx_amount', 'tx_precision', 'tx_symbol',
-    )
+    filterset_class = ActionFilter
+    archive_fields = {'transaction__txid': 'transaction_id', 'transaction__block__timestamp': 'timestamp'}
+    pagination_class = CustomPaginator
+
+
+class FeedAPI(viewsets.GenericViewSet):
+    """
+    Every imported action in chain order, oldest first, after the action sequence ``after`` - for mirroring the
+    actions into another database. Each action's ``global_seq`` is its position in the chain.
+
+    Start with ``from_block`` (the first block to read), or no cursor at all to start from the lowest imported block,
+    then keep requesting the ``next`` link (or pass the returned ``after``) - once you've caught up, the same link
+    returns the actions imported since. Use ``limit`` to change the page size (default 1000, up to 10000).
+
+    The feed stops at ``safe_block`` - the end of the unbroken run of imported blocks after your cursor - so it never
+    skips past a block which is still being imported. Only blocks in the database are returned, not archived blocks.
+    """
+    queryset = EOSAction.objects.all()
+    serializer_class = EOSActionSerializer
+    page_size = 1000
+    max_page_size = 10000
+
+    def _int_param(self, name: str, default: int = None) -> int:
+        value = self.request.query_params.get(name)
+        if value in [None, '']:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'Must be an integer.'})
+
+    def list(self, request, *args, **kwargs):
+        after = self._int_param('after')
+        if after is None:
+            after = feed.block_seq(max(self._int_param('from_block', 0), 0))
+        limit = min(max(self._int_param('limit', self.page_size), 1), self.max_page_size)
+        actions, next_after, safe = feed.read_feed(after, limit)
+        next_url = request.build_absolute_uri(f'{request.path}?{urlencode(dict(after=next_after, limit=limit))}')
+        return Response({
+            'after': next_after,
+            'next': next_url,
+            'safe_block': safe,
+            'results': self.get_serializer(actions, many=True).data,
+        })
+
+
+class AccountHistoryFilter(FilterSet):
+    account = CharFilter(required=True)
+    block_from = NumberFilter(field_name='block_number', lookup_expr='gte')
+    block_to = NumberFilter(field_name='block_number', lookup_expr='lte')
+    role = ChoiceFilter(choices=[(name, name) for _, name in AccountAction.ROLES], method='filter_role')
+
+    class Meta:
+        model = AccountAction
+        fields = ('account', 'block_number')
+
+    def filter_role(self, queryset, name, value):
+        bit = {n: b for b, n in AccountAction.ROLES}[value]
+        return queryset.annotate(role_bit=F('roles').bitand(bit)).filter(role_bit__gt=0)
+
+
+class HistoryPaginator(CursorPagination):
+    # Matches the (account, block_number DESC, action_id DESC) index, so each page is a single index range scan
+    ordering = ('-block_number', '-action_id')
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+
+
+class AccountHistoryAPI(ArchivedRangeMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    The actions an account was involved in, newest first - whether it was the contract the action was sent to,
+    one of the accounts which authorized it, or the sender / receiver named in the action's data.
+
+    ``account`` is required, e.g. [/api/history/?account=eosio](/api/history/?account=eosio)
+
+    Use ``block_from`` / ``block_to`` (inclusive) to only return a range of blocks, and ``role`` to only return
+    actions where the account was the ``contract``, an ``auth``orizer, the ``sender`` or the ``receiver``.
+    
+    Each result's ``roles`` lists every way the account was involved in that action. Use the ``next`` / ``previous``
+    links to page through the results, and ``limit`` to change the page size.
+
+    Only blocks in the database are covered - a ``block_from`` within archived blocks is rejected, and otherwise the
+    ``X-Archived-Until`` header holds the highest archived block when older results are missing.
+    """
+    queryset = AccountAction.objects.all().select_related('action')
+    serializer_class = AccountActionSerializer
+    filterset_class = AccountHistoryFilter
+    pagination_class = HistoryPaginator
+
+
+class TransferFilter(FilterSet):
+    block_from = NumberFilter(field_name='block_number', lookup_expr='gte')
+    block_to = NumberFilter(field_name='block_number', lookup_expr='lte')
+
+    class Meta:
+        model = EOSTransfer
+        fields = ('sender', 'receiver', 'contract', 'symbol')
+
+
+class TransferAPI(ArchivedRangeMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Token transfers from the transfer ledger, newest first. Filter by ``sender``, ``receiver``, or a token's
+    ``contract`` + ``symbol`` (each is answered from its own index), e.g.
+    [/api/transfers/?sender=eosio](/api/transfers/?sender=eosio)
+
+    Use ``block_from`` / ``block_to`` (inclusive) to only return a range of blocks. ``amount`` is the integer amount in
+    the token's smallest unit, and ``quantity`` the same amount formatted as an EOS asset, e.g. ``1.2500 EOS``.
+    Use the ``next`` / ``previous`` links to page through the results, and ``limit`` to change the page size.
+
+    Only blocks in the database are covered - a ``block_from`` within archived blocks is rejected, and otherwise the
+    ``X-Archived-Until`` header holds the highest archived block when older results are missing.
+    """
+    queryset = EOSTransfer.objects.all()
+    serializer_class = EOSTransferSerializer
+    filterset_class = TransferFilter
+    pagination_class = HistoryPaginator
+
+
+class BalanceFilter(FilterSet):
+    account = CharFilter(required=True)
+    block_from = NumberFilter(field_name='block_number', lookup_expr='gte')
+    block_to = NumberFilter(field_name='block_number', lookup_expr='lte')
+
+    class Meta:
+        model = AccountBalance
+        fields = ('account', 'contract', 'symbol')
+
+
+class BalanceAPI(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    An account's token balance after each transfer which changed it, newest first. ``account`` is required, e.g.
+    [/api/balances/?account=eosio&symbol=EOS](/api/balances/?account=eosio&symbol=EOS)
+
+    ``/api/balances/at/`` returns the balance of ``account`` in the token ``contract`` / ``symbol`` at the block
+    ``block`` (default: the latest imported block), e.g.
+    ``/api/balances/at/?account=eosio&contract=eosio.token&symbol=EOS&block=90000000``
+
+    Balances are the sum of the transfers imported into this API (including archived blocks) - transfers from before
+    the first imported block, and tokens issued / retired without a transfer action, aren't included.
+    """
+    queryset = AccountBalance.objects.all()
+    serializer_class = AccountBalanceSerializer
+    filterset_class = BalanceFilter
+    pagination_class = HistoryPaginator
+
+    @action(detail=False)
+    def at(self, request, *args, **kwargs):
+        params = request.query_params
+        missing = [k for k in ('account', 'contract', 'symbol') if not params.get(k)]
+        if len(missing) > 0:
+            raise ValidationError({k: 'This field is required.' for k in missing})
+        try:
+            block = None if params.get('block') in [None, ''] else int(params['block'])
+        except ValueError:
+            raise ValidationError({'block': 'Must be an integer.'})
+        bal = balances.balance_at(params['account'], params['contract'], params['symbol'], block)
+        if bal is None:
+            raise Http404('This account has no transfers of this token by the given block.')
+        return Response(AccountBalanceSerializer(bal).data)
+
+
+class SyncCheckpointAPI(viewsets.ReadOnlyModelViewSet):
+    """
+    Shows the progress of the block importer (``sync_blocks``) for each Celery queue, including the statistics
+    reported by the importer, and the in-flight block window currently chosen by the adaptive concurrency controller.
+
+    ``window_reason`` explains the controller's most recent decision, e.g. ``decrease: RPC latency 2100ms > 1500ms``
+    """
+    queryset = SyncCheckpoint.objects.all().order_by('queue')
+    serializer_class = SyncCheckpointSerializer
+    pagination_class = CustomPaginator
+
+
+class TransferRollupFilter(FilterSet):
+    period = ChoiceFilter(choices=TransferRollup.PERIODS, required=True)
+    time_from = IsoDateTimeFilter(field_name='bucket', lookup_expr='gte')
+    time_to = IsoDateTimeFilter(field_name='bucket', lookup_expr='lte')
+
+    class Meta:
+        model = TransferRollup
+        fields = ('contract', 'symbol', 'period')
+
+
+class TransferRollupAPI(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    The number of transfers, and total amount transferred, of each token per ``hour`` or ``day`` (UTC), newest first.
+
+    ``period`` is required, e.g.
+    [/api/transfer_rollups/?period=day&symbol=EOS](/api/transfer_rollups/?period=day&symbol=EOS)
+
+    Use ``time_from`` / ``time_to`` (inclusive, compared against the start of each hour / day) to select a time range.
+    """
+    queryset = TransferRollup.objects.all().order_by('-bucket', 'contract', 'symbol')
+    serializer_class = TransferRollupSerializer
+    filterset_class = TransferRollupFilter
+    pagination_class = CustomPaginator
+
+
+class AccountTransferRollupFilter(FilterSet):
+    time_from = IsoDateTimeFilter(field_name='bucket', lookup_expr='gte')
+    time_to = IsoDateTimeFilter(field_name='bucket', lookup_expr='lte')
+
+    class Meta:
+        model = AccountTransferRollup
+        fields = ('account', 'contract', 'symbol')
+
+
+class AccountTransferRollupAPI(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    The number and total amount of each token sent and received by each account per day (UTC), newest first, e.g.
+    [/api/account_rollups/?account=eosio&symbol=EOS](/api/account_rollups/?account=eosio&symbol=EOS)
+
+    Use ``time_from`` / ``time_to`` (inclusive, compared against the start of each day) to select a time range.
+
+    ``/api/account_rollups/top/`` returns the accounts which sent / received the most of a token within the time range,
+    sorted by ``by`` (``sent_volume`` (default), ``received_volume``, ``sent_count`` or ``received_count``), e.g.
+    ``/api/account_rollups/top/?contract=eosio.token&symbol=EOS&time_from=2019-06-01T00:00:00Z``
+    """
+    queryset = AccountTransferRollup.objects.all().order_by('-bucket', 'account', 'contract', 'symbol')
+    serializer_class = AccountTransferRollupSerializer
+    filterset_class = AccountTransferRollupFilter
+    pagination_class = CustomPaginator
+
+    TOP_FIELDS = ('sent_volume', 'received_volume', 'sent_count', 'received_count')
+
+    @action(detail=False)
+    def top(self, request, *args, **kwargs):
+        params = request.query_params
+        if not params.get('contract') or not params.get('symbol'):
+            raise ValidationError({'contract': '"contract" and "symbol" are required.'})
+        by = params.get('by', 'sent_volume')
+        if by not in self.TOP_FIELDS:
+            raise ValidationError({'by': f'Must be one of: {", ".join(self.TOP_FIELDS)}'})
+        try:
+            limit = min(int(params.get('limit', CustomPaginator.default_limit)), CustomPaginator.max_limit)
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+
+        rows = self.filter_queryset(self.get_queryset()).order_by().values('account') \
+            .annotate(**{f: Sum(f) for f in self.TOP_FIELDS}).order_by(f'-{by}', 'account')[:limit]
+        return Response(TopAccountSerializer(rows, many=True).data)
+
+
+class ProducerRoundFilter(FilterSet):
+    round_from = NumberFilter(field_name='round', lookup_expr='gte')
+    round_to = NumberFilter(field_name='round', lookup_expr='lte')
+    time_from = IsoDateTimeFilter(method='filter_time_from')
+    time_to = IsoDateTimeFilter(method='filter_time_to')
+
+    class Meta:
+        model = ProducerRound
+        fields = ('producer', 'schedule_version')
+
+    # Rounds are numbered by time, so a time range is just a round range
+    def filter_time_from(self, queryset, name, value):
+        return queryset.filter(round__gte=producers.time_round(value))
+
+    def filter_time_to(self, queryset, name, value):
+        return queryset.filter(round__lte=producers.time_round(value))
+
+
+class ProducerRoundAPI(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    The number of blocks each producer produced, and the block slots it missed, per production round (12 slots per
+    producer), newest first, e.g. [/api/producers/?producer=eosio](/api/producers/?producer=eosio)
+
+    Use ``round_from`` / ``round_to``, or ``time_from`` / ``time_to`` (inclusive) to select a range of rounds.
+
+    ``/api/producers/summary/`` returns the totals of each producer within the selected rounds, including its
+    ``reliability`` (percentage of expected slots produced), most missed slots first, e.g.
+    ``/api/producers/summary/?time_from=2019-06-01T00:00:00Z``
+    """
+    queryset = ProducerRound.objects.all().order_by('-round', 'producer')
+    serializer_class = ProducerRoundSerializer
+    filterset_class = ProducerRoundFilter
+    pagination_class = CustomPaginator
+
+    SUM_FIELDS = ('blocks_produced', 'expected_slots', 'missed_slots', 'schedule_changes')
+
+    @action(detail=False)
+    def summary(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).order_by().values('producer') \
+            .annotate(rounds=Count('id'), **{f: Sum(f) for f in self.SUM_FIELDS}).order_by('-missed_slots', 'producer')
+        return Response(ProducerSummarySerializer(rows, many=True).data)
+
+
+class ProducerScheduleAPI(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    The producer at each position of each producer schedule version, as learned from the blocks they produced, e.g.
+    [/api/schedules/?version=1](/api/schedules/?version=1)
+    """
+    queryset = ProducerSchedule.objects.all().order_by('-version', 'position')
+    serializer_class = ProducerScheduleSerializer
+    filterset_fields = ('version', 'producer')
     pagination_class = CustomPaginator
@@ -121,6 +121,8 @@ env_path="${_RUN_DIR}/.env"
 
 # Number of celery workers. If left blank, then celery will run (CPU Cores) workers.
 : ${CELERY_WORKERS=''}
+# Number of celery workers reserved for the live lane when running './run.sh queue_live'
+: ${CELERY_LIVE_WORKERS='2'}
 
 _debug "??? DB_HOST=${DB_HOST}   DB_NAME=${DB_NAME}     DB_USER=${DB_USER}    DB_PORT=${DB_PORT}"
 _debug "??? _DB_URL=${_DB_URL}   PORT=${PORT}     GU_WORKERS=${GU_WORKERS}    S_CORE_VER=${S_CORE_VER}"
@@ -314,6 +316,9 @@ case "$1" in
             msg ts bold green "Third argument detected. Using Celery queue $CELERY_QUEUE"
         fi
 
+        # Consume the base queue, plus its live / backfill / gap-fill priority lanes (see IMPORT_LANES)
+        CELERY_QUEUE="${CELERY_QUEUE},${CELERY_QUEUE}.live,${CELERY_QUEUE}.backfill,${CELERY_QUEUE}.gaps"
+
         if [ -z "$CELERY_WORKERS" ]; then
             msg ts bold green "Starting EOS History Celery Workers (workers: auto / match CPU cores)\n"
             msg ts bold green "NOTE: You can set CELERY_WORKERS in .env to manually set the amount of workers"
@@ -328,6 +333,15 @@ case "$1" in
             pipenv run celery worker -l INFO -Q "$CELERY_QUEUE" -c "$CELERY_WORKERS" -A eoshistory
         fi
         ;;
+    queue_live | celery_live)
+        # Workers reserved for the live lane - these never pick up backfill / gap-fill blocks, so new blocks are
+        # imported promptly even while a large backfill is running.
+        CELERY_QUEUE="eoshist"
+        (($# > 1)) && CELERY_LIVE_WORKERS=$2
+        (($# > 2)) && CELERY_QUEUE="$3"
+        msg ts bold green "Starting EOS History live lane Celery Workers (queue: ${CELERY_QUEUE}.live / workers: $CELERY_LIVE_WORKERS)"
+        pipenv run celery worker -l INFO -Q "${CELERY_QUEUE}.live" -c "$CELERY_LIVE_WORKERS" -n "live@%h" -A eoshistory
+        ;;
     sync* | block* | cron)
         msg ts bold green "Running sync_blocks management command to import blocks"
         pipenv run ./manage.py sync_blocks "${@:2}"
@@ -469,6 +483,7 @@ case "$1" in
         msg bold green "    Website: https://www.privex.io/ \n    Source: https://github.com/Privex/EOSHistory\n"
         msg green "Available run.sh commands:\n"
         msg yellow "\t queue - Start the EOS History Celery Workers - processes block imports from sync_blocks"
+        msg yellow "\t queue_live - Start Celery Workers which only import live (near head) blocks"
         msg yellow "\t cron - Synchronise your history database with the EOS blockchain (queue must be running)"
         msg yellow "\t update - Upgrade your Privex EOS History installation"
         msg yellow "\t server - Start the production Gunicorn server"